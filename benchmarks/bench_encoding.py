@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+上传文本解码基准测试
+
+    python benchmarks/bench_encoding.py --size-mb 100
+
+对比旧的 utf-8 -> gbk -> utf-8(ignore) 逐个尝试与样本识别 + 整段单次解码，
+分别测量 UTF-8、GBK、Big5、前面全是 ASCII 而结尾才出现 GBK 的文件的耗时和解码是否正确：
+    旧/整段          内容已整段在内存中：逐个编码尝试 / 识别编码后解码一次
+    旧上传/分块      从 1 MB 分块开始（上传接口读到的数据）：先拼成整段再逐个尝试（原来 await file.read() 的做法）/
+                     喂给 StreamDecoder；两者都包含收集分块的开销
+    文件             read_text 以 mmap 读取文件（离线批量翻译的做法）
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.encoding import StreamDecoder, decode_buffer, read_text
+
+CHUNK_SIZE = 1024 * 1024
+
+SIMPLIFIED = "观自在菩萨，行深般若波罗蜜多时，照见五蕴皆空，度一切苦厄。\n"
+TRADITIONAL = "觀自在菩薩，行深般若波羅蜜多時，照見五蘊皆空，度一切苦厄。\n"
+
+
+def legacy_decode(content: bytes) -> str:
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        try:
+            return content.decode('gbk')
+        except UnicodeDecodeError:
+            return content.decode('utf-8', errors='ignore')
+
+
+def legacy_upload(chunks) -> str:
+    return legacy_decode(b"".join(chunks))
+
+
+def whole_decode(content: bytes) -> str:
+    return decode_buffer(content)[0]
+
+
+def stream_decode(chunks) -> str:
+    decoder = StreamDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.finish()
+
+
+def build_cases(size: int):
+    ascii_line = "Prajnaparamita Hridaya Sutra, line of plain ASCII text.\n"
+    late_gbk = ascii_line * (size // len(ascii_line)) + SIMPLIFIED
+    return {
+        "utf-8": (SIMPLIFIED * (size // len(SIMPLIFIED.encode("utf-8"))), "utf-8"),
+        "gbk": (SIMPLIFIED * (size // len(SIMPLIFIED.encode("gbk"))), "gbk"),
+        "big5": (TRADITIONAL * (size // len(TRADITIONAL.encode("big5"))), "big5"),
+        "ascii+gbk": (late_gbk, "gbk"),
+    }
+
+
+def timed(func, argument, rounds: int):
+    """取多轮中最快的一次"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        text = func(argument)
+        best = min(best, time.perf_counter() - start)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传文本解码基准测试")
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (text, encoding) in build_cases(args.size_mb * 1024 * 1024).items():
+            content = text.encode(encoding)
+            chunks = [content[start:start + CHUNK_SIZE] for start in range(0, len(content), CHUNK_SIZE)]
+            path = os.path.join(tmp, f"{name}.txt")
+            with open(path, "wb") as f:
+                f.write(content)
+            results = [
+                ("旧", timed(legacy_decode, content, args.rounds)),
+                ("整段", timed(whole_decode, content, args.rounds)),
+                ("旧上传", timed(legacy_upload, chunks, args.rounds)),
+                ("分块", timed(stream_decode, chunks, args.rounds)),
+                ("文件", timed(read_text, path, args.rounds)),
+            ]
+            print(f"{name:>10} {len(content) / 1e6:7.1f} MB  " + "  ".join(
+                f"{label}: {seconds:6.3f}s{'' if result == text else ' 错误'}" for label, (seconds, result) in results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+对冲请求基准测试：模拟一个大部分请求很快、少数请求卡住的上游（长尾延迟），
+对比关闭和开启对冲时 ResilientClient 的 p50 / p99 延迟和额外请求数。
+
+    python benchmarks/bench_hedging.py --requests 1500 --tail-rate 0.05 --tail-latency 1.0
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.upstream_client import ResilientClient
+
+
+class TailUpstream:
+    """假上游：tail_rate 比例的请求耗时 tail_latency，其余在 latency 附近"""
+
+    def __init__(self, latency: float, tail_rate: float, tail_latency: float, seed: int):
+        self.latency = latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    async def translate(self, text: str) -> str:
+        self.calls += 1
+        if self._rng.random() < self.tail_rate:
+            await asyncio.sleep(self.tail_latency)
+        else:
+            await asyncio.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        return "粤:" + text
+
+
+async def run(name: str, hedge: bool, args):
+    upstream = TailUpstream(args.latency, args.tail_rate, args.tail_latency, seed=0)
+    client = ResilientClient(upstream.translate, max_concurrency=args.concurrency,
+                             initial_concurrency=args.concurrency, hedge=hedge, hedge_budget=args.budget)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await client(f"段落{i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<8} p50 {statistics.median(latencies) * 1000:7.1f}ms  p99 {p99 * 1000:7.1f}ms  "
+          f"上游调用 {upstream.calls}（额外 {upstream.calls - args.requests}）  耗时 {elapsed:.2f}s")
+    metrics = client.metrics()
+    if hedge:
+        print(f"         对冲 {metrics['hedges']} 次，对冲先返回 {metrics['hedge_wins']} 次，"
+              f"当前对冲延迟 {metrics['hedge_delay_ms']}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对冲请求长尾延迟基准测试")
+    parser.add_argument("--requests", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--budget", type=float, default=0.1)
+    args = parser.parse_args()
+
+    await run("不对冲", False, args)
+    await run("对冲", True, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+翻译任务内存占用基准测试
+
+    python benchmarks/bench_job_memory.py --size-mb 10
+
+用 tracemalloc 测量一份指定大小（UTF-8 字节数）的文档全部翻译完成后，任务对象持有的内存：
+旧结构为段落字符串列表、译文字符串列表和每段一个事件字典；新结构为 TranslationJob
+（StringTable 存放段落和译文，事件日志只记下标）。
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.job_manager import TranslationJob
+
+_CJK_START = 0x4E00
+_CJK_POOL = 3000
+
+
+def make_paragraphs(size: int, rng: random.Random):
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = "".join(chr(_CJK_START + rng.randrange(_CJK_POOL)) for _ in range(rng.randint(20, 120)))
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode("utf-8")) + 1
+    return paragraphs
+
+
+def legacy_job(paragraphs):
+    """旧结构：段落列表 + 译文列表 + 事件字典列表"""
+    # 分段时每段都是新建的字符串
+    paragraphs = [(p + " ")[:-1] for p in paragraphs]
+    results = [None] * len(paragraphs)
+    events = []
+    for index, paragraph in enumerate(paragraphs):
+        results[index] = "粤:" + paragraph
+        events.append({
+            "type": "translation_result",
+            "paragraph_id": index,
+            "original": paragraph.strip(),
+            "translated": results[index],
+            "progress": (index + 1) / len(paragraphs) * 100,
+        })
+    return paragraphs, results, events
+
+
+def compact_job(paragraphs):
+    job = TranslationJob("bench", paragraphs)
+    for index, paragraph in enumerate(paragraphs):
+        job.record_result(index, "粤:" + paragraph)
+    return job
+
+
+def measure(build, paragraphs) -> int:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    held = build(paragraphs)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del held
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译任务内存占用基准测试")
+    parser.add_argument("--size-mb", type=float, default=10)
+    args = parser.parse_args()
+
+    paragraphs = make_paragraphs(int(args.size_mb * 1024 * 1024), random.Random(0))
+    print(f"文档: {args.size_mb} MB UTF-8, {len(paragraphs)} 段")
+    for name, build in (("旧结构", legacy_job), ("新结构", compact_job)):
+        used = measure(build, paragraphs)
+        print(f"{name}: {used / 1024 / 1024:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+粤拼注音基准测试
+
+    python benchmarks/bench_jyutping.py --paragraphs 5000
+
+编译 data/jyutping.tsv 为索引，分别测量首次加载（打开 mmap 并注音第一段）的耗时，
+以及预热后每段译文的注音耗时（微秒/段）和吞吐（字/秒）。段落由注音表中的字和词随机拼接而成，
+夹杂标点和表外的字，每段 20-400 字。
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.jyutping import JyutpingAnnotator, load_table
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PUNCTUATION = "，。；：！？「」"
+_UNKNOWN = "甲乙丙丁ABC"
+
+
+def make_paragraphs(count: int, table: str, rng: random.Random):
+    chars, phrases = load_table(table)
+    words = list(chars) * 4 + list(phrases) + list(_UNKNOWN)
+    paragraphs = []
+    for _ in range(count):
+        length = rng.randint(20, 400)
+        parts = []
+        size = 0
+        while size < length:
+            word = rng.choice(_PUNCTUATION) if rng.random() < 0.1 else rng.choice(words)
+            parts.append(word)
+            size += len(word)
+        paragraphs.append("".join(parts))
+    return paragraphs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="粤拼注音基准测试")
+    parser.add_argument("--table", default=os.path.join(_ROOT, "data", "jyutping.tsv"))
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    paragraphs = make_paragraphs(args.paragraphs, args.table, random.Random(0))
+    total_chars = sum(len(paragraph) for paragraph in paragraphs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        annotator = JyutpingAnnotator(args.table, os.path.join(tmp, "jyutping.idx"))
+        start = time.perf_counter()
+        annotator.annotate(paragraphs[0])
+        print(f"编译并加载索引、注音第一段: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            for paragraph in paragraphs:
+                annotator.annotate(paragraph)
+            best = min(best, time.perf_counter() - start)
+
+    print(f"{args.paragraphs} 段，平均 {total_chars / args.paragraphs:.0f} 字/段")
+    print(f"注音: {best / args.paragraphs * 1e6:8.1f} 微秒/段  {total_chars / best:12.0f} 字/秒")
+
+
+if __name__ == "__main__":
+    main()
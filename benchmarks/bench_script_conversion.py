@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+简繁转换基准测试
+
+    python benchmarks/bench_script_conversion.py --input 妙法莲华经.txt
+    python benchmarks/bench_script_conversion.py --chars 70000
+
+用整部经文测量繁转简、简转繁的吞吐：先编译 data/t2s.tsv 并加载索引（首次转换的耗时），
+再分别整篇转换和按段落（以句号切分）转换。不指定 --input 时把内置的《心经》重复到 --chars 字
+（默认约为《妙法莲华经》的篇幅）。
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.encoding import read_text
+from services.script_converter import SIMPLIFIED, TRADITIONAL, ScriptConverter
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEART_SUTRA = (
+    "觀自在菩薩，行深般若波羅蜜多時，照見五蘊皆空，度一切苦厄。"
+    "舍利子，色不異空，空不異色，色即是空，空即是色，受想行識，亦復如是。"
+    "舍利子，是諸法空相，不生不滅，不垢不淨，不增不減。"
+    "是故空中無色，無受想行識，無眼耳鼻舌身意，無色聲香味觸法，無眼界，乃至無意識界，"
+    "無無明，亦無無明盡，乃至無老死，亦無老死盡。無苦集滅道，無智亦無得。"
+    "以無所得故，菩提薩埵，依般若波羅蜜多故，心無罣礙，無罣礙故，無有恐怖，遠離顛倒夢想，究竟涅槃。"
+    "三世諸佛，依般若波羅蜜多故，得阿耨多羅三藐三菩提。"
+    "故知般若波羅蜜多，是大神咒，是大明咒，是無上咒，是無等等咒，能除一切苦，真實不虛。"
+    "故說般若波羅蜜多咒，即說咒曰：揭諦揭諦，波羅揭諦，波羅僧揭諦，菩提薩婆訶。"
+)
+
+
+def best_of(rounds: int, func) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="简繁转换基准测试")
+    parser.add_argument("--input", help="经文文件（.txt，繁体或简体）")
+    parser.add_argument("--chars", type=int, default=70000, help="未指定 --input 时生成的字数")
+    parser.add_argument("--table", default=os.path.join(_ROOT, "data", "t2s.tsv"))
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.input:
+        text = read_text(args.input)
+    else:
+        text = (HEART_SUTRA * (args.chars // len(HEART_SUTRA) + 1))[:args.chars]
+    paragraphs = [p for p in re.split(r"(?<=。)", text) if p.strip()]
+    print(f"{len(text)} 字，{len(paragraphs)} 段")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        converter = ScriptConverter(args.table, tmp)
+        for name, script in (("繁转简", SIMPLIFIED), ("简转繁", TRADITIONAL)):
+            source = text if script == SIMPLIFIED else converter.convert(text, SIMPLIFIED)
+            source_paragraphs = [p for p in re.split(r"(?<=。)", source) if p.strip()]
+
+            start = time.perf_counter()
+            converter.convert(source_paragraphs[0], script)
+            print(f"{name} 编译并加载索引、转换第一段: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+            whole = best_of(args.rounds, lambda: converter.convert(source, script))
+            each = best_of(args.rounds, lambda: [converter.convert(p, script) for p in source_paragraphs])
+            print(f"{name} 整篇: {whole * 1000:8.2f} ms  {len(source) / whole:12.0f} 字/秒")
+            print(f"{name} 分段: {each / len(source_paragraphs) * 1e6:8.2f} 微秒/段  {len(source) / each:12.0f} 字/秒")
+
+        round_trip = converter.convert(converter.convert(text, SIMPLIFIED), TRADITIONAL)
+        same = sum(a == b for a, b in zip(round_trip, text))
+        print(f"繁→简→繁 往返一致: {same / len(text) * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
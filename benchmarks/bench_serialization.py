@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+JSON 序列化基准测试
+
+    python benchmarks/bench_serialization.py --messages 20000
+
+用与线上相同结构的 translation_result 消息（原文和译文各 20-400 个汉字）对比：
+标准库 json.dumps(ensure_ascii=False) / json.loads 与 services.serialization（orjson 后端）
+编码为 WebSocket 文本帧（str）、HTTP / SSE 响应体（bytes）以及解码客户端消息的耗时。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import serialization
+
+_CJK_START = 0x4E00
+_CJK_POOL = 3000
+
+
+def make_messages(count: int, rng: random.Random):
+    messages = []
+    for index in range(count):
+        original = "".join(chr(_CJK_START + rng.randrange(_CJK_POOL)) for _ in range(rng.randint(20, 400)))
+        messages.append({
+            "type": "translation_result",
+            "paragraph_id": index,
+            "original": original,
+            "translated": "粤:" + original,
+            "progress": (index + 1) / count * 100,
+        })
+    return messages
+
+
+def timed(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 序列化基准测试")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, random.Random(0))
+    frames = [json.dumps(message, ensure_ascii=False) for message in messages]
+    size = sum(len(frame.encode("utf-8")) for frame in frames)
+    print(f"{args.messages} 条消息，共 {size / 1024 / 1024:.1f} MB，后端: {serialization.BACKEND}")
+
+    cases = (
+        ("编码 json.dumps", lambda m: json.dumps(m, ensure_ascii=False), messages),
+        ("编码 dumps_str", serialization.dumps_str, messages),
+        ("编码 dumps（字节）", serialization.dumps, messages),
+        ("解码 json.loads", json.loads, frames),
+        ("解码 loads", serialization.loads, frames),
+    )
+    for name, func, items in cases:
+        best = min(timed(func, items) for _ in range(args.rounds))
+        print(f"{name:<18} {best * 1000:8.1f} ms  {len(items) / best:10.0f} 条/秒  {size / best / 1024 / 1024:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+翻译记忆库查询延迟基准测试
+
+    python benchmarks/bench_translation_memory.py --segments 1000000
+
+先写入指定数量的合成段落，再分别测量精确命中、改动一两个字的近似命中和未命中三类查询的延迟。
+记忆库默认写在临时目录里，测完即删；用 --path 指定文件时保留下来，再次运行会复用已写入的段落。
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.translation_memory import TranslationMemory
+
+# 常用汉字区间，用于生成合成段落
+_CJK_START = 0x4E00
+_CJK_POOL = 3000
+
+
+def make_segment(rng: random.Random) -> str:
+    return "".join(chr(_CJK_START + rng.randrange(_CJK_POOL)) for _ in range(rng.randint(20, 60)))
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    chars = list(text)
+    for _ in range(rng.randint(1, 2)):
+        chars[rng.randrange(len(chars))] = chr(_CJK_START + rng.randrange(_CJK_POOL))
+    return "".join(chars)
+
+
+def measure(memory: TranslationMemory, queries):
+    latencies = []
+    hits = 0
+    for query in queries:
+        start = time.perf_counter()
+        match = memory.lookup(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += match is not None
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+        "hit_rate": hits / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译记忆库查询延迟基准测试")
+    parser.add_argument("--segments", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--path", help="记忆库文件（默认写在临时目录里，测完即删）")
+    args = parser.parse_args()
+
+    if args.path:
+        run(args.path, args)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(os.path.join(tmp, "translation_memory.db"), args)
+
+
+def run(path: str, args):
+    rng = random.Random(42)
+    memory = TranslationMemory(path)
+
+    existing = len(memory)
+    if existing < args.segments:
+        print(f"写入 {args.segments - existing} 条合成段落...")
+        start = time.perf_counter()
+        batch = []
+        for _ in range(existing, args.segments):
+            source = make_segment(rng)
+            batch.append((source, "粤:" + source))
+            if len(batch) == 10_000:
+                memory.add_many(batch)
+                batch = []
+        if batch:
+            memory.add_many(batch)
+        print(f"写入完成，用时 {time.perf_counter() - start:.1f} 秒")
+
+    # 从库中随机抽样作为查询原文
+    with memory._lock:
+        ids = [rng.randint(1, args.segments) for _ in range(args.queries)]
+        samples = [
+            memory._conn.execute("SELECT source FROM segments WHERE id = ?", (i,)).fetchone()[0]
+            for i in ids
+        ]
+
+    print(f"记忆库段落数: {len(memory)}")
+    for name, queries in (
+        ("精确命中", samples),
+        ("近似命中(改1-2字)", [perturb(s, rng) for s in samples]),
+        ("未命中", [make_segment(rng) for _ in range(args.queries)]),
+    ):
+        result = measure(memory, queries)
+        print(f"{name:<16} p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms "
+              f"命中率={result['hit_rate']:.1%}")
+
+    memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+上游客户端压测：启动一个本地假上游服务，超过容量或按比例随机返回 429，
+对比直接并发调用与 ResilientClient 的成功率、429 数量和耗时。
+
+    python benchmarks/bench_upstream_client.py --requests 500 --capacity 8
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.upstream_client import ResilientClient
+
+
+class UpstreamHTTPError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeUpstream:
+    """假上游：最多同时处理 capacity 个请求，超出的直接返回 429"""
+
+    def __init__(self, capacity: int, latency: float, error_rate: float):
+        self.capacity = capacity
+        self.latency = latency
+        self.error_rate = error_rate
+        self.in_flight = 0
+        self.served = 0
+        self.throttled = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.readuntil(b"\r\n\r\n")
+        if self.in_flight >= self.capacity or random.random() < self.error_rate:
+            self.throttled += 1
+            status, body = "429 Too Many Requests", b"busy"
+        else:
+            self.in_flight += 1
+            try:
+                await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+            finally:
+                self.in_flight -= 1
+            self.served += 1
+            status, body = "200 OK", "粤语译文".encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        writer.close()
+
+
+async def call_upstream(port: int, text: str) -> str:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"POST /translate HTTP/1.1\r\nHost: localhost\r\nContent-Length: 0\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if status != 200:
+        raise UpstreamHTTPError(status)
+    return body.decode("utf-8")
+
+
+async def run(name: str, call, requests: int, fake: FakeUpstream):
+    fake.served = fake.throttled = 0
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call(f"段落{i}") for i in range(requests)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in results if not isinstance(r, BaseException))
+    print(f"{name:<16} 成功 {ok}/{requests}  上游429 {fake.throttled}  耗时 {elapsed:.2f}s  "
+          f"有效吞吐 {ok / elapsed:.1f} 次/秒")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="上游客户端 429 压测")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    fake = FakeUpstream(args.capacity, args.latency, args.error_rate)
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def naive(text):
+        return await call_upstream(port, text)
+
+    client = ResilientClient(call_upstream, max_concurrency=32, initial_concurrency=4,
+                             max_retries=5, base_delay=0.05, max_delay=1.0)
+
+    async def resilient(text):
+        return await client(port, text)
+
+    async with server:
+        await run("直接并发", naive, args.requests, fake)
+        await run("ResilientClient", resilient, args.requests, fake)
+        print(f"客户端统计: {client.metrics()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
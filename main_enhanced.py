@@ -1,20 +1,21 @@
 import asyncio
-import json
+import hashlib
+import hmac
 import logging
 import os
 import tempfile
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import uuid
+from urllib.parse import quote
 
-import aiofiles
-import httpx
 from docx import Document
-from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, FastAPI, File, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.datastructures import UploadFile as StarletteUploadFile
 import uvicorn
 
 # 导入增强的服务
@@ -33,11 +34,31 @@ except ImportError:
     from services.tts_service import TTSService
 
 from services.text_processor import TextProcessor
+from services.job_manager import JOB_COMPLETED, JOB_RUNNING, JobManager
+from services.translation_memory import TranslationMemory
+from services.upstream_client import ResilientClient, hedge_method
+from services.expiry import ExpiryScheduler, FileReaper
+from services.log_config import setup_logging
+from services.static_cache import StaticCache
+from services.connection_counter import create_connection_counter
+from services.worker_routing import JobRoutingMiddleware, WorkerRouter
+from services.http_clients import registry as http_clients
+from services.encoding import StreamDecoder
+from services.document_cache import DocumentCache
+from services.document_store import DocumentStore
+from services.document_exporter import DOCX_MEDIA_TYPE, TXT_MEDIA_TYPE, iter_docx, iter_txt
+from services.profiler import LoopLagMonitor, MemoryTracer, SamplingProfiler, dump_tasks
+from services.admission import AdmissionLimit, AdmissionRejected, busy_frame, client_key
+from services import serialization
+from services.serialization import FastJSONResponse
+from services.audio_jobs import AudioJobManager
+from services.jyutping import JyutpingAnnotator
+from services.script_converter import SCRIPTS, ScriptConverter
 
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# 设置日志：队列异步写出，默认 JSON 结构化输出（LOG_FORMAT=text 使用文本格式）
+setup_logging(
+    level=getattr(logging, os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO),
+    json_output=os.environ.get("LOG_FORMAT", "json") != "text"
 )
 logger = logging.getLogger(__name__)
 
@@ -51,7 +72,8 @@ def create_directories():
 create_directories()
 
 # 创建FastAPI应用
-app = FastAPI(title="佛经粤语翻译系统 - 增强版", version="2.0.0")
+# JSON 响应使用 services.serialization 的后端（有 orjson 时用 orjson）
+app = FastAPI(title="佛经粤语翻译系统 - 增强版", version="2.0.0", default_response_class=FastJSONResponse)
 
 # 添加CORS中间件支持跨域
 app.add_middleware(
@@ -62,64 +84,191 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 多 worker 部署：翻译任务保存在创建它的 worker 内，/jobs/{job_id}/* 请求落到其他 worker 时转发给任务所在的 worker
+worker_router = None
+if int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+    worker_router = WorkerRouter(app, os.environ.get("WORKER_SOCKET_DIR", "temp/workers"), http_clients)
+    app.add_middleware(JobRoutingMiddleware, router=worker_router)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return FastJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": f"服务繁忙，请 {exc.retry_after} 秒后重试", "resource": exc.resource},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# 过期调度：缓存和任务按各自截止时间清理，临时文件攒批在线程池中删除
+CACHE_TTL = 3600
+AUDIO_CLEANUP_INTERVAL = 600
+expiry = ExpiryScheduler()
+file_reaper = FileReaper()
+
+# 文档缓存替代Redis：段落写入磁盘文档存储（mmap 读取，多个 worker 共享），
+# 按内容哈希去重，引用计数控制过期
+DOCUMENT_DIR = os.environ.get("DOCUMENT_DIR", "temp/docs")
+document_cache = DocumentCache(expiry, DocumentStore(DOCUMENT_DIR), ttl=CACHE_TTL)
+logger.info("内存缓存系统初始化完成")
+
+# 上传文件分块读取的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 准入控制：超出上限的请求立即返回 429/503（WebSocket 发送 busy 消息），已接受的请求保持正常延迟。
+# 上限按 worker 计算，ADMISSION_<名称> 为全局上限，ADMISSION_<名称>_PER_CLIENT 为每个客户端地址的上限，0 表示不限制
+def admission_limit(resource: str, name: str, limit: int, per_client: int) -> AdmissionLimit:
+    return AdmissionLimit(
+        resource,
+        limit=int(os.environ.get(f"ADMISSION_{name}", limit)),
+        per_client=int(os.environ.get(f"ADMISSION_{name}_PER_CLIENT", per_client))
+    )
+
+upload_admission = admission_limit("uploads", "UPLOADS", 16, 2)
+parse_admission = admission_limit("parse_bytes", "PARSE_BYTES", 256 * 1024 * 1024, 100 * 1024 * 1024)
+job_admission = admission_limit("jobs", "JOBS", 32, 4)
+socket_admission = admission_limit("sockets", "SOCKETS", 1000, 20)
+
 # 初始化服务
 logger.info("初始化增强服务...")
 translation_service = TranslationService()
 tts_service = TTSService()
 text_processor = TextProcessor()
+# 翻译记忆库，TRANSLATION_MEMORY_PATH 设为空字符串可关闭
+translation_memory = None
+translation_memory_path = os.environ.get("TRANSLATION_MEMORY_PATH", "temp/translation_memory.db")
+if translation_memory_path:
+    translation_memory = TranslationMemory(
+        translation_memory_path,
+        # 默认只直接复用规范化后完全相同的段落，近似段落只作为参考译文
+        reuse_threshold=float(os.environ["TM_REUSE_THRESHOLD"]) if os.environ.get("TM_REUSE_THRESHOLD") else None,
+        hint_threshold=float(os.environ.get("TM_HINT_THRESHOLD", 0.6))
+    )
+# 上游调用：限速、自适应并发、重试和熔断
+translation_concurrency = int(os.environ.get("TRANSLATION_CONCURRENCY", 4))
+translation_client = ResilientClient(
+    translation_service.translate_to_cantonese,
+    stream_func=getattr(translation_service, "translate_to_cantonese_stream", None),
+    max_concurrency=translation_concurrency,
+    initial_concurrency=min(2, translation_concurrency),
+    rate=float(os.environ.get("UPSTREAM_RATE_LIMIT", 0)) or None,
+    max_retries=int(os.environ.get("UPSTREAM_MAX_RETRIES", 3)),
+    # 对冲请求：超过近期 p90 延迟（流式调用按首块延迟）仍未返回时重发一次，额外请求不超过 UPSTREAM_HEDGE_BUDGET 比例
+    # （非流式调用只对异步翻译函数生效：同步函数跑在线程里，落后的请求无法取消）。
+    # UPSTREAM_HEDGE_METHOD 指定翻译服务上的备用方法（如另一个模型），流式版本为同名加 _stream
+    hedge=os.environ.get("UPSTREAM_HEDGE", "0") == "1",
+    hedge_func=hedge_method(translation_service),
+    hedge_stream_func=hedge_method(translation_service, stream=True),
+    hedge_budget=float(os.environ.get("UPSTREAM_HEDGE_BUDGET", 0.1))
+)
+# 简繁转换：翻译前把原文统一成 SOURCE_SCRIPT 字体（simplified / traditional，空字符串表示不转换），
+# 同一段经文的繁体本和简体本共用翻译记忆；发给客户端时再按其要求的字体渲染译文
+script_converter = ScriptConverter(
+    os.environ.get("SCRIPT_TABLE", "data/t2s.tsv"),
+    os.environ.get("SCRIPT_INDEX_DIR", "temp")
+)
+SOURCE_SCRIPT = os.environ.get("SOURCE_SCRIPT", "simplified")
+if SOURCE_SCRIPT and SOURCE_SCRIPT not in SCRIPTS:
+    logger.warning(f"⚠️ 不支持的 SOURCE_SCRIPT={SOURCE_SCRIPT}，翻译前不统一字体")
+    SOURCE_SCRIPT = ""
+job_manager = JobManager(
+    translation_client,
+    max_concurrency=translation_concurrency,
+    memory=translation_memory,
+    expiry=expiry,
+    job_ttl=CACHE_TTL,
+    # 翻译服务提供流式接口时，逐块推送 translation_partial
+    stream=translation_client.stream if translation_client.stream_func else None,
+    normalize=(lambda text: script_converter.convert(text, SOURCE_SCRIPT)) if SOURCE_SCRIPT else None,
+    id_prefix=worker_router.job_prefix if worker_router is not None else ""
+)
+# 整篇语音预生成：所有任务共享 TTS_CONCURRENCY 个合成名额，相同文本的合成结果在进程内缓存
+audio_jobs = AudioJobManager(
+    tts_service.generate_speech,
+    tts_service.get_audio_config,
+    concurrency=int(os.environ.get("TTS_CONCURRENCY", 4)),
+    expiry=expiry,
+    ttl=CACHE_TTL
+)
+# 粤拼注音：注音表编译成 mmap 索引，第一次注音时才加载；只在客户端要求时附加到译文消息上
+jyutping_annotator = JyutpingAnnotator(
+    os.environ.get("JYUTPING_TABLE", "data/jyutping.tsv"),
+    os.environ.get("JYUTPING_INDEX", "temp/jyutping.idx")
+)
 logger.info("增强服务初始化完成")
 
-# 内存缓存替代Redis
-memory_cache = {}
-logger.info("内存缓存系统初始化完成")
-
 # WebSocket连接管理器
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, counter):
         self.active_connections: Dict[str, WebSocket] = {}
+        # 多 worker 部署时汇总所有 worker 的连接数
+        self.counter = counter
+        # 每个客户端当前接收的文件翻译任务 ID 和转发事件的后台协程
+        self.file_jobs: Dict[str, str] = {}
+        self.forward_tasks: Dict[str, asyncio.Task] = {}
+        # 每个客户端正在转发的整篇语音播放列表
+        self.audio_tasks: Dict[str, asyncio.Task] = {}
         
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
         self.active_connections[client_id] = websocket
+        self.counter.local_connections = len(self.active_connections)
         logger.info(f"✅ 客户端 {client_id} 已连接，当前连接数: {len(self.active_connections)}")
         
     def disconnect(self, client_id: str):
         if client_id in self.active_connections:
             del self.active_connections[client_id]
+            self.counter.local_connections = len(self.active_connections)
+            # 停止转发，翻译任务本身继续在后台运行
+            for tasks in (self.forward_tasks, self.audio_tasks):
+                task = tasks.pop(client_id, None)
+                if task is not None:
+                    task.cancel()
+            self.file_jobs.pop(client_id, None)
             logger.info(f"❌ 客户端 {client_id} 已断开，当前连接数: {len(self.active_connections)}")
     
     async def send_personal_message(self, message: dict, client_id: str):
+        # 消息都由持有连接的 worker 发出（任务事件的转发协程运行在处理该连接的 worker 上）
         if client_id in self.active_connections:
             try:
-                await self.active_connections[client_id].send_text(json.dumps(message, ensure_ascii=False))
-                logger.debug(f"📨 向客户端 {client_id} 发送消息: {message.get('type', 'unknown')}")
+                await self.active_connections[client_id].send_text(serialization.dumps_str(message))
+                logger.debug("📨 向客户端 %s 发送消息: %s", client_id, message.get('type', 'unknown'),
+                             extra={"category": "frame"})
             except Exception as e:
                 logger.error(f"❌ 发送消息失败: {e}")
                 self.disconnect(client_id)
 
-manager = ConnectionManager()
+manager = ConnectionManager(create_connection_counter(os.environ.get("REDIS_URL")))
 
-# 挂载静态文件
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# 页面与静态资源：内存缓存 + 预压缩 + ETag，文件变化时自动重新加载
+static_cache = StaticCache()
+STATIC_DIR = Path("static").resolve()
+STATIC_CACHE_CONTROL = f"public, max-age={int(os.environ.get('STATIC_MAX_AGE', 3600))}"
 
 @app.get("/", response_class=HTMLResponse)
-async def read_root():
+async def read_root(request: Request):
     """返回主页"""
-    try:
-        async with aiofiles.open("templates/index_enhanced.html", "r", encoding="utf-8") as f:
-            content = await f.read()
-        logger.info("✅ 增强主页加载成功")
-        return HTMLResponse(content=content)
-    except FileNotFoundError:
-        # 如果增强版不存在，使用原版
-        try:
-            async with aiofiles.open("templates/index.html", "r", encoding="utf-8") as f:
-                content = await f.read()
-            logger.info("✅ 主页加载成功（原版）")
-            return HTMLResponse(content=content)
-        except FileNotFoundError:
-            logger.error("❌ 模板文件未找到")
-            return HTMLResponse("<h1>模板文件未找到</h1>")
+    # 如果增强版不存在，使用原版
+    for template in ("templates/index_enhanced.html", "templates/index.html"):
+        asset = await static_cache.get(template)
+        if asset is not None:
+            # 页面每次都用 ETag 校验，模板更新后立即生效
+            return static_cache.response(asset, request.headers, "no-cache")
+    logger.error("❌ 模板文件未找到")
+    return HTMLResponse("<h1>模板文件未找到</h1>")
+
+@app.api_route("/static/{file_path:path}", methods=["GET", "HEAD"])
+async def static_files(file_path: str, request: Request):
+    """静态资源"""
+    full_path = (STATIC_DIR / file_path).resolve()
+    if STATIC_DIR not in full_path.parents:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    asset = await static_cache.get(str(full_path))
+    if asset is not None:
+        return static_cache.response(asset, request.headers, STATIC_CACHE_CONTROL, head=request.method == "HEAD")
+    if full_path.is_file():
+        # 大文件不进内存缓存，直接从磁盘发送
+        return FileResponse(full_path, headers={"Cache-Control": STATIC_CACHE_CONTROL})
+    raise HTTPException(status_code=404, detail="Not Found")
 
 @app.get("/health")
 async def health_check():
@@ -128,20 +277,221 @@ async def health_check():
         "status": "healthy",
         "version": "2.0.0 - Enhanced",
         "timestamp": time.time(),
-        "connections": len(manager.active_connections),
-        "cache_size": len(memory_cache),
+        "connections": manager.counter.total_connections(),
+        "local_connections": len(manager.active_connections),
+        "worker": manager.counter.worker_id,
+        # 多 worker 部署时转发给任务所在 worker 的请求数
+        "forwarded_requests": worker_router.forwarded if worker_router is not None else 0,
+        "cache_size": len(document_cache),
+        "deduplicated_uploads": document_cache.deduplicated,
+        "scheduled_expiries": len(expiry),
+        "admission": {limit.resource: limit.status()
+                      for limit in (upload_admission, parse_admission, job_admission, socket_admission)},
+        "active_jobs": job_manager.active_count(),
+        "upstream": translation_client.metrics(),
+        # 经由共享连接池的上游（多 worker 时为转发到其他 worker 的请求）的连接复用统计
+        "http_clients": http_clients.metrics(),
+        "document_audio": {
+            "jobs": len(audio_jobs.jobs),
+            "cached": len(audio_jobs.cache),
+            "cache_hits": audio_jobs.cache.hits
+        },
+        "translation_memory": {
+            "reused": job_manager.memory_reused,
+            "hinted": job_manager.memory_hinted
+        },
         "features": {
             "enhanced_translation": True,
             "web_speech_tts": True,
-            "cantonese_optimization": True
+            "cantonese_optimization": True,
+            "batch_jobs": True,
+            "streaming_partials": translation_client.stream_func is not None,
+            "jyutping": jyutping_annotator.available,
+            "script_conversion": all(script_converter.available(script) for script in SCRIPTS)
         }
     }
-    logger.info(f"🏥 健康检查: {health_info}")
+    logger.info("🏥 健康检查", extra={"category": "probe", "fields": {"connections": health_info["connections"]}})
     return health_info
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+# 诊断接口：设置 ADMIN_TOKEN 后启用，请求需带 Authorization: Bearer <token>；
+# 未设置时全部返回 404。各工具只在启动后工作，平时没有开销
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+cpu_profiler = SamplingProfiler()
+memory_tracer = MemoryTracer()
+loop_lag = LoopLagMonitor()
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="需要管理员令牌")
+
+admin = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+def collapsed_response(text: str, name: str) -> PlainTextResponse:
+    """collapsed stacks 作为附件下载，可用 flamegraph.pl 或 speedscope 打开"""
+    filename = f"{name}-{manager.counter.worker_id}-{int(time.time())}.collapsed"
+    return PlainTextResponse(text, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@admin.post("/profile/cpu/start")
+async def start_cpu_profile(interval: float = 0.005, duration: float = 60):
+    """开始 CPU 采样，duration 秒后自动停止（最长 10 分钟）"""
+    try:
+        cpu_profiler.start(interval=max(interval, 0.001), duration=min(duration, 600))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return cpu_profiler.status()
+
+@admin.post("/profile/cpu/stop")
+async def stop_cpu_profile():
+    """停止采样并下载 collapsed stacks"""
+    await asyncio.to_thread(cpu_profiler.stop)
+    return collapsed_response(cpu_profiler.collapsed(), "cpu")
+
+@admin.get("/profile/cpu")
+async def cpu_profile_status():
+    return cpu_profiler.status()
+
+@admin.get("/tasks")
+async def asyncio_tasks():
+    """事件循环中所有任务及其 await 链，文件翻译任务名为 file-translation:<client>:<file>"""
+    tasks = dump_tasks()
+    return {"worker": manager.counter.worker_id, "count": len(tasks), "tasks": tasks}
+
+@admin.post("/memory/start")
+async def start_memory_trace(frames: int = 16):
+    try:
+        memory_tracer.start(frames=min(max(frames, 1), 64))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"running": True}
+
+@admin.get("/memory")
+async def memory_top(limit: int = 20, growth: bool = False):
+    """分配热点；growth=true 时只看启动跟踪后的增长"""
+    try:
+        return await asyncio.to_thread(memory_tracer.top, limit, growth)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@admin.get("/memory/collapsed")
+async def memory_collapsed():
+    try:
+        text = await asyncio.to_thread(memory_tracer.collapsed)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return collapsed_response(text, "memory")
+
+@admin.post("/memory/stop")
+async def stop_memory_trace():
+    memory_tracer.stop()
+    return {"running": False}
+
+@admin.post("/loop-lag/start")
+async def start_loop_lag(interval: float = 0.1):
+    try:
+        loop_lag.start(interval=max(interval, 0.01))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return loop_lag.status()
+
+@admin.get("/loop-lag")
+async def loop_lag_status():
+    return loop_lag.status()
+
+@admin.post("/loop-lag/stop")
+async def stop_loop_lag():
+    await loop_lag.stop()
+    return loop_lag.status()
+
+app.include_router(admin)
+
+def upload_response(document: dict, filename: str, deduplicated: bool = False) -> dict:
+    """上传结果；文档已有翻译任务时附带任务状态，完成的译文可直接通过 /jobs 接口获取"""
+    response = {
+        "file_id": document["file_id"],
+        "filename": filename,
+        "size": document["size"],
+        "text_length": document["text_length"],
+        "status": "success",
+        "deduplicated": deduplicated
+    }
+    job = job_manager.get(document["job_id"]) if document["job_id"] else None
+    if job is not None:
+        response["job"] = job.to_dict()
+    return response
+
+def admit_job(client: str, create):
+    """经准入检查后创建任务，任务运行期间占用 client 的任务名额；超出上限时抛出 AdmissionRejected"""
+    ticket = job_admission.acquire(client)
+    try:
+        job = create()
+    except BaseException:
+        ticket.release()
+        raise
+    job.task.add_done_callback(lambda _: ticket.release())
+    return job
+
+def document_job(document: dict, filename: Optional[str] = None, client: str = "unknown"):
+    """文档已有进行中或已完成的翻译任务时直接复用，否则创建新任务；任务运行期间及结束后 CACHE_TTL 秒内持有文档引用。
+    文档文件已被删除时返回 None；新建任务超出准入上限时抛出 AdmissionRejected"""
+    job = job_manager.get(document["job_id"]) if document["job_id"] else None
+    if job is not None and job.status in (JOB_RUNNING, JOB_COMPLETED) and filename in (None, job.filename):
+        logger.info(f"♻️ 复用文档 {document['file_id']} 的翻译任务 {job.job_id}")
+        return job
+    
+    # 段落表直接映射磁盘文档，不复制到内存
+    paragraphs = document_cache.paragraphs(document["file_id"])
+    if paragraphs is None:
+        return None
+    job = admit_job(client, lambda: job_manager.create_job(
+        paragraphs, filename=filename or document["filename"], file_id=document["file_id"]))
+    document["job_id"] = job.job_id
+    document_cache.acquire(document["file_id"])
+    
+    def finished(_):
+        # 任务结束后段落表释放了映射，回放和导出时要重新打开文档：文档至少保留到任务过期
+        document_cache.lease(document["file_id"], CACHE_TTL)
+        document_cache.release(document["file_id"])
+    
+    job.task.add_done_callback(finished)
+    return job
+
+# 请求体由 upload_file 在准入之后自行解析，这里只为接口文档声明表单格式
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"]
+        }}}
+    }
+}
+
+@app.post("/upload", openapi_extra=UPLOAD_OPENAPI)
+async def upload_file(request: Request):
     """上传文件"""
+    # 先做准入检查再读取请求体：声明 File(...) 参数时 FastAPI 会在进入函数前收完并落盘整个表单，
+    # 准入拒绝不了最耗资源的部分。按声明的请求大小预占解析字节数，未声明时读完后补记
+    client = client_key(request)
+    declared = int(request.headers.get("content-length") or 0)
+    with upload_admission.acquire(client), parse_admission.acquire(client, declared) as parse_ticket:
+        try:
+            form = await request.form(max_files=1, max_fields=10)
+        except Exception as e:
+            logger.warning(f"⚠️ 上传表单解析失败: {e}")
+            raise HTTPException(status_code=400, detail="无法解析上传的表单")
+        try:
+            file = form.get("file")
+            if not isinstance(file, StarletteUploadFile):
+                raise HTTPException(status_code=400, detail="没有选择文件")
+            return await process_upload(file, parse_ticket, declared)
+        finally:
+            await form.close()
+
+async def process_upload(file: UploadFile, parse_ticket, declared: int):
     try:
         logger.info(f"📁 开始处理文件上传: {file.filename}")
         
@@ -158,53 +508,63 @@ async def upload_file(file: UploadFile = File(...)):
         file_id = str(uuid.uuid4())
         logger.info(f"🔑 生成文件ID: {file_id}")
         
-        # 读取文件内容
-        content = await file.read()
-        logger.info(f"📊 文件读取完成，大小: {len(content)} 字节")
+        # 分块读取：txt 收齐后识别编码并整段解码一次，docx 边读边写入临时文件；
+        # 同时计算内容哈希，相同内容的文件直接复用已有文档
+        size = 0
+        hasher = hashlib.blake2b(digest_size=20)
+        decoder = StreamDecoder() if file_extension == '.txt' else None
+        temp_path = f"temp/{file_id}{file_extension}"
+        temp_file = open(temp_path, 'wb') if decoder is None else None
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                hasher.update(chunk)
+                if decoder is not None:
+                    decoder.feed(chunk)
+                else:
+                    temp_file.write(chunk)
+        finally:
+            if temp_file is not None:
+                temp_file.close()
+        logger.info(f"📊 文件读取完成，大小: {size} 字节")
+        parse_ticket.grow(size - declared)
+        
+        digest = f"{file_extension}:{hasher.hexdigest()}"
+        existing = await document_cache.find(digest)
+        if existing is not None:
+            if decoder is None:
+                file_reaper.discard(temp_path)
+            document_cache.lease(existing["file_id"])
+            document_cache.deduplicated += 1
+            logger.info(f"♻️ 文件内容已存在，复用文件ID: {existing['file_id']}")
+            return upload_response(existing, file.filename, deduplicated=True)
         
         # 处理文件内容
-        if file_extension == '.txt':
-            try:
-                text_content = content.decode('utf-8')
-            except UnicodeDecodeError:
-                try:
-                    text_content = content.decode('gbk')
-                except UnicodeDecodeError:
-                    text_content = content.decode('utf-8', errors='ignore')
-        elif file_extension in ['.doc', '.docx']:
-            # 保存临时文件
-            temp_path = f"temp/{file_id}{file_extension}"
-            with open(temp_path, 'wb') as f:
-                f.write(content)
-            
+        if decoder is not None:
+            text_content = decoder.finish()
+            logger.info(f"🔤 识别文本编码: {decoder.encoding}")
+        else:
             # 提取文本
             text_content = text_processor.extract_text_from_docx(temp_path)
             
             # 删除临时文件
-            os.remove(temp_path)
+            file_reaper.discard(temp_path)
         
         logger.info(f"📝 文本提取完成，长度: {len(text_content)} 字符")
         
-        # 存储到内存缓存
-        cache_key = f"file:{file_id}"
-        cache_data = {
-            "filename": file.filename,
-            "content": text_content,
-            "upload_time": time.time(),
-            "file_id": file_id
-        }
-        memory_cache[cache_key] = cache_data
+        # 分段后写入磁盘文档存储，进程内只保留元数据
+        paragraphs = text_processor.split_text_into_paragraphs(text_content)
+        logger.info(f"📄 文本分段完成，共 {len(paragraphs)} 段")
+        document = await document_cache.add(file_id, digest, file.filename, paragraphs, size, len(text_content))
+        document_cache.lease(file_id)
         
-        logger.info(f"💾 文件缓存成功，缓存键: {cache_key}")
+        logger.info(f"💾 文件缓存成功，文件ID: {file_id}")
         logger.info(f"🎉 文件上传完成: {file.filename}")
         
-        return {
-            "file_id": file_id,
-            "filename": file.filename,
-            "size": len(content),
-            "text_length": len(text_content),
-            "status": "success"
-        }
+        return upload_response(document, file.filename)
         
     except Exception as e:
         logger.error(f"❌ 文件上传失败: {e}", exc_info=True)
@@ -213,22 +573,48 @@ async def upload_file(file: UploadFile = File(...)):
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     """增强WebSocket连接处理"""
-    await manager.connect(websocket, client_id)
+    try:
+        socket_ticket = socket_admission.acquire(client_key(websocket))
+    except AdmissionRejected as e:
+        # 连接数已满：告知客户端多久后重连，再以 1013（Try Again Later）关闭
+        await websocket.accept()
+        await websocket.send_text(serialization.dumps_str(busy_frame(e)))
+        await websocket.close(code=1013)
+        return
     
+    # connect 放在 try 内：握手失败时同样归还连接名额
     try:
+        await manager.connect(websocket, client_id)
+        
         while True:
             # 接收客户端消息
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = serialization.loads(data)
             
-            logger.info(f"📨 收到来自 {client_id} 的消息: {message.get('type', 'unknown')}")
+            logger.info("📨 收到来自 %s 的消息: %s", client_id, message.get('type', 'unknown'),
+                        extra={"category": "frame"})
+            
+            if message["type"] in ("translate_file", "translate_text"):
+                # 译文的显示方式：script 为 simplified / traditional（不填保持原样），jyutping 为 true 时附带粤拼
+                try:
+                    script = requested_script(message.get("script"))
+                except ValueError as e:
+                    await manager.send_personal_message({"type": "error", "message": str(e)}, client_id)
+                    continue
+                jyutping = bool(message.get("jyutping"))
             
             if message["type"] == "translate_file":
-                # 开始翻译文件
-                await handle_file_translation(client_id, message["file_id"])
+                # 开始翻译文件；事件在后台转发，接收循环继续处理 focus 等消息
+                start_file_translation(client_id, message["file_id"], client_key(websocket), script, jyutping)
+            elif message["type"] == "focus":
+                # 客户端可见的段落范围优先翻译
+                handle_focus(client_id, message)
             elif message["type"] == "translate_text":
                 # 翻译单段文本
-                await handle_text_translation(client_id, message["text"])
+                await handle_text_translation(client_id, message["text"], script, jyutping)
+            elif message["type"] == "generate_document_audio":
+                # 整篇译文预生成语音，按播放顺序推送播放列表
+                start_document_audio(client_id, message["job_id"], int(message.get("after", 0)))
             elif message["type"] == "generate_audio":
                 # 生成语音
                 await handle_audio_generation(client_id, message["text"], message.get("paragraph_id"))
@@ -239,80 +625,118 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     except Exception as e:
         logger.error(f"❌ WebSocket错误 {client_id}: {e}", exc_info=True)
         manager.disconnect(client_id)
+    finally:
+        socket_ticket.release()
+
+def start_file_translation(client_id: str, file_id: str, client: str,
+                           script: Optional[str] = None, jyutping: bool = False):
+    """在后台协程中翻译文件；同一客户端再次发起时停止转发上一个任务"""
+    previous = manager.forward_tasks.pop(client_id, None)
+    if previous is not None:
+        previous.cancel()
+    task = asyncio.create_task(handle_file_translation(client_id, file_id, client, script, jyutping),
+                               name=f"file-translation:{client_id}:{file_id}")
+    manager.forward_tasks[client_id] = task
+
+    def forget(done: asyncio.Task):
+        if manager.forward_tasks.get(client_id) is done:
+            del manager.forward_tasks[client_id]
+
+    task.add_done_callback(forget)
 
-async def handle_file_translation(client_id: str, file_id: str):
-    """处理文件翻译（增强版）"""
+def handle_focus(client_id: str, message: dict):
+    """把可见范围内尚未开始的段落提到翻译队列最前"""
+    job_id = manager.file_jobs.get(client_id)
+    if job_id is None:
+        return
+    try:
+        start, end = int(message["start"]), int(message["end"])
+    except (KeyError, TypeError, ValueError):
+        logger.warning(f"⚠️ 无效的 focus 消息: {message}")
+        return
+    moved = job_manager.focus(job_id, start, end)
+    logger.info("🎯 客户端 %s 关注段落 %s-%s，提前 %s 组", client_id, start, end, moved,
+                extra={"category": "frame"})
+
+def requested_script(value) -> Optional[str]:
+    """客户端要求的译文字体；不填表示保持原样，不支持的字体抛出 ValueError"""
+    if not value:
+        return None
+    if value not in SCRIPTS:
+        raise ValueError(f"不支持的字体: {value}")
+    return value
+
+def output_script(script: Optional[str], detect: Callable[[], Optional[str]]) -> Optional[str]:
+    """译文的输出字体：客户端指定的字体；没有指定而原文在翻译前被统一成 SOURCE_SCRIPT 时，
+    转换回原文的字体（detect 判断），繁体原文不会显示成简体译文"""
+    if script or not SOURCE_SCRIPT:
+        return script
+    detected = detect()
+    return detected if detected != SOURCE_SCRIPT else None
+
+def job_script(job, script: Optional[str]) -> Optional[str]:
+    return output_script(script, lambda: script_converter.detect_document(job.paragraphs))
+
+def with_jyutping(event: dict) -> dict:
+    """为带译文的消息附加 jyutping：与 translated 的字符一一对应的粤拼，标点等为 null；注音功能关闭时原样返回"""
+    if event.get("error") or not isinstance(event.get("translated"), str):
+        return event
+    readings = jyutping_annotator.annotate(event["translated"])
+    return event if readings is None else {**event, "jyutping": readings}
+
+def render_event(event: dict, script: Optional[str] = None, jyutping: bool = False) -> dict:
+    """按客户端的要求渲染消息：译文（含流式增量）转换成 script 字体，再附加粤拼；任务日志里的事件不修改"""
+    if script:
+        if isinstance(event.get("translated"), str) and not event.get("error"):
+            event = {**event, "translated": script_converter.convert(event["translated"], script)}
+        elif event.get("type") == "translation_partial":
+            event = {**event, "delta": script_converter.convert(event["delta"], script)}
+    return with_jyutping(event) if jyutping else event
+
+async def handle_file_translation(client_id: str, file_id: str, client: str,
+                                  script: Optional[str] = None, jyutping: bool = False):
+    """处理文件翻译（增强版）；译文按 script 字体发送，jyutping 为 True 时附带粤拼"""
     try:
         logger.info(f"🔄 开始增强文件翻译 - 客户端: {client_id}, 文件ID: {file_id}")
         
         # 从内存缓存获取文件内容
-        cache_key = f"file:{file_id}"
+        file_data = await document_cache.get(file_id)
         
-        if cache_key not in memory_cache:
-            logger.error(f"❌ 缓存中未找到文件: {cache_key}")
+        if file_data is None:
+            logger.error(f"❌ 缓存中未找到文件: {file_id}")
             await manager.send_personal_message({
                 "type": "error",
                 "message": f"文件未找到或已过期 (ID: {file_id})"
             }, client_id)
             return
         
-        file_data = memory_cache[cache_key]
-        content = file_data["content"]
-        
         logger.info(f"✅ 从缓存获取文件成功: {file_data['filename']}")
         
-        # 分段处理文本
-        paragraphs = text_processor.split_text_into_paragraphs(content)
-        logger.info(f"📄 文本分段完成，共 {len(paragraphs)} 段")
-        
-        # 发送开始信号
-        await manager.send_personal_message({
-            "type": "translation_start",
-            "total_paragraphs": len(paragraphs),
-            "filename": file_data["filename"],
-            "enhancement": "地道粤语翻译"
-        }, client_id)
-        
-        # 逐段翻译（使用增强版本）
-        for i, paragraph in enumerate(paragraphs):
-            if paragraph.strip():
-                logger.info(f"🔤 增强翻译第 {i+1}/{len(paragraphs)} 段: {paragraph[:50]}...")
-                
-                try:
-                    # 使用增强翻译服务
-                    translated = await translation_service.translate_to_cantonese(paragraph.strip())
-                    logger.info(f"✅ 增强翻译完成: {translated[:50]}...")
-                    
-                    # 发送翻译结果
-                    await manager.send_personal_message({
-                        "type": "translation_result",
-                        "paragraph_id": i,
-                        "original": paragraph.strip(),
-                        "translated": translated,
-                        "progress": ((i + 1) / len(paragraphs)) * 100,
-                        "enhancement": "cantonese_optimized"
-                    }, client_id)
-                    
-                    # 短暂延迟
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as e:
-                    logger.error(f"❌ 段落翻译失败: {e}")
-                    # 发送错误，但继续处理下一段
-                    await manager.send_personal_message({
-                        "type": "translation_result",
-                        "paragraph_id": i,
-                        "original": paragraph.strip(),
-                        "translated": f"翻译出错: {paragraph.strip()}",
-                        "progress": ((i + 1) / len(paragraphs)) * 100
-                    }, client_id)
-        
-        # 发送完成信号
-        logger.info("🎉 增强文件翻译完成")
-        await manager.send_personal_message({
-            "type": "translation_complete",
-            "enhancement": "cantonese_enhanced"
-        }, client_id)
+        # 交给并发翻译引擎（相同文档复用已有任务），并把任务事件转发给客户端
+        try:
+            job = document_job(file_data, client=client)
+        except AdmissionRejected as e:
+            await manager.send_personal_message(busy_frame(e), client_id)
+            return
+        if job is None:
+            await manager.send_personal_message({
+                "type": "error",
+                "message": f"文件未找到或已过期 (ID: {file_id})"
+            }, client_id)
+            return
+        manager.file_jobs[client_id] = job.job_id
+        script = job_script(job, script)
+        events = job.stream_events()
+        try:
+            async for _, event in events:
+                if client_id not in manager.active_connections:
+                    logger.info(f"🔌 客户端 {client_id} 已断开，任务 {job.job_id} 继续在后台运行")
+                    break
+                await manager.send_personal_message(render_event(event, script, jyutping), client_id)
+        finally:
+            await events.aclose()
+            if manager.file_jobs.get(client_id) == job.job_id:
+                del manager.file_jobs[client_id]
         
     except Exception as e:
         logger.error(f"❌ 增强文件翻译失败: {e}", exc_info=True)
@@ -321,18 +745,20 @@ async def handle_file_translation(client_id: str, file_id: str):
             "message": f"增强翻译失败: {str(e)}"
         }, client_id)
 
-async def handle_text_translation(client_id: str, text: str):
+async def handle_text_translation(client_id: str, text: str, script: Optional[str] = None, jyutping: bool = False):
     """处理文本翻译（增强版）"""
     try:
-        logger.info(f"🔤 增强文本翻译: {text[:50]}...")
-        translated = await translation_service.translate_to_cantonese(text)
-        await manager.send_personal_message({
+        logger.info("🔤 增强文本翻译", extra={"category": "paragraph", "fields": {"chars": len(text)}})
+        translated = await job_manager.translate_text(text)
+        script = output_script(script, lambda: script_converter.detect(text))
+        result = {
             "type": "text_translation_result",
             "original": text,
             "translated": translated,
             "enhancement": "cantonese_optimized"
-        }, client_id)
-        logger.info("✅ 增强文本翻译完成")
+        }
+        await manager.send_personal_message(render_event(result, script, jyutping), client_id)
+        logger.info("✅ 增强文本翻译完成", extra={"category": "paragraph"})
     except Exception as e:
         logger.error(f"❌ 增强文本翻译失败: {e}")
         await manager.send_personal_message({
@@ -343,7 +769,7 @@ async def handle_text_translation(client_id: str, text: str):
 async def handle_audio_generation(client_id: str, text: str, paragraph_id: Optional[int] = None):
     """处理语音生成（Web版本）"""
     try:
-        logger.info(f"🔊 生成Web语音: {text[:50]}...")
+        logger.info("🔊 生成Web语音", extra={"category": "paragraph", "fields": {"chars": len(text)}})
         audio_id = await tts_service.generate_speech(text)
         
         # 获取音频配置
@@ -355,7 +781,7 @@ async def handle_audio_generation(client_id: str, text: str, paragraph_id: Optio
             "paragraph_id": paragraph_id,
             "web_speech": True
         }, client_id)
-        logger.info("✅ Web语音配置生成完成")
+        logger.info("✅ Web语音配置生成完成", extra={"category": "paragraph"})
     except Exception as e:
         logger.error(f"❌ Web语音生成失败: {e}")
         await manager.send_personal_message({
@@ -363,50 +789,284 @@ async def handle_audio_generation(client_id: str, text: str, paragraph_id: Optio
             "message": f"语音生成失败: {str(e)}"
         }, client_id)
 
+def document_audio_job(job_id: str):
+    """为已完成的翻译任务创建或复用整篇语音任务；任务不存在时抛出 KeyError，未完成时抛出 ValueError"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise KeyError(job_id)
+    if job.status != JOB_COMPLETED:
+        raise ValueError("翻译尚未完成")
+    return audio_jobs.create(job.job_id, [(index, job.results[index] or "")
+                                          for index in range(job.total) if not job.errors[index]])
+
+def start_document_audio(client_id: str, job_id: str, after: int = 0):
+    """在后台转发整篇语音的播放列表；同一客户端再次发起时停止上一次转发"""
+    previous = manager.audio_tasks.pop(client_id, None)
+    if previous is not None:
+        previous.cancel()
+    task = asyncio.create_task(forward_document_audio(client_id, job_id, after), name=f"audio-forward:{client_id}")
+    manager.audio_tasks[client_id] = task
+
+    def forget(done: asyncio.Task):
+        if manager.audio_tasks.get(client_id) is done:
+            del manager.audio_tasks[client_id]
+
+    task.add_done_callback(forget)
+
+async def forward_document_audio(client_id: str, job_id: str, after: int):
+    """按顺序推送 document_audio_item，客户端收到第一条即可开始连续播放"""
+    try:
+        audio_job = document_audio_job(job_id)
+    except KeyError:
+        await manager.send_personal_message({"type": "error", "message": "任务未找到或已过期"}, client_id)
+        return
+    except ValueError as e:
+        await manager.send_personal_message({"type": "error", "message": str(e)}, client_id)
+        return
+    
+    await manager.send_personal_message({"type": "document_audio_start", **audio_job.to_dict()}, client_id)
+    async for entry in audio_job.stream(after):
+        if client_id not in manager.active_connections:
+            return
+        await manager.send_personal_message({"type": "document_audio_item", "job_id": job_id, **entry}, client_id)
+    await manager.send_personal_message({"type": "document_audio_complete", **audio_job.to_dict()}, client_id)
+
+@app.post("/jobs/{job_id}/audio", status_code=202)
+async def create_document_audio(job_id: str):
+    """为已完成的翻译任务预生成整篇语音"""
+    try:
+        return document_audio_job(job_id).to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail="任务未找到或已过期")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/jobs/{job_id}/audio")
+async def get_document_audio(job_id: str):
+    """整篇语音的进度和播放列表（从头开始连续就绪的部分）"""
+    audio_job = audio_jobs.get(job_id)
+    if audio_job is None:
+        raise HTTPException(status_code=404, detail="语音任务未找到或已过期")
+    status = audio_job.to_dict()
+    status["playlist"] = audio_job.entries[:status["ready"]]
+    return status
+
 @app.get("/audio/{audio_id}")
-async def get_audio_config(audio_id: str):
+async def get_audio_config(audio_id: str, request: Request):
     """获取音频配置"""
     try:
         config = tts_service.get_audio_config(audio_id)
-        return JSONResponse(content=config)
+        return FastJSONResponse(content=config)
     except Exception as e:
+        # 多 worker 部署时音频可能是其他 worker 生成的
+        if worker_router is not None:
+            response = await worker_router.fetch_any(request.scope)
+            if response is not None:
+                return response
         logger.error(f"获取音频配置失败: {e}")
         raise HTTPException(status_code=404, detail="音频配置未找到")
 
-# 清理过期缓存的定时任务
-async def cleanup_cache():
-    """清理过期的缓存"""
-    while True:
-        try:
-            current_time = time.time()
-            expired_keys = []
-            
-            for key, data in memory_cache.items():
-                # 缓存1小时后过期
-                if current_time - data.get('upload_time', 0) > 3600:
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                del memory_cache[key]
-                logger.info(f"🗑️ 清理过期缓存: {key}")
-            
-            if expired_keys:
-                logger.info(f"🧹 清理了 {len(expired_keys)} 个过期缓存项")
-            
-            # 清理旧音频文件
-            tts_service.cleanup_old_files()
-                
-        except Exception as e:
-            logger.error(f"❌ 缓存清理失败: {e}")
-        
-        # 每10分钟清理一次
-        await asyncio.sleep(600)
+class JobRequest(BaseModel):
+    """批量翻译任务请求：按已上传文件ID或直接提供文本列表"""
+    file_id: Optional[str] = None
+    texts: Optional[List[str]] = None
+    filename: Optional[str] = None
+
+class FocusRequest(BaseModel):
+    """客户端可见的段落范围"""
+    start: int
+    end: int
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest, http_request: Request):
+    """创建批量翻译任务"""
+    client = client_key(http_request)
+    if request.file_id:
+        file_data = await document_cache.get(request.file_id)
+        if file_data is None:
+            raise HTTPException(status_code=404, detail=f"文件未找到或已过期 (ID: {request.file_id})")
+        job = document_job(file_data, request.filename, client=client)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"文件未找到或已过期 (ID: {request.file_id})")
+    elif request.texts:
+        job = admit_job(client, lambda: job_manager.create_job(request.texts, filename=request.filename or ""))
+    else:
+        raise HTTPException(status_code=400, detail="需要提供 file_id 或 texts")
+    
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "total_paragraphs": job.total
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询翻译任务进度"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务未找到或已过期")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, script: Optional[str] = None, jyutping: bool = False):
+    """以 NDJSON 流式返回翻译结果，任务进行中会持续输出直到完成；
+    script 指定译文字体（simplified / traditional），jyutping=true 时附带逐字粤拼"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务未找到或已过期")
+    try:
+        script = job_script(job, requested_script(script))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def iter_results():
+        async for _, event in job.stream_events():
+            if event["type"] != "translation_result":
+                continue
+            line = {
+                "paragraph_id": event["paragraph_id"],
+                "original": event["original"],
+                "translated": event["translated"],
+                "error": event.get("error", False)
+            }
+            yield serialization.dumps(render_event(line, script, jyutping)) + b"\n"
+    
+    return StreamingResponse(iter_results(), media_type="application/x-ndjson")
+
+# Server-Sent Events：浏览器断线后自动重连并带上 Last-Event-ID，这里的重连间隔和代理空闲超时前的心跳间隔
+SSE_RETRY_MS = 3000
+SSE_KEEPALIVE = 15
+
+async def iter_sse(job, after: int, script: Optional[str] = None, jyutping: bool = False):
+    """把任务事件编码为 SSE；持久化事件的 id 为日志序号，流式增量不带 id"""
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    events = job.stream_events(after=after)
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=SSE_KEEPALIVE)
+            if not done:
+                # 注释行，防止代理因连接空闲而断开
+                yield ": keepalive\n\n"
+                continue
+            try:
+                seq, event = pending.result()
+            except StopAsyncIteration:
+                break
+            pending = None
+            event = render_event(event, script, jyutping)
+            head = f"id: {seq}\ndata: " if seq is not None else "data: "
+            yield head.encode() + serialization.dumps(event) + b"\n\n"
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.wait({pending})
+        await events.aclose()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, last_event_id: Optional[int] = None,
+                     script: Optional[str] = None, jyutping: bool = False):
+    """以 SSE 推送与 WebSocket 相同的任务事件，供 WebSocket 不可用的环境使用。
+    重连时从 Last-Event-ID（或 last_event_id 参数）之后继续，已推送的段落不会重发，也不会重新翻译"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务未找到或已过期")
+    try:
+        script = job_script(job, requested_script(script))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    header = request.headers.get("last-event-id", "")
+    after = int(header) if header.isdigit() else (last_event_id or 0)
+    return StreamingResponse(
+        iter_sse(job, max(0, after), script, jyutping),
+        media_type="text/event-stream",
+        # 关闭 nginx 等反向代理的响应缓冲，事件立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs/{job_id}/focus")
+async def focus_job(job_id: str, request: FocusRequest):
+    """SSE 客户端的 focus 消息：优先翻译可见范围内的段落"""
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="任务未找到或已过期")
+    return {"moved": job_manager.focus(job_id, request.start, request.end)}
+
+@app.get("/jobs/{job_id}/export")
+async def export_job(job_id: str, format: str = "docx", bilingual: bool = True, script: Optional[str] = None):
+    """流式导出译文：format 为 docx 或 txt，bilingual 表示原文与粤语对照，script 指定译文字体"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务未找到或已过期")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail="翻译尚未完成")
+    try:
+        script = job_script(job, requested_script(script))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    pairs = job.iter_pairs()
+    if script:
+        pairs = ((original, script_converter.convert(translated, script)) for original, translated in pairs)
+    if format == "docx":
+        body, media_type = iter_docx(pairs, bilingual=bilingual), DOCX_MEDIA_TYPE
+    elif format == "txt":
+        body, media_type = iter_txt(pairs, bilingual=bilingual), TXT_MEDIA_TYPE
+    else:
+        raise HTTPException(status_code=400, detail="不支持的导出格式")
+    
+    stem = Path(job.filename).stem if job.filename else job.job_id
+    suffix = "双语" if bilingual else "粤语"
+    download_name = quote(f"{stem}_{suffix}.{format}")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{download_name}"}
+    )
+
+# 缓存过期回调
+async def cleanup_audio_files(key: str):
+    """在线程池中清理旧音频文件，并安排下一次清理"""
+    try:
+        await asyncio.to_thread(tts_service.cleanup_old_files)
+    except Exception as e:
+        logger.error(f"❌ 音频清理失败: {e}")
+    expiry.schedule(key, AUDIO_CLEANUP_INTERVAL, cleanup_audio_files)
 
-# 启动时创建清理任务
+async def sweep_documents(key: str):
+    """在线程池中删除磁盘上已过期的文档（包括进程重启前留下的），并安排下一次清理"""
+    try:
+        await document_cache.sweep()
+    except Exception as e:
+        logger.error(f"❌ 文档清理失败: {e}")
+    expiry.schedule(key, AUDIO_CLEANUP_INTERVAL, sweep_documents)
+
+# 启动时创建过期调度任务
 @app.on_event("startup")
 async def startup_event():
-    logger.info("🚀 增强应用启动，创建缓存清理任务")
-    asyncio.create_task(cleanup_cache())
+    logger.info("🚀 增强应用启动，创建过期调度任务")
+    # 已登记的上游（翻译 / TTS 服务实现登记的，以及多 worker 时的任务转发）在这里创建连接池
+    await http_clients.start()
+    if worker_router is not None:
+        await worker_router.start()
+    expiry.start()
+    file_reaper.start()
+    await manager.counter.start()
+    expiry.schedule("audio:cleanup", AUDIO_CLEANUP_INTERVAL, cleanup_audio_files)
+    expiry.schedule("docs:sweep", 0, sweep_documents)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    cpu_profiler.stop()
+    await loop_lag.stop()
+    await manager.counter.stop()
+    if worker_router is not None:
+        await worker_router.stop()
+    await expiry.stop()
+    await file_reaper.stop()
+    await http_clients.close()
 
 if __name__ == "__main__":
     # Replit环境检测和配置
@@ -14,6 +14,7 @@ import os
 
 # 导入火山方舟翻译服务
 from services.volcengine_translation_service import create_volcengine_translation_service
+from services.upstream_client import CircuitOpenError, ResilientClient
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +31,8 @@ VOLCENGINE_API_KEY = "75daa9cc-4673-4a3a-a578-3ac1ac988578"
 
 # 全局翻译服务实例
 translation_service = None
+# 带限速、自适应并发、重试和熔断的上游调用客户端
+translation_client = None
 
 class TranslationRequest(BaseModel):
     """翻译请求模型"""
@@ -45,10 +48,15 @@ class TranslationResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
-    global translation_service
+    global translation_service, translation_client
     try:
         # 初始化火山方舟翻译服务
         translation_service = create_volcengine_translation_service(VOLCENGINE_API_KEY)
+        translation_client = ResilientClient(
+            translation_service.translate_to_cantonese,
+            max_concurrency=int(os.environ.get("TRANSLATION_CONCURRENCY", 8)),
+            rate=float(os.environ.get("UPSTREAM_RATE_LIMIT", 0)) or None
+        )
         logger.info("火山方舟翻译服务初始化成功")
     except Exception as e:
         logger.error(f"翻译服务初始化失败: {e}")
@@ -77,13 +85,20 @@ async def translate_text(request: TranslationRequest):
         original_text = request.text.strip()
         
         # 检查翻译服务是否可用
-        if translation_service is None:
+        if translation_client is None:
             raise HTTPException(status_code=500, detail="翻译服务未初始化")
         
         logger.info(f"开始翻译: {original_text[:50]}...")
         
-        # 使用火山方舟大模型进行翻译
-        translated_text = translation_service.translate_to_cantonese(original_text)
+        # 使用火山方舟大模型进行翻译（同步SDK调用放到线程池，不阻塞事件循环）
+        try:
+            translated_text = await translation_client(original_text)
+        except CircuitOpenError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(int(e.retry_after))}
+            )
         
         if not translated_text:
             raise HTTPException(status_code=500, detail="翻译失败，请稍后重试")
@@ -114,7 +129,8 @@ async def health_check():
         "status": "healthy",
         "service": "古文翻译粤语应用",
         "translation_engine": "火山方舟大模型",
-        "version": "2.0"
+        "version": "2.0",
+        "upstream": translation_client.metrics() if translation_client else None
     }
 
 @app.exception_handler(Exception)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+生产环境启动脚本：多个 uvicorn worker 进程
+
+uvicorn 的 worker 共享同一个监听 socket，请求随机落到其中一个 worker 上。上传的文档保存在磁盘文档存储中，
+所有 worker 都能读取；翻译任务、事件日志和整篇语音保存在创建它们的 worker 内，/jobs/{job_id}/* 请求
+落到其他 worker 时经由 WORKER_SOCKET_DIR 下的 Unix socket 转发给任务所在的 worker（services.worker_routing），
+因此不需要粘性会话。WebSocket 消息都由持有连接的 worker 发送。所有 worker 必须运行在同一台机器上。
+
+环境变量：
+    PORT            监听端口（默认 8000）
+    WEB_CONCURRENCY worker 数量（默认 CPU 核数，最多 4 个）；并发上限、准入控制等参数按 worker 计算
+    APP_MODULE      应用入口（默认 main_enhanced:app）
+    WORKER_SOCKET_DIR  worker 之间转发任务请求的 Unix socket 目录（默认 temp/workers）
+    REDIS_URL       可选，配置后 /health 的 connections 为所有 worker 的 WebSocket 连接总数
+    FORWARDED_ALLOW_IPS  信任其 X-Forwarded-For 的代理地址，逗号分隔（默认 127.0.0.1，"*" 表示信任所有来源）；
+                    部署在反向代理或 PaaS 入口之后时必须配置，否则所有客户端都被识别为代理地址，共用准入控制的每客户端上限
+"""
+
+import multiprocessing
+import os
+import sys
+
+import uvicorn
+
+if __name__ == "__main__":
+    # 设置正确的Python路径
+    sys.path.insert(0, '.')
+
+    port = int(os.environ.get("PORT", 8000))
+    workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+    app_module = os.environ.get("APP_MODULE", "main_enhanced:app")
+    # worker 进程据此启用任务转发
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    if workers > 1 and not os.environ.get("REDIS_URL"):
+        print("ℹ️  未配置 REDIS_URL：/health 的连接数只统计处理该请求的 worker")
+
+    print(f"🚀 启动 {app_module}，{workers} 个 worker，端口 {port}")
+
+    # 多 worker 必须以导入字符串的方式传入应用
+    uvicorn.run(
+        app_module,
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        proxy_headers=True,
+        forwarded_allow_ips=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        log_level="info"
+    )
@@ -0,0 +1,132 @@
+"""
+准入控制
+对进行中的上传、正在解析的字节数、运行中的翻译任务和 WebSocket 连接分别设置全局上限和每客户端上限，
+超出时立即拒绝（全局满 503，单个客户端超额 429），而不是让所有请求一起变慢。
+拒绝时给出的 Retry-After 按当前占用量和近期每次占用的平均时长估算。
+
+上限按 worker 进程计算；0 表示不限制。单个请求的用量超过全局上限时，只要当前没有其他占用仍会放行，
+避免大文件永远无法上传。
+"""
+
+import logging
+import math
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """超出准入上限；status_code 为 429（单个客户端超额）或 503（全局繁忙）"""
+
+    def __init__(self, resource: str, status_code: int, retry_after: int):
+        super().__init__(f"{resource} 超出准入上限，{retry_after} 秒后重试")
+        self.resource = resource
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """一次准入占用的名额，release 可以重复调用"""
+
+    __slots__ = ("_limit", "client", "amount", "started", "_released")
+
+    def __init__(self, limit: "AdmissionLimit", client: str, amount: int):
+        self._limit = limit
+        self.client = client
+        self.amount = amount
+        self.started = time.monotonic()
+        self._released = False
+
+    def grow(self, amount: int):
+        """事后补记用量（如上传未声明 Content-Length），不做准入检查"""
+        if amount > 0 and not self._released:
+            self._limit._add(self.client, amount)
+            self.amount += amount
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limit._release(self)
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionLimit:
+    """单一资源的准入计数：全局上限 limit 和每客户端上限 per_client"""
+
+    def __init__(self, resource: str, limit: int = 0, per_client: int = 0, max_retry_after: int = 60):
+        self.resource = resource
+        self.limit = limit
+        self.per_client = per_client
+        self.max_retry_after = max_retry_after
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._clients: Dict[str, int] = {}
+        # 每次占用的平均时长（指数移动平均）
+        self._hold = 1.0
+
+    def acquire(self, client: str, amount: int = 1) -> Ticket:
+        """占用 amount 个单位；超出上限时抛出 AdmissionRejected"""
+        used = self._clients.get(client, 0)
+        if self.per_client and used and used + amount > self.per_client:
+            self._reject(429, used + amount - self.per_client, used)
+        if self.limit and self.in_use and self.in_use + amount > self.limit:
+            self._reject(503, self.in_use + amount - self.limit, self.in_use)
+        self._add(client, amount)
+        self.admitted += 1
+        return Ticket(self, client, amount)
+
+    def _reject(self, status_code: int, excess: int, held: int):
+        # 占用中的名额在平均占用时长内陆续释放，腾出 excess 个单位大约需要 hold * excess / held
+        wait = self._hold * min(1.0, excess / held)
+        retry_after = min(self.max_retry_after, max(1, math.ceil(wait)))
+        self.rejected += 1
+        logger.info(f"🚦 {self.resource} 已满（{status_code}），建议 {retry_after} 秒后重试",
+                    extra={"category": "admission"})
+        raise AdmissionRejected(self.resource, status_code, retry_after)
+
+    def _add(self, client: str, amount: int):
+        self.in_use += amount
+        self._clients[client] = self._clients.get(client, 0) + amount
+
+    def _release(self, ticket: Ticket):
+        self.in_use -= ticket.amount
+        remaining = self._clients[ticket.client] - ticket.amount
+        if remaining > 0:
+            self._clients[ticket.client] = remaining
+        else:
+            del self._clients[ticket.client]
+        self._hold += 0.2 * (time.monotonic() - ticket.started - self._hold)
+
+    def status(self) -> dict:
+        return {
+            "in_use": self.in_use,
+            "limit": self.limit,
+            "per_client": self.per_client,
+            "clients": len(self._clients),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_hold_s": round(self._hold, 3),
+        }
+
+
+def client_key(connection) -> str:
+    """按客户端地址区分；run_production.py 开启了 proxy_headers，来自 FORWARDED_ALLOW_IPS 中代理的请求取 X-Forwarded-For 里的真实地址"""
+    client = getattr(connection, "client", None)
+    return client.host if client is not None else "unknown"
+
+
+def busy_frame(rejected: AdmissionRejected) -> dict:
+    """WebSocket 上的繁忙通知"""
+    return {
+        "type": "busy",
+        "resource": rejected.resource,
+        "retry_after": rejected.retry_after,
+        "message": f"服务繁忙，请 {rejected.retry_after} 秒后重试",
+    }
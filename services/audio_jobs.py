@@ -0,0 +1,231 @@
+"""
+整篇文档语音预生成
+翻译完成后把所有段落的粤语译文交给 TTS 提前合成：多个任务共享一个有上限的 TTS 并发池，
+按文档顺序领取段落，播放进度始终落后于合成进度；相同文本的合成结果在进程内缓存，
+重复段落和再次朗读不再调用 TTS。客户端按顺序接收播放列表条目，边合成边连续播放。
+"""
+
+import asyncio
+import collections
+import hashlib
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from services.expiry import ExpiryScheduler
+
+logger = logging.getLogger(__name__)
+
+AUDIO_RUNNING = "running"
+AUDIO_COMPLETED = "completed"
+AUDIO_FAILED = "failed"
+
+
+class AudioCache:
+    """文本哈希 -> TTS 返回的音频 ID，最近最少使用淘汰"""
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self.hits = 0
+        self._entries: "collections.OrderedDict[bytes, Any]" = collections.OrderedDict()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, text: str):
+        key = self.key(text)
+        audio_id = self._entries.get(key)
+        if audio_id is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return audio_id
+
+    def put(self, text: str, audio_id):
+        key = self.key(text)
+        self._entries[key] = audio_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DocumentAudioJob:
+    """一篇译文的播放列表：按文档顺序排列的非空段落，每段合成完成后填入条目"""
+
+    def __init__(self, job_id: str, items: List[Tuple[int, str]]):
+        self.job_id = job_id
+        # (段落下标, 译文)
+        self.items = items
+        self.entries: List[Optional[dict]] = [None] * len(items)
+        self.status = AUDIO_RUNNING
+        self.failed = 0
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._next = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    @property
+    def ready(self) -> int:
+        """从头开始连续就绪的条目数，即不等待合成就能连续播放的长度"""
+        count = 0
+        for entry in self.entries:
+            if entry is None:
+                break
+            count += 1
+        return count
+
+    @property
+    def finished(self) -> bool:
+        return self.status != AUDIO_RUNNING
+
+    def claim(self) -> Optional[int]:
+        """按顺序领取下一个待合成的位置"""
+        if self._next >= len(self.items):
+            return None
+        position = self._next
+        self._next += 1
+        return position
+
+    async def fill(self, position: int, entry: dict):
+        self.entries[position] = entry
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.time()
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def stream(self, after: int = 0) -> AsyncIterator[dict]:
+        """按播放顺序产出条目（从第 after 个开始），前面的条目未就绪时等待；任务结束后停止"""
+        position = after
+        while position < len(self.entries):
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.entries[position] is not None or self.finished)
+            entry = self.entries[position]
+            if entry is None:
+                return
+            yield entry
+            position += 1
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.finished)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "ready": self.ready,
+            "failed": self.failed,
+        }
+
+
+class AudioJobManager:
+    """按翻译任务 ID 创建和复用整篇语音任务；所有任务共享 concurrency 个 TTS 并发名额"""
+
+    def __init__(self, synthesize: Callable[[str], Any], describe: Callable[[Any], dict],
+                 concurrency: int = 4, cache: Optional[AudioCache] = None,
+                 expiry: Optional[ExpiryScheduler] = None, ttl: float = 3600):
+        # synthesize(text) 返回音频 ID，describe(音频 ID) 返回客户端播放所需的配置
+        self.synthesize = synthesize
+        self.describe = describe
+        self.concurrency = concurrency
+        self.cache = cache or AudioCache()
+        self.expiry = expiry
+        self.ttl = ttl
+        self.jobs: Dict[str, DocumentAudioJob] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # 正在合成的文本，同时请求相同文本的段落等待同一次合成
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+
+    def get(self, job_id: str) -> Optional[DocumentAudioJob]:
+        return self.jobs.get(job_id)
+
+    def create(self, job_id: str, pairs: List[Tuple[int, str]]) -> DocumentAudioJob:
+        """为译文 pairs（段落下标, 译文）创建语音任务；同一翻译任务已有未失败的语音任务时直接复用"""
+        audio_job = self.jobs.get(job_id)
+        if audio_job is not None and audio_job.status != AUDIO_FAILED:
+            return audio_job
+        audio_job = DocumentAudioJob(job_id, [(index, text) for index, text in pairs if text.strip()])
+        self.jobs[job_id] = audio_job
+        audio_job.task = asyncio.create_task(self._run(audio_job), name=f"audio:{job_id}")
+        logger.info(f"🔊 创建整篇语音任务 {job_id}，共 {audio_job.total} 段")
+        return audio_job
+
+    async def _run(self, audio_job: DocumentAudioJob):
+        async def worker():
+            while True:
+                position = audio_job.claim()
+                if position is None:
+                    return
+                await self._synthesize_item(audio_job, position)
+
+        try:
+            workers = max(1, min(self.concurrency, audio_job.total))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            await audio_job.finish(AUDIO_COMPLETED)
+            logger.info(f"🎧 整篇语音生成完成 {audio_job.job_id}，失败 {audio_job.failed} 段")
+        except asyncio.CancelledError:
+            await audio_job.finish(AUDIO_FAILED)
+            raise
+        except Exception as e:
+            await audio_job.finish(AUDIO_FAILED)
+            logger.error(f"❌ 整篇语音生成失败 {audio_job.job_id}: {e}", exc_info=True)
+        finally:
+            if self.expiry is not None:
+                self.expiry.schedule(f"audio-job:{audio_job.job_id}", self.ttl, self._expire)
+
+    async def _synthesize_item(self, audio_job: DocumentAudioJob, position: int):
+        index, text = audio_job.items[position]
+        entry = {"position": position, "paragraph_id": index, "text": text}
+        try:
+            audio_id = self.cache.get(text)
+            if audio_id is None:
+                audio_id = await self._synthesize_once(text)
+            entry["audio_config"] = self.describe(audio_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 单段失败不影响整篇，客户端跳过该条目
+            audio_job.failed += 1
+            entry["error"] = str(e)
+            logger.warning(f"⚠️ 段落 {index} 语音合成失败: {e}")
+        await audio_job.fill(position, entry)
+
+    async def _synthesize_once(self, text: str):
+        key = AudioCache.key(text)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        try:
+            async with self._semaphore:
+                audio_id = self.synthesize(text)
+                if asyncio.iscoroutine(audio_id):
+                    audio_id = await audio_id
+            self.cache.put(text, audio_id)
+            pending.set_result(audio_id)
+            return audio_id
+        except BaseException as e:
+            pending.set_exception(e if isinstance(e, Exception) else RuntimeError("语音合成已取消"))
+            # 没有其他段落在等待时，避免 "Future exception was never retrieved" 警告
+            pending.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _expire(self, key: str):
+        job_id = key.split(":", 1)[1]
+        audio_job = self.jobs.get(job_id)
+        if audio_job is not None and audio_job.finished:
+            del self.jobs[job_id]
@@ -0,0 +1,110 @@
+"""
+跨 worker 连接数统计
+多进程部署时，客户端的 WebSocket 只连在其中一个 worker 上，发给它的消息也都由这个 worker 发送。
+/health 要显示所有 worker 的连接总数：默认只统计本进程（单 worker），配置 REDIS_URL 后
+每个 worker 定期把自己的连接数写入 Redis（带过期时间），并在同一个后台循环里汇总其他 worker 的值。
+/health 只读取汇总结果，不访问 Redis；Redis 不可用时只统计本进程并在日志中提示。
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+CONNECTIONS_PREFIX = "ws:connections:"
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TTL = 15
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LocalConnectionCounter:
+    """单进程实现：连接总数即本进程连接数"""
+
+    def __init__(self):
+        self.worker_id = worker_id()
+        self.local_connections = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def total_connections(self) -> int:
+        return self.local_connections
+
+
+class RedisConnectionCounter:
+    """Redis 实现：本进程用实时值，其他 worker 用后台循环最近一次汇总的值"""
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("使用 REDIS_URL 需要安装 redis 包 (pip install redis)")
+        self.url = url
+        self.worker_id = worker_id()
+        self.local_connections = 0
+        self._other_connections = 0
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._task = asyncio.create_task(self._heartbeat(), name="connection-heartbeat")
+        logger.info(f"📡 Redis 连接数统计已启动，worker: {self.worker_id}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._redis is not None:
+            try:
+                await self._redis.delete(CONNECTIONS_PREFIX + self.worker_id)
+            except Exception as e:
+                logger.debug(f"删除连接数记录失败: {e}")
+            await self._redis.close()
+            self._redis = None
+
+    def total_connections(self) -> int:
+        return self.local_connections + self._other_connections
+
+    async def _refresh(self):
+        own_key = CONNECTIONS_PREFIX + self.worker_id
+        await self._redis.set(own_key, self.local_connections, ex=HEARTBEAT_TTL)
+        keys = [key async for key in self._redis.scan_iter(match=CONNECTIONS_PREFIX + "*") if key != own_key]
+        values = await self._redis.mget(keys) if keys else []
+        self._other_connections = sum(int(value) for value in values if value)
+
+    async def _heartbeat(self):
+        failing = False
+        while True:
+            try:
+                await self._refresh()
+                if failing:
+                    logger.info("📡 Redis 连接数统计已恢复")
+                failing = False
+            except Exception as e:
+                # 其他 worker 的连接数无从得知，暂时只统计本进程；每次中断只提示一次
+                self._other_connections = 0
+                if not failing:
+                    logger.warning(f"⚠️ Redis 连接数统计失败，暂时只统计本 worker: {e}")
+                failing = True
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+def create_connection_counter(redis_url: Optional[str] = None):
+    """配置了 Redis 地址时使用 RedisConnectionCounter，否则只统计本进程"""
+    if redis_url:
+        return RedisConnectionCounter(redis_url)
+    return LocalConnectionCounter()
@@ -0,0 +1,206 @@
+"""
+上传文档缓存
+按内容哈希去重：同一份文件再次上传时直接返回已有文档，不再提取和重复存储。
+段落文本保存在磁盘文档存储中（mmap 读取），这里只保留元数据。
+文档按引用计数保留：每次上传持有一个 ttl 秒的租约，进行中的翻译任务各持有一个引用，
+全部释放且磁盘上记录的过期时间已到（其他 worker 也可能延长）后文档才被删除。
+翻译任务持有引用期间每 ttl / 2 秒续期一次磁盘上的过期时间，运行超过 ttl 的任务不会被其他 worker
+或定期清理删掉文档；本进程持有引用的文档在清理时也直接跳过。
+元数据的读写都在线程池中进行，不阻塞事件循环。
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, Optional, Sequence, Set
+
+from services.document_store import DocumentStore
+from services.expiry import ExpiryScheduler
+from services.string_table import StringTable
+
+logger = logging.getLogger(__name__)
+
+# 只存在于本进程、不写入磁盘元数据的字段
+_LOCAL_FIELDS = ("job_id",)
+
+
+class DocumentCache:
+    """file_id -> 文档元数据（filename、hash、size 等字段），附带哈希索引和引用计数"""
+
+    def __init__(self, expiry: ExpiryScheduler, store: DocumentStore, ttl: float = 3600):
+        self.expiry = expiry
+        self.store = store
+        self.ttl = ttl
+        self.deduplicated = 0
+        self._documents: Dict[str, dict] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._refs: Dict[str, int] = {}
+        # 其中由翻译任务持有（acquire）的引用数，大于 0 时定期续期
+        self._held: Dict[str, int] = {}
+        self._lease_ids = itertools.count()
+        # 过期时间有变化、等待写入磁盘的文档；由一个后台任务依次写入，较早的时间不会覆盖较晚的
+        self._dirty: Set[str] = set()
+        self._flushing: Optional[asyncio.Task] = None
+        # 进行中的过期检查和删除（在线程池中执行）
+        self._deletions: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, file_id: str) -> bool:
+        return file_id in self._documents
+
+    async def get(self, file_id: str) -> Optional[dict]:
+        """本进程没有时从磁盘加载（其他 worker 上传或进程重启前上传的文档），并持有一个租约"""
+        document = self._documents.get(file_id)
+        if document is not None:
+            return document
+        meta = await asyncio.to_thread(self.store.load_meta, file_id)
+        if meta is None or meta["expires_at"] <= time.time():
+            return None
+        # 读取期间可能已有其他请求加载了同一文档
+        document = self._documents.get(file_id)
+        if document is None:
+            document = self._register(meta)
+            self.lease(file_id)
+        return document
+
+    async def find(self, digest: str) -> Optional[dict]:
+        """按内容哈希查找已缓存的文档"""
+        file_id = self._by_hash.get(digest) or await asyncio.to_thread(self.store.find, digest)
+        return await self.get(file_id) if file_id is not None else None
+
+    def paragraphs(self, file_id: str) -> Optional[StringTable]:
+        """以 mmap 打开文档的段落表"""
+        return self.store.open(file_id)
+
+    async def add(self, file_id: str, digest: str, filename: str, paragraphs: Sequence[str],
+                  size: int, text_length: int) -> dict:
+        """在线程池中写入磁盘并登记新文档，调用方随后用 lease 或 acquire 持有引用"""
+        now = time.time()
+        meta = {
+            "filename": filename,
+            "upload_time": now,
+            "expires_at": now + self.ttl,
+            "file_id": file_id,
+            "hash": digest,
+            "size": size,
+            "text_length": text_length,
+            "paragraphs": len(paragraphs),
+        }
+        await asyncio.to_thread(self.store.write, file_id, paragraphs, meta)
+        return self._register(meta)
+
+    def _register(self, meta: dict) -> dict:
+        document = dict(meta)
+        # 最近一次针对该文档的翻译任务
+        document["job_id"] = None
+        file_id = document["file_id"]
+        self._documents[file_id] = document
+        self._by_hash[document["hash"]] = file_id
+        self._refs[file_id] = 0
+        return document
+
+    def lease(self, file_id: str, ttl: Optional[float] = None):
+        """持有一个引用，ttl 秒后自动释放；同时延长磁盘上记录的过期时间"""
+        ttl = self.ttl if ttl is None else ttl
+        if file_id not in self._refs:
+            return
+        self._refs[file_id] += 1
+        self._extend(file_id, ttl)
+        key = f"lease:{file_id}:{next(self._lease_ids)}"
+        self.expiry.schedule(key, ttl, lambda _: self._drop(file_id))
+
+    def acquire(self, file_id: str):
+        """翻译任务持有一个引用，直到 release；持有期间定期续期磁盘上的过期时间"""
+        if file_id not in self._refs:
+            return
+        self._refs[file_id] += 1
+        self._held[file_id] = self._held.get(file_id, 0) + 1
+        if self._held[file_id] == 1:
+            self._extend(file_id, self.ttl)
+            self.expiry.schedule(f"renew:{file_id}", self.ttl / 2, self._renew)
+
+    def release(self, file_id: str):
+        """释放 acquire 持有的引用"""
+        held = self._held.get(file_id)
+        if held is None:
+            return
+        if held > 1:
+            self._held[file_id] = held - 1
+        else:
+            del self._held[file_id]
+            self.expiry.cancel(f"renew:{file_id}")
+        self._drop(file_id)
+
+    def _renew(self, key: str):
+        file_id = key.partition(":")[2]
+        if self._held.get(file_id):
+            self._extend(file_id, self.ttl)
+            self.expiry.schedule(key, self.ttl / 2, self._renew)
+
+    def live(self) -> Set[str]:
+        """本进程持有引用的文档"""
+        return set(self._refs)
+
+    async def sweep(self) -> int:
+        """在线程池中删除磁盘上已过期的文档，跳过本进程持有引用的文档"""
+        return await asyncio.to_thread(self.store.sweep, live=self.live())
+
+    def _extend(self, file_id: str, ttl: float):
+        document = self._documents.get(file_id)
+        if document is None:
+            return
+        expires_at = time.time() + ttl
+        if expires_at > document["expires_at"]:
+            document["expires_at"] = expires_at
+            self._dirty.add(file_id)
+            if self._flushing is None:
+                self._flushing = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            while self._dirty:
+                file_id = self._dirty.pop()
+                document = self._documents.get(file_id)
+                if document is not None:
+                    meta = {k: v for k, v in document.items() if k not in _LOCAL_FIELDS}
+                    await asyncio.to_thread(self._save, file_id, meta)
+        finally:
+            self._flushing = None
+
+    def _drop(self, file_id: str):
+        """释放一个引用，引用数归零时移出本进程；磁盘上也已过期时删除文件"""
+        refs = self._refs.get(file_id)
+        if refs is None:
+            return
+        if refs > 1:
+            self._refs[file_id] = refs - 1
+            return
+        del self._refs[file_id]
+        document = self._documents.pop(file_id)
+        if self._by_hash.get(document["hash"]) == file_id:
+            del self._by_hash[document["hash"]]
+        # 读取元数据和删除文件都是磁盘 I/O，放到线程池中，不阻塞事件循环
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._delete_if_expired, file_id))
+        self._deletions.add(task)
+        task.add_done_callback(self._deletions.discard)
+
+    def _delete_if_expired(self, file_id: str):
+        """磁盘上记录的过期时间已到（其他 worker 没有延长）时删除文档"""
+        if file_id in self._refs:
+            return  # 检查前又被重新加载
+        try:
+            meta = self.store.load_meta(file_id)
+            if meta is None or meta["expires_at"] <= time.time():
+                self.store.delete(file_id)
+                logger.info(f"🗑️ 清理过期文档: {file_id}")
+        except OSError as e:
+            logger.warning(f"⚠️ 文档删除失败 {file_id}: {e}")
+
+    def _save(self, file_id: str, meta: dict):
+        try:
+            self.store.save_meta(file_id, meta)
+        except OSError as e:
+            logger.warning(f"⚠️ 文档元数据写入失败 {file_id}: {e}")
@@ -0,0 +1,112 @@
+"""
+译文导出
+逐段生成 .txt / .docx 内容，边生成边输出，导出大文档时不在内存中拼出整个文件
+"""
+
+import io
+import re
+import zipfile
+from typing import Iterable, Iterator, Tuple
+from xml.sax.saxutils import escape
+
+# 每累计多少段落输出一次数据块
+FLUSH_EVERY = 64
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TXT_MEDIA_TYPE = "text/plain; charset=utf-8"
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:body>'
+).encode("utf-8")
+
+_DOCUMENT_TAIL = "<w:sectPr/></w:body></w:document>".encode("utf-8")
+
+# XML 1.0 不允许的控制字符
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class _ZipSink(io.RawIOBase):
+    """只追加、不可 seek 的输出缓冲区，zipfile 会改用数据描述符流式写入"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _docx_paragraph(text: str, color: str = "") -> str:
+    text = escape(_INVALID_XML_CHARS.sub("", text))
+    run_props = f'<w:rPr><w:color w:val="{color}"/></w:rPr>' if color else ""
+    return f'<w:p><w:r>{run_props}<w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+
+def iter_txt(pairs: Iterable[Tuple[str, str]], bilingual: bool = True) -> Iterator[bytes]:
+    """逐段生成 UTF-8 文本；双语模式下原文在前、粤语译文在后"""
+    buffer = []
+    for count, (original, translated) in enumerate(pairs, 1):
+        if bilingual:
+            buffer.append(f"{original}\n{translated}\n\n")
+        else:
+            buffer.append(f"{translated}\n\n")
+        if count % FLUSH_EVERY == 0:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def iter_docx(pairs: Iterable[Tuple[str, str]], bilingual: bool = True) -> Iterator[bytes]:
+    """逐段生成 .docx（ZIP）字节流；document.xml 以压缩流方式分块写出"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _RELS)
+        with archive.open("word/document.xml", "w") as document:
+            document.write(_DOCUMENT_HEAD)
+            for count, (original, translated) in enumerate(pairs, 1):
+                if bilingual:
+                    document.write(_docx_paragraph(original, color="666666").encode("utf-8"))
+                document.write(_docx_paragraph(translated).encode("utf-8"))
+                if count % FLUSH_EVERY == 0:
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            document.write(_DOCUMENT_TAIL)
+    yield sink.drain()
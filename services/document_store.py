@@ -0,0 +1,201 @@
+"""
+磁盘文档存储
+上传文本提取、分段后只写一次到 temp/docs，之后通过 mmap 和段落偏移索引读取：
+文档不常驻进程内存，多个 worker 共享同一份文件，进程重启后仍可重新翻译。
+每个 mmap 都持有一个复制的文件描述符，翻译任务结束后释放映射（DocumentTable.release），
+回放和导出时再重新打开；重新打开的映射最多保留 MAX_REOPENED 个，避免文件描述符随已完成任务增长。
+
+文档文件 {file_id}.doc 的格式（整数为本机字节序 uint64）：
+    8 字节魔数
+    段落数 N
+    N + 1 个偏移量（相对文件开头），段落 i 的文本为 [off[i], off[i + 1])
+    UTF-16-LE 段落文本
+元数据（文件名、哈希、过期时间等）存为 {file_id}.json，内容哈希到 file_id 的映射存为 hash-*.ref。
+"""
+
+import json
+import logging
+import mmap
+import os
+import re
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Collection, Iterator, Optional, Sequence
+
+from services.string_table import ENCODING, StringTable
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CTDOC\x00\x00\x01"
+_HEADER_SIZE = 16
+_FILE_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+# 已释放后又重新打开的段落表最多同时保留的映射数
+MAX_REOPENED = 64
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class DocumentTable(StringTable):
+    """磁盘文档的只读段落表：按需以 mmap 打开，release 后释放映射和文件描述符，再次读取时重新打开"""
+
+    __slots__ = ("_store", "_file_id", "_count", "_mapped")
+
+    def __init__(self, store: "DocumentStore", file_id: str, mapped: StringTable):
+        self._store = store
+        self._file_id = file_id
+        self._count = len(mapped)
+        self._mapped: Optional[StringTable] = mapped
+
+    def _table(self) -> StringTable:
+        table = self._mapped
+        if table is None:
+            table = self._mapped = self._store._reopen(self)
+        return table
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self._table()[index]
+
+    def __setitem__(self, index: int, value: str):
+        raise TypeError("文档段落表是只读的")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        # 遍历期间持有映射，中途被 release 也不受影响
+        yield from self._table()
+
+    @property
+    def nbytes(self) -> int:
+        return self._mapped.nbytes if self._mapped is not None else 0
+
+    def release(self):
+        """释放映射；mmap 在正在进行的遍历结束后随之关闭"""
+        self._mapped = None
+        self._store._reopened.pop(self, None)
+
+
+class DocumentStore:
+    """按 file_id 保存分段后的文档；file_id 必须是 uuid 格式，防止路径穿越"""
+
+    def __init__(self, root: str = "temp/docs"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # 释放后又重新打开的段落表，按打开顺序淘汰
+        self._reopened: "OrderedDict[DocumentTable, None]" = OrderedDict()
+
+    def _path(self, file_id: str, suffix: str) -> Optional[Path]:
+        if not _FILE_ID.fullmatch(file_id):
+            return None
+        return self.root / f"{file_id}{suffix}"
+
+    def _hash_path(self, digest: str) -> Path:
+        # 哈希形如 ".txt:abcdef..."，转成安全的文件名
+        return self.root / ("hash-" + re.sub(r"[^0-9A-Za-z]", "_", digest) + ".ref")
+
+    def write(self, file_id: str, paragraphs: Sequence[str], meta: dict):
+        """写入段落和元数据；先写临时文件再改名，其他 worker 不会读到写了一半的文档"""
+        path = self._path(file_id, ".doc")
+        if path is None:
+            raise ValueError(f"无效的文件ID: {file_id}")
+        tmp = path.with_name(path.name + ".tmp")
+        offsets = array("Q")
+        with open(tmp, "wb") as f:
+            data_start = _HEADER_SIZE + (len(paragraphs) + 1) * offsets.itemsize
+            f.seek(data_start)
+            position = data_start
+            for paragraph in paragraphs:
+                offsets.append(position)
+                position += f.write(paragraph.encode(ENCODING))
+            offsets.append(position)
+            f.seek(0)
+            f.write(MAGIC)
+            f.write(array("Q", [len(paragraphs)]).tobytes())
+            f.write(offsets.tobytes())
+        os.replace(tmp, path)
+        self.save_meta(file_id, meta)
+        _write_atomic(self._hash_path(meta["hash"]), file_id.encode())
+
+    def open(self, file_id: str) -> Optional[DocumentTable]:
+        """以只读 mmap 打开文档的段落表；文档不存在时返回 None"""
+        mapped = self._map(file_id)
+        return DocumentTable(self, file_id, mapped) if mapped is not None else None
+
+    def _reopen(self, table: DocumentTable) -> StringTable:
+        mapped = self._map(table._file_id)
+        if mapped is None:
+            raise FileNotFoundError(f"文档文件已删除: {table._file_id}")
+        self._reopened[table] = None
+        while len(self._reopened) > MAX_REOPENED:
+            oldest, _ = self._reopened.popitem(last=False)
+            oldest.release()
+        return mapped
+
+    def _map(self, file_id: str) -> Optional[StringTable]:
+        path = self._path(file_id, ".doc")
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        if mapped[:len(MAGIC)] != MAGIC:
+            logger.warning(f"⚠️ 文档文件格式错误: {path}")
+            return None
+        view = memoryview(mapped)
+        count = view[len(MAGIC):_HEADER_SIZE].cast("Q")[0]
+        offsets = view[_HEADER_SIZE:_HEADER_SIZE + (count + 1) * 8].cast("Q")
+        # mmap 在段落表被释放后随之关闭
+        return StringTable.from_buffer(mapped, offsets[:-1], offsets[1:])
+
+    def load_meta(self, file_id: str) -> Optional[dict]:
+        path = self._path(file_id, ".json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_meta(self, file_id: str, meta: dict):
+        _write_atomic(self._path(file_id, ".json"), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def find(self, digest: str) -> Optional[str]:
+        """按内容哈希查找 file_id"""
+        try:
+            return self._hash_path(digest).read_text()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, file_id: str):
+        meta = self.load_meta(file_id)
+        if meta is not None and self.find(meta["hash"]) == file_id:
+            self._hash_path(meta["hash"]).unlink(missing_ok=True)
+        for suffix in (".doc", ".json"):
+            path = self._path(file_id, suffix)
+            if path is not None:
+                path.unlink(missing_ok=True)
+
+    def sweep(self, now: Optional[float] = None, live: Collection[str] = ()) -> int:
+        """删除已过期的文档，跳过 live 中仍被引用的文档，返回删除数量"""
+        now = time.time() if now is None else now
+        removed = 0
+        for path in self.root.glob("*.json"):
+            if path.stem in live:
+                continue
+            meta = self.load_meta(path.stem)
+            if meta is None or meta.get("expires_at", 0) <= now:
+                self.delete(path.stem)
+                removed += 1
+        if removed:
+            logger.info(f"🧹 清理了 {removed} 个过期文档")
+        return removed
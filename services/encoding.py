@@ -0,0 +1,154 @@
+"""
+文本编码识别
+只取文件开头一小段样本判断编码（BOM、UTF-16、UTF-8、GB18030、Big5-HKSCS），
+之后对整段内容调用一次解码，不再对整个文件反复尝试 utf-8 / gbk。
+"""
+
+import codecs
+import mmap
+from typing import Optional, Tuple
+
+# 编码识别使用的样本大小
+SAMPLE_SIZE = 64 * 1024
+# 查找第一个非 ASCII 字节时每次检查的字节数
+_SCAN_SIZE = 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+_ASCII_BYTES = bytes(range(128))
+
+_CANDIDATES = ("gb18030", "big5hkscs", "utf-16-le", "utf-16-be")
+
+# GBK 是 GB18030 的子集，GBK 字节两者解码结果相同，而 gbk 解码器快约 20%：先按 gbk 严格解码，失败再用 gb18030
+_FAST_DECODERS = {"gb18030": "gbk"}
+# 与 ASCII 兼容的编码：ASCII 字节在这些编码中含义相同
+_ASCII_COMPATIBLE = ("utf-8", "gb18030", "big5hkscs")
+
+# 常用汉字（简繁两种写法都收录），用来判断 GB18030 和 Big5 哪个解码结果更像正常中文
+_COMMON_CHARS = frozenset(
+    "的一是不了在人有我他这這个個们們中来來上大为為和国國地到以说說时時要就出会會可也你对對生能而子那得于於着著下"
+    "自之年过過发發后後作里裡用道行所然家种種事成方多经經么麼去法学學如都同现現当當没沒动動面起看定天分还還进進好"
+    "小部其些主样樣理心本前开開但因只从從想实實意力与與长長把机機十民第公此已工使情明性知全三又关關点點正业業外将將"
+    "两兩高间間由问問很最重并並物手应應向头頭文体體相见見被利什二等产產或新己制身果加西月话話合回特代内信表化老给給"
+    "世位次度门門任常先海通教儿兒原东東声聲提立及比员員名真论論处處走义義各入几幾口认認条條平系气氣题題活更别別打女"
+    "变變四神总總何电電数數安少报報才结結反受目太量再感建务務做接必场場件计計管期直德资資命山金指许許统統区區保至"
+    "佛菩萨薩般若波罗羅蜜观觀照蕴蘊皆空切苦厄舍利色异異即复復识識诸諸灭滅垢净淨增减減故无無眼耳鼻舌触觸界乃尽盡死集"
+    "智罣碍礙恐怖远遠离離颠顛倒梦夢究竟涅槃依阿耨藐提咒神揭谛諦僧诃訶闻聞尊须須善男佛陀弥彌众眾生愿願念戒定慧"
+    "嘅咗喺啲冇咁嘢乜佢哋唔係噉"
+)
+
+
+def _utf16_without_bom(sample: bytes) -> Optional[str]:
+    """没有 BOM 的 UTF-16：ASCII 字符的高字节为 0，零字节集中在奇数或偶数位置"""
+    if len(sample) < 16:
+        return None
+    even_zeros = sample[0::2].count(0)
+    odd_zeros = sample[1::2].count(0)
+    half = len(sample) // 2
+    if odd_zeros > half * 0.3 and even_zeros < half * 0.05:
+        return "utf-16-le"
+    if even_zeros > half * 0.3 and odd_zeros < half * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def _is_utf8(sample: bytes, final: bool) -> bool:
+    try:
+        # 样本可能截断在多字节字符中间，非结尾样本不要求完整
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _score(sample: bytes, encoding: str) -> int:
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    return sum(1 for ch in text if ch in _COMMON_CHARS) - 20 * text.count("�")
+
+
+def detect_encoding(sample: bytes, complete: bool = False) -> str:
+    """根据样本判断编码；complete 表示样本就是完整文件"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    utf16 = _utf16_without_bom(sample)
+    if utf16:
+        return utf16
+    if _is_utf8(sample, complete):
+        return "utf-8"
+    # GB18030 兼容 GBK/GB2312；Big5-HKSCS 兼容 Big5 并包含粤语用字；
+    # 纯中文的无 BOM UTF-16 没有零字节，也交给评分判断
+    return max(_CANDIDATES, key=lambda encoding: _score(sample, encoding))
+
+
+def _ascii_prefix(data) -> int:
+    """开头连续 ASCII 字节的长度"""
+    with memoryview(data) as view:
+        position = 0
+        while position < len(view):
+            window = bytes(view[position:position + _SCAN_SIZE])
+            if not window.isascii():
+                return position + len(window) - len(window.lstrip(_ASCII_BYTES))
+            position += len(window)
+        return position
+
+
+def decode(data, encoding: str) -> str:
+    """按已知编码整段解码一次；data 可以是 bytes、bytearray、memoryview 或 mmap"""
+    fast = _FAST_DECODERS.get(encoding)
+    if fast is not None:
+        try:
+            return str(data, fast)
+        except UnicodeDecodeError:
+            pass
+    return str(data, encoding, "replace")
+
+
+def decode_buffer(data, sample_size: int = SAMPLE_SIZE) -> Tuple[str, str]:
+    """识别一段完整内容的编码并解码，返回（文本, 编码）。
+    开头全是 ASCII 时改用第一个非 ASCII 字节之后的样本判断编码，这段 ASCII 单独按 ASCII 解码（CJK 解码器处理 ASCII 很慢）"""
+    sample = bytes(data[:sample_size])
+    encoding = detect_encoding(sample, complete=len(data) <= sample_size)
+    if encoding != "utf-8" or not sample.isascii():
+        return decode(data, encoding), encoding
+    ascii_len = _ascii_prefix(data)
+    with memoryview(data) as view:
+        if ascii_len == len(view):
+            return str(view, "ascii"), encoding
+        window = bytes(view[ascii_len:ascii_len + sample_size])
+        encoding = detect_encoding(window, complete=ascii_len + len(window) == len(view))
+        if encoding not in _ASCII_COMPATIBLE:
+            return decode(view, encoding), encoding
+        return str(view[:ascii_len], "ascii") + decode(view[ascii_len:], encoding), encoding
+
+
+def read_text(path) -> str:
+    """识别编码并读取整个文本文件；以 mmap 直接解码，不另外复制一份原始字节"""
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decode_buffer(mapped)[0]
+
+
+class StreamDecoder:
+    """按块喂入字节，全部收到后识别编码并整段解码一次（比逐块增量解码再拼接快）"""
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.encoding: Optional[str] = None
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes):
+        self._buffer += chunk
+
+    def finish(self) -> str:
+        text, self.encoding = decode_buffer(self._buffer, self.sample_size)
+        self._buffer = bytearray()
+        return text
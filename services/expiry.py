@@ -0,0 +1,160 @@
+"""
+过期调度
+用最小堆按截止时间排序，到期项在截止时间附近被精确清理（每次 O(log n)），
+取代每10分钟全量扫描一次缓存字典和音频目录的做法。
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ExpireCallback = Callable[[str], Any]
+
+
+class ExpiryScheduler:
+    """按键调度过期回调；重复调度同一个键会覆盖原截止时间"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._callbacks: Dict[str, ExpireCallback] = {}
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: str, ttl: float, callback: ExpireCallback):
+        """ttl 秒后调用 callback(key)，回调可以是协程函数"""
+        deadline = time.monotonic() + ttl
+        self._deadlines[key] = deadline
+        self._callbacks[key] = callback
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+        # 新截止时间早于当前等待目标时唤醒调度循环
+        if self._wakeup is not None and self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key: str) -> bool:
+        """取消调度；堆中的旧条目惰性删除"""
+        if key not in self._deadlines:
+            return False
+        del self._deadlines[key]
+        del self._callbacks[key]
+        # 失效条目过多时重建堆
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]]
+            heapq.heapify(self._heap)
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            # 唤醒和取消同时发生时 wait_for 会吞掉取消，循环还要检查 _task
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while self._task is not None:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, key = heapq.heappop(self._heap)
+                if self._deadlines.get(key) != deadline:
+                    continue  # 已取消或已重新调度
+                del self._deadlines[key]
+                callback = self._callbacks.pop(key)
+                try:
+                    result = callback(key)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"❌ 过期回调失败 {key}: {e}")
+                now = time.monotonic()
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _remove_files(paths: List[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️ 删除文件失败 {path}: {e}")
+    return removed
+
+
+class FileReaper:
+    """收集待删除的文件，攒批后在线程池中删除，不阻塞事件循环"""
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.removed = 0
+        self._pending: List[str] = []
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def discard(self, path: str):
+        self._pending.append(str(path))
+        if self._ready is not None and len(self._pending) >= self.batch_size:
+            self._ready.set()
+
+    def start(self):
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            # 与 ExpiryScheduler.stop 相同：攒满一批和取消同时发生时 wait_for 会吞掉取消
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        removed = await asyncio.to_thread(_remove_files, batch)
+        self.removed += removed
+        logger.info(f"🧹 批量删除了 {removed} 个临时文件")
+
+    async def _run(self):
+        while self._task is not None:
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            await self.flush()
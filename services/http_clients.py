@@ -0,0 +1,166 @@
+"""
+共享 HTTP 客户端
+每个上游（翻译 API、TTS 等）在应用生命周期内只有一个 httpx.AsyncClient：启动时创建、关闭时释放，
+连接池长时间保持 keep-alive（安装了 h2 时使用 HTTP/2 多路复用），TCP 和 TLS 握手只在建连时发生一次，
+不再计入每段翻译的延迟。
+
+main_enhanced 在启动和关闭时创建、释放所有已登记的客户端，/health 的 http_clients 字段给出每个上游的连接复用统计。
+多 worker 部署时 services.worker_routing 经由这里的连接池把任务请求转发给其他 worker（每个 worker 一个上游）；
+翻译、TTS 服务实现也可以登记自己使用的上游，调用时通过 registry.get(名称) 取得客户端。
+
+用法：
+    registry.register("translation", base_url=..., max_connections=16)
+    await registry.start()
+    response = await registry.get("translation").post("/v1/translate", json=...)
+    await registry.close()
+
+通过 httpcore 的 trace 扩展统计每个上游新建连接和复用连接的次数、TLS 握手耗时。
+"""
+
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamStats:
+    """单个上游的连接复用统计"""
+
+    __slots__ = ("requests", "new_connections", "tls_handshakes", "tls_seconds", "errors")
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.tls_seconds = 0.0
+        self.errors = 0
+
+    def to_dict(self) -> dict:
+        reused = self.requests - self.new_connections
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+            "tls_handshakes": self.tls_handshakes,
+            "avg_tls_ms": round(self.tls_seconds / self.tls_handshakes * 1000, 1) if self.tls_handshakes else None,
+            "server_errors": self.errors,
+        }
+
+
+class HTTPClientRegistry:
+    """按名称管理应用级的 httpx.AsyncClient"""
+
+    def __init__(self):
+        self._configs: Dict[str, dict] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._started = False
+        self.stats: Dict[str, UpstreamStats] = {}
+
+    def register(self, name: str, base_url: str = "", max_connections: int = 16,
+                 max_keepalive: Optional[int] = None, keepalive_expiry: float = 120.0,
+                 connect_timeout: float = 10.0, read_timeout: Optional[float] = 60.0,
+                 http2: bool = True, headers: Optional[Dict[str, str]] = None, uds: Optional[str] = None):
+        """登记一个上游；keepalive_expiry 默认 2 分钟，段落之间的空闲不会让连接被回收。
+        uds 为 Unix socket 路径时经由该 socket 连接（同一台机器上的其他 worker）；read_timeout 为 None 表示不限制"""
+        self._configs[name] = {
+            "base_url": base_url,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive if max_keepalive is not None else max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+            "http2": http2 and HTTP2_AVAILABLE,
+            "headers": headers,
+            "uds": uds,
+        }
+        self.stats[name] = UpstreamStats()
+
+    def registered(self, name: str) -> bool:
+        return name in self._configs
+
+    async def start(self):
+        self._started = True
+        for name, config in self._configs.items():
+            if name not in self._clients:
+                self._clients[name] = self._create(name, config)
+        logger.info(f"🌐 HTTP 客户端已创建: {', '.join(self._clients) or '无'}"
+                    f"{'（HTTP/2）' if HTTP2_AVAILABLE else ''}")
+
+    def _create(self, name: str, config: dict) -> httpx.AsyncClient:
+        stats = self.stats[name]
+
+        async def on_request(request: httpx.Request):
+            stats.requests += 1
+            tls_started = 0.0
+
+            async def trace(event: str, info: dict):
+                nonlocal tls_started
+                # 事件名形如 connection.connect_tcp.started（Unix socket 为 connect_unix_socket），只有新建连接时才会出现
+                if event.endswith(("connect_tcp.complete", "connect_unix_socket.complete")):
+                    stats.new_connections += 1
+                elif event.endswith("start_tls.started"):
+                    tls_started = time.monotonic()
+                elif event.endswith("start_tls.complete"):
+                    stats.tls_handshakes += 1
+                    stats.tls_seconds += time.monotonic() - tls_started
+
+            # 调用方已设置 trace 时两者都调用
+            previous = request.extensions.get("trace")
+            if previous is not None:
+                async def chained(event: str, info: dict, trace=trace):
+                    await previous(event, info)
+                    await trace(event, info)
+                request.extensions["trace"] = chained
+            else:
+                request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response):
+            if response.status_code >= 500:
+                stats.errors += 1
+
+        # 指定 transport 时连接池参数要设置在 transport 上
+        transport = None
+        if config["uds"]:
+            transport = httpx.AsyncHTTPTransport(uds=config["uds"], limits=config["limits"], http2=config["http2"])
+        return httpx.AsyncClient(
+            base_url=config["base_url"],
+            limits=config["limits"],
+            timeout=config["timeout"],
+            http2=config["http2"],
+            headers=config["headers"],
+            transport=transport,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """取得客户端；启动后才登记的上游在第一次使用时创建。未登记或未启动时抛出 KeyError"""
+        client = self._clients.get(name)
+        if client is None:
+            if not self._started or name not in self._configs:
+                raise KeyError(f"HTTP 客户端未启动: {name}")
+            client = self._clients[name] = self._create(name, self._configs[name])
+        return client
+
+    async def close(self):
+        self._started = False
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def metrics(self) -> Dict[str, dict]:
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+
+# 应用级共享实例：服务模块通过 registry.get(名称) 取得客户端
+registry = HTTPClientRegistry()
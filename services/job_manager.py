@@ -0,0 +1,471 @@
+"""
+翻译任务引擎
+WebSocket 文件翻译与 REST 批量任务共用同一个并发翻译引擎
+"""
+
+import asyncio
+import heapq
+import inspect
+import logging
+import time
+import uuid
+from array import array
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.expiry import ExpiryScheduler
+from services.string_table import StringTable
+from services.translation_memory import TranslationMemory
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+TranslateFunc = Callable[..., Awaitable[str]]
+StreamFunc = Callable[..., AsyncIterator[str]]
+
+# 流式译文的 translation_partial 帧最短合并间隔（秒）
+PARTIAL_FLUSH_INTERVAL = 0.05
+
+# 单次 focus 最多提前的段落范围
+MAX_FOCUS_SPAN = 500
+
+
+class ParagraphQueue:
+    """待翻译段落组的优先队列：默认按文档顺序出队，focus 的范围提到最前
+
+    相同文本的段落为一组，以第一次出现的下标为组号；组内各出现位置用 _next 数组串成链表。
+    多个 worker 共享同一个迭代器。
+    """
+
+    __slots__ = ("_owner", "_next", "_started", "_cursor", "_focused", "_generation", "pending", "blank")
+
+    def __init__(self, paragraphs: Iterable[str]):
+        owner = array("q")
+        following = array("q")
+        first_of: Dict[str, int] = {}
+        last_of: Dict[str, int] = {}
+        self.blank = 0
+        for i, paragraph in enumerate(paragraphs):
+            following.append(-1)
+            text = paragraph.strip()
+            if not text:
+                owner.append(-1)
+                self.blank += 1
+                continue
+            first = first_of.setdefault(text, i)
+            owner.append(first)
+            if first != i:
+                following[last_of[text]] = i
+            last_of[text] = i
+        # 段落下标 -> 所属组号（空段落为 -1）；下一处相同段落的下标（没有为 -1）
+        self._owner = owner
+        self._next = following
+        self._started = bytearray(len(owner))
+        self._cursor = 0
+        # (-focus 代数, 组号)；同一次 focus 内按文档顺序
+        self._focused: List[Tuple[int, int]] = []
+        self._generation = 0
+        self.pending = len(first_of)
+
+    def __len__(self) -> int:
+        return self.pending
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List[int]:
+        while self._focused:
+            _, first = heapq.heappop(self._focused)
+            if not self._started[first]:
+                return self._take(first)
+        while self._cursor < len(self._owner):
+            i = self._cursor
+            self._cursor += 1
+            if self._owner[i] == i and not self._started[i]:
+                return self._take(i)
+        raise StopIteration
+
+    def _take(self, first: int) -> List[int]:
+        self._started[first] = 1
+        self.pending -= 1
+        indices = []
+        i = first
+        while i >= 0:
+            indices.append(i)
+            i = self._next[i]
+        return indices
+
+    def focus(self, start: int, end: int) -> int:
+        """把 [start, end] 范围内尚未开始的组提到最前，最近一次 focus 优先；返回提前的组数"""
+        start = max(0, start)
+        end = min(end, start + MAX_FOCUS_SPAN - 1, len(self._owner) - 1)
+        self._generation += 1
+        moved = set()
+        for i in range(start, end + 1):
+            first = self._owner[i]
+            if first >= 0 and not self._started[first] and first not in moved:
+                moved.add(first)
+                heapq.heappush(self._focused, (-self._generation, first))
+        return len(moved)
+
+
+class TranslationJob:
+    """单个翻译任务：段落、结果和按顺序编号的事件日志
+
+    段落和译文存放在 StringTable 中；事件日志里的 translation_result 只记录段落下标和当时的完成数，
+    回放时再从字符串表还原成完整事件，不在日志中重复保存原文和译文。
+    """
+
+    __slots__ = (
+        "job_id", "paragraphs", "filename", "file_id", "results", "errors", "status", "completed", "failed",
+        "unique", "error", "created_at", "finished_at", "task", "queue",
+        "_event_paragraphs", "_event_completed", "_event_other", "_subscribers",
+    )
+
+    def __init__(self, job_id: str, paragraphs: Iterable[str], filename: str = "", file_id: Optional[str] = None):
+        self.job_id = job_id
+        self.paragraphs = paragraphs if isinstance(paragraphs, StringTable) else StringTable.from_strings(paragraphs)
+        self.filename = filename
+        self.file_id = file_id
+        self.results = StringTable(len(self.paragraphs))
+        # 每段一个字节，标记译文是否为错误占位
+        self.errors = bytearray(len(self.paragraphs))
+        self.status = JOB_PENDING
+        self.completed = 0
+        self.failed = 0
+        # 去重后实际需要翻译的段落数，任务开始后确定
+        self.unique: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # 运行中的待翻译队列，任务开始后创建
+        self.queue: Optional[ParagraphQueue] = None
+        # 事件日志，事件序号从1开始；translation_partial 等临时事件不入日志，序号为 None。
+        # 第 n 个事件是 translation_result 时 _event_paragraphs[n] 为段落下标，否则为 -1，事件本身存在 _event_other
+        self._event_paragraphs = array("q")
+        self._event_completed = array("q")
+        self._event_other: Dict[int, dict] = {}
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def total(self) -> int:
+        return len(self.paragraphs)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def progress(self) -> float:
+        return self._progress(self.completed)
+
+    @property
+    def event_count(self) -> int:
+        return len(self._event_paragraphs)
+
+    def _progress(self, completed: int) -> float:
+        if not self.total:
+            return 100.0
+        return (completed / self.total) * 100
+
+    def to_dict(self) -> dict:
+        """任务状态摘要"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "filename": self.filename,
+            "file_id": self.file_id,
+            "total_paragraphs": self.total,
+            "unique_paragraphs": self.unique,
+            "completed": self.completed,
+            "failed": self.failed,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+    def iter_pairs(self) -> Iterator[Tuple[str, str]]:
+        """按文档顺序产出（原文，译文），跳过空段落"""
+        for index, paragraph in enumerate(self.paragraphs):
+            if paragraph.strip():
+                yield paragraph.strip(), self.results[index] or ""
+
+    def event(self, position: int) -> dict:
+        """按位置（序号减一）取出日志中的事件"""
+        index = self._event_paragraphs[position]
+        if index < 0:
+            return self._event_other[position]
+        return self._result_event(index, self._event_completed[position])
+
+    def _result_event(self, index: int, completed: int) -> dict:
+        event = {
+            "type": "translation_result",
+            "paragraph_id": index,
+            "original": self.paragraphs[index].strip(),
+            "translated": self.results[index],
+            "progress": self._progress(completed),
+        }
+        if self.errors[index]:
+            event["error"] = True
+        return event
+
+    def _push(self, seq: Optional[int], event: dict):
+        for queue in self._subscribers:
+            queue.put_nowait((seq, event))
+
+    def publish(self, event: dict, persist: bool = True):
+        """追加事件并推送给所有订阅者；persist=False 的事件只推送给当前订阅者"""
+        seq = None
+        if persist:
+            self._event_other[len(self._event_paragraphs)] = event
+            self._event_paragraphs.append(-1)
+            self._event_completed.append(0)
+            seq = len(self._event_paragraphs)
+        self._push(seq, event)
+
+    def record_result(self, index: int, translated: str, error: bool = False):
+        """保存段落译文并发布 translation_result 事件"""
+        self.results[index] = translated
+        self.completed += 1
+        if error:
+            self.failed += 1
+            self.errors[index] = 1
+        self._event_paragraphs.append(index)
+        self._event_completed.append(self.completed)
+        if self._subscribers:
+            self._push(len(self._event_paragraphs), self._result_event(index, self.completed))
+
+    def close(self):
+        """通知所有订阅者事件流已结束"""
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def stream_events(self, after: int = 0) -> AsyncIterator[Tuple[Optional[int], dict]]:
+        """先回放序号大于 after 的历史事件，再跟随实时事件，任务结束后停止"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            backlog_end = self.event_count
+            for seq in range(after, backlog_end):
+                yield seq + 1, self.event(seq)
+
+            if self.finished and queue.empty():
+                return
+
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                seq, event = item
+                if seq is None or seq > after:
+                    yield seq, event
+        finally:
+            self._subscribers.remove(queue)
+
+
+def _accepts_keyword(func: Callable, name: str) -> bool:
+    """func 的签名中明确声明了 name 参数（包装器通过 __wrapped__ 暴露被包装函数的签名）"""
+    try:
+        return name in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class JobManager:
+    """创建、调度和保存翻译任务"""
+
+    def __init__(self, translate: TranslateFunc, max_concurrency: int = 4, job_concurrency: Optional[int] = None,
+                 memory: Optional[TranslationMemory] = None, stream: Optional[StreamFunc] = None,
+                 expiry: Optional[ExpiryScheduler] = None, job_ttl: float = 3600,
+                 normalize: Optional[Callable[[str], str]] = None, id_prefix: str = ""):
+        self.translate = translate
+        # 查翻译记忆库和调用上游之前先规范化原文（如统一简繁字体），写法不同的同一段经文共用译文
+        self.normalize = normalize
+        # 任务结束 job_ttl 秒后由过期调度器删除
+        self.expiry = expiry
+        self.job_ttl = job_ttl
+        # 支持流式输出时逐块转发 translation_partial
+        self.stream = stream
+        self.max_concurrency = max_concurrency
+        self.job_concurrency = job_concurrency or max_concurrency
+        self.memory = memory
+        self.jobs: Dict[str, TranslationJob] = {}
+        # 任务 ID 的前缀；多 worker 部署时为 worker 标识，其他 worker 据此把任务请求转发过来
+        self.id_prefix = id_prefix
+        # 所有任务共享的上游并发上限
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # 翻译服务支持 reference 参数时，近似重复段落的译文会作为参考交给模型；
+        # 普通调用和流式调用分别检查，只传给签名中声明了 reference 的函数
+        self._translate_reference = _accepts_keyword(translate, "reference")
+        self._stream_reference = stream is not None and _accepts_keyword(stream, "reference")
+        self.memory_reused = 0
+        self.memory_hinted = 0
+
+    def create_job(self, paragraphs: Iterable[str], filename: str = "", file_id: Optional[str] = None) -> TranslationJob:
+        """创建任务并立即在后台开始翻译"""
+        job = TranslationJob(f"{self.id_prefix}{uuid.uuid4()}", paragraphs, filename=filename, file_id=file_id)
+        self.jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job), name=f"job:{job.job_id}")
+        logger.info(f"🧾 创建翻译任务 {job.job_id}，共 {job.total} 段")
+        return job
+
+    def get(self, job_id: str) -> Optional[TranslationJob]:
+        return self.jobs.get(job_id)
+
+    def focus(self, job_id: str, start: int, end: int) -> int:
+        """优先翻译任务中 [start, end] 范围内的段落，返回提前的段落组数"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished or job.queue is None:
+            return 0
+        return job.queue.focus(start, end)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    async def translate_text(self, text: str, on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """单段翻译：先查翻译记忆库，再在共享并发上限内调用上游；on_partial 接收流式增量"""
+        if self.normalize is not None:
+            text = self.normalize(text)
+        match = None
+        if self.memory is not None:
+            try:
+                match = await self.memory.alookup(text)
+            except Exception as e:
+                logger.warning(f"⚠️ 翻译记忆库查询失败: {e}")
+
+        if self.memory is not None and self.memory.reusable(match):
+            self.memory_reused += 1
+            return match.translation
+
+        streaming = self.stream is not None and on_partial is not None
+        kwargs = {}
+        if match is not None and (self._stream_reference if streaming else self._translate_reference):
+            self.memory_hinted += 1
+            kwargs["reference"] = (match.source, match.translation)
+
+        async with self._semaphore:
+            if streaming:
+                translated = await self._translate_streaming(text, on_partial, kwargs)
+            else:
+                translated = await self.translate(text, **kwargs)
+
+        if self.memory is not None and translated:
+            try:
+                await self.memory.aadd(text, translated)
+            except Exception as e:
+                logger.warning(f"⚠️ 翻译记忆库写入失败: {e}")
+        return translated
+
+    async def _translate_streaming(self, text: str, on_partial: Callable[[str], None], kwargs: dict) -> str:
+        # 合并过碎的增量，避免每个 token 一帧
+        parts: List[str] = []
+        pending = ""
+        last_flush = time.monotonic()
+        async for delta in self.stream(text, **kwargs):
+            parts.append(delta)
+            pending += delta
+            now = time.monotonic()
+            if now - last_flush >= PARTIAL_FLUSH_INTERVAL:
+                on_partial(pending)
+                pending = ""
+                last_flush = now
+        if pending:
+            on_partial(pending)
+        return "".join(parts)
+
+    def active_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.finished)
+
+    def _expire_job(self, key: str):
+        job_id = key.split(":", 1)[1]
+        if self.jobs.pop(job_id, None) is not None:
+            logger.info(f"🗑️ 清理过期翻译任务: {job_id}")
+
+    async def _run(self, job: TranslationJob):
+        job.status = JOB_RUNNING
+        # 空段落不需要翻译，直接计入进度；重复段落按首次出现的顺序归组，每组只翻译一次
+        job.queue = ParagraphQueue(job.paragraphs)
+        job.completed = job.queue.blank
+        job.unique = len(job.queue)
+        if job.total - job.queue.blank > job.unique:
+            logger.info(f"♻️ 任务 {job.job_id} 有 {job.total - job.queue.blank} 个非空段落，其中 {job.unique} 个不重复")
+        job.publish({
+            "type": "translation_start",
+            "job_id": job.job_id,
+            "total_paragraphs": job.total,
+            "unique_paragraphs": job.unique,
+            "filename": job.filename,
+        })
+
+        try:
+            async def worker():
+                for indices in job.queue:
+                    await self._translate_paragraph(job, indices)
+
+            workers = max(1, min(self.job_concurrency, job.unique))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+            job.status = JOB_COMPLETED
+            job.finished_at = time.time()
+            job.publish({"type": "translation_complete", "job_id": job.job_id})
+            logger.info(f"🎉 翻译任务完成 {job.job_id}，失败 {job.failed} 段")
+        except asyncio.CancelledError:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            job.publish({"type": "error", "job_id": job.job_id, "message": "翻译任务已取消"})
+            logger.info(f"🛑 翻译任务已取消 {job.job_id}")
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.publish({"type": "error", "job_id": job.job_id, "message": f"翻译失败: {str(e)}"})
+            logger.error(f"❌ 翻译任务失败 {job.job_id}: {e}", exc_info=True)
+        finally:
+            job.queue = None
+            job.close()
+            # 磁盘文档的段落表释放映射和文件描述符，回放、导出时再按需打开
+            release = getattr(job.paragraphs, "release", None)
+            if release is not None:
+                release()
+            if self.expiry is not None:
+                self.expiry.schedule(f"job:{job.job_id}", self.job_ttl, self._expire_job)
+
+    async def _translate_paragraph(self, job: TranslationJob, indices: List[int]):
+        """翻译一组相同的段落，结果分发到每个出现位置；流式增量只发给第一处"""
+        index = indices[0]
+        text = job.paragraphs[index].strip()
+
+        def forward_partial(delta: str):
+            job.publish({"type": "translation_partial", "paragraph_id": index, "delta": delta}, persist=False)
+
+        started = time.monotonic()
+        try:
+            translated = await self.translate_text(text, on_partial=forward_partial)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ 段落翻译失败: {e}")
+            # 发送错误，但继续处理下一段
+            for i in indices:
+                job.record_result(i, f"翻译出错: {text}", error=True)
+            return
+        for i in indices:
+            job.record_result(i, translated)
+        logger.info("✅ 段落翻译完成 %s/%s", index + 1, job.total, extra={
+            "category": "paragraph",
+            "fields": {"job_id": job.job_id, "chars": len(text), "occurrences": len(indices),
+                       "latency_ms": round((time.monotonic() - started) * 1000, 1)},
+        })
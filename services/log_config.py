@@ -0,0 +1,134 @@
+"""
+日志配置
+日志记录先放进内存队列，由后台线程格式化并写出，事件循环不再等待 stdout；
+支持 JSON 结构化输出，并按类别对高频事件（逐段翻译、逐帧发送、健康检查）采样和限速。
+
+使用方式：logger.info("...", extra={"category": "paragraph", "fields": {...}})
+WARNING 及以上级别的日志不受采样影响。
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# 类别 -> (采样率, 每秒最多条数)；每秒条数为 0 表示不限速
+DEFAULT_SAMPLING: Dict[str, Tuple[float, float]] = {
+    "paragraph": (0.05, 20),
+    "frame": (0.01, 10),
+    "probe": (1.0, 1 / 60),
+    "admission": (1.0, 5),
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        category = getattr(record, "category", None)
+        if category:
+            payload["category"] = category
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """按类别采样和限速；未配置的类别和 WARNING 以上级别全部保留"""
+
+    def __init__(self, rules: Dict[str, Tuple[float, float]]):
+        super().__init__()
+        self.rules = rules
+        self.dropped: Dict[str, int] = {}
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        category = getattr(record, "category", None)
+        rule = self.rules.get(category)
+        if rule is None:
+            return True
+
+        sample_rate, per_second = rule
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return self._drop(category)
+        if per_second:
+            with self._lock:
+                now = time.monotonic()
+                # 令牌桶，最多攒 1 秒的额度（至少 1 条）
+                capacity = max(1.0, per_second)
+                tokens, updated = self._buckets.get(category, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * per_second)
+                if tokens < 1.0:
+                    self._buckets[category] = [tokens, now]
+                    self.dropped[category] = self.dropped.get(category, 0) + 1
+                    return False
+                self._buckets[category] = [tokens - 1.0, now]
+        return True
+
+    def _drop(self, category: str) -> bool:
+        with self._lock:
+            self.dropped[category] = self.dropped.get(category, 0) + 1
+        return False
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """同进程队列无需序列化，只在调用线程固定异常堆栈，消息格式化交给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+sampling_filter: Optional[SamplingFilter] = None
+
+
+def setup_logging(level: int = logging.INFO, json_output: bool = True,
+                  sampling: Optional[Dict[str, Tuple[float, float]]] = None):
+    """把根日志器换成队列 + 后台写出线程；重复调用不会重复安装"""
+    global _listener, sampling_filter
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _InProcessQueueHandler(log_queue)
+    sampling_filter = SamplingFilter(DEFAULT_SAMPLING if sampling is None else sampling)
+    queue_handler.addFilter(sampling_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,222 @@
+"""
+词表索引
+把“字或词 -> 值”的对照表编译成二进制索引，以只读 mmap 打开，多个 worker 共享同一份文件：
+字按码位排序成数组二分查找，词按字符串排序二分查找，从左到右按最长匹配使用词条。
+查过的字记在进程内字典里；词首字集合编译成一个正则字符类，整段文本只在词首字处尝试词条。
+粤拼注音（services.jyutping）和简繁转换（services.script_converter）都建立在这个索引上。
+
+索引文件格式（整数为本机字节序，码位为 uint32，其余为 uint64）：
+    8 字节魔数
+    字数 C、词数 P
+    C 个码位（升序，补齐到 8 字节）
+    C 个字节：以该字开头的最长词条字数，0 表示没有词条（补齐到 8 字节）
+    C + 1 个偏移量（相对文件开头）：字 i 的值为 [off[i], off[i + 1])
+    P + 1 个偏移量：词 j 的文本
+    P + 1 个偏移量：词 j 的值
+    UTF-16-LE 文本
+"""
+
+import logging
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from services.string_table import ENCODING, StringTable
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CTPHR\x00\x00\x01"
+_HEADER_SIZE = 24
+# 词条最长字数（索引里用一个字节记录）
+MAX_PHRASE = 255
+
+# 从源文件读出（字 -> 值，词 -> 值）
+TableBuilder = Callable[[Path], Tuple[Dict[str, str], Dict[str, str]]]
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def read_tsv(path) -> Iterator[Tuple[int, str, str]]:
+    """逐行读取 键<TAB>值 格式的表，跳过空行和 # 注释，产出（行号, 键, 值）"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, _, value = line.partition("\t")
+            yield line_no, key, value.strip()
+
+
+def compile_index(chars: Dict[str, str], phrases: Dict[str, str], target):
+    """把对照表写成索引文件；先写临时文件再改名，正在读取旧索引的 worker 不受影响"""
+    phrases = {key: value for key, value in phrases.items() if 1 < len(key) <= MAX_PHRASE}
+    longest: Dict[str, int] = {}
+    for phrase in phrases:
+        longest[phrase[0]] = max(longest.get(phrase[0], 0), len(phrase))
+    # 只作为词首出现、本身没有值的字也要占一个位置，记录最长词条字数
+    codes = sorted(set(chars) | set(longest))
+    keys = sorted(phrases)
+
+    position = (_HEADER_SIZE + _align(len(codes) * 4) + _align(len(codes))
+                + (len(codes) + 1 + 2 * (len(keys) + 1)) * 8)
+    blob = bytearray()
+
+    def offsets(texts) -> array:
+        result = array("Q")
+        for text in texts:
+            result.append(position + len(blob))
+            blob.extend(text.encode(ENCODING))
+        result.append(position + len(blob))
+        return result
+
+    sections = [
+        array("I", (ord(char) for char in codes)).tobytes(),
+        bytes(longest.get(char, 0) for char in codes),
+    ]
+    sections = [section.ljust(_align(len(section)), b"\0") for section in sections]
+    sections.append(offsets(chars.get(char, "") for char in codes).tobytes())
+    sections.append(offsets(keys).tobytes())
+    sections.append(offsets(phrases[key] for key in keys).tobytes())
+
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(array("Q", [len(codes), len(keys)]).tobytes())
+        for section in sections:
+            f.write(section)
+        f.write(blob)
+    os.replace(tmp, target)
+    logger.info(f"🔤 词表索引已编译: {len(chars)} 字，{len(phrases)} 词 -> {target}")
+
+
+class PhraseIndex:
+    """只读 mmap 打开的词表索引"""
+
+    def __init__(self, mapped: mmap.mmap):
+        view = memoryview(mapped)
+        count, phrase_count = view[len(MAGIC):_HEADER_SIZE].cast("Q")
+        position = _HEADER_SIZE
+        self._codes = view[position:position + count * 4].cast("I")
+        position += _align(count * 4)
+        self._longest = view[position:position + count]
+        position += _align(count)
+
+        def table(size: int) -> StringTable:
+            nonlocal position
+            offsets = view[position:position + (size + 1) * 8].cast("Q")
+            position += (size + 1) * 8
+            return StringTable.from_buffer(mapped, offsets[:-1], offsets[1:])
+
+        self._values = table(count)
+        self._phrases = table(phrase_count)
+        self._phrase_values = table(phrase_count)
+        # 字 -> 值（表中没有的字为 None）
+        self._memo: Dict[str, Optional[str]] = {}
+        # 词首字 -> （最长词条字数, 以该字开头的词条 -> 值），按需填入
+        self._heads: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        heads = "".join(re.escape(chr(self._codes[index])) for index in range(count) if self._longest[index])
+        self._head_pattern = re.compile(f"[{heads}]") if heads else None
+
+    @classmethod
+    def open(cls, path) -> "PhraseIndex":
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            mapped.close()
+            raise ValueError(f"词表索引格式错误: {path}")
+        return cls(mapped)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def _find(self, char: str) -> int:
+        code = ord(char)
+        index = bisect_left(self._codes, code)
+        if index < len(self._codes) and self._codes[index] == code:
+            return index
+        return -1
+
+    def get(self, char: str) -> Optional[str]:
+        """单字的值"""
+        try:
+            return self._memo[char]
+        except KeyError:
+            index = self._find(char)
+            value = self._memo[char] = self._values[index] or None if index >= 0 else None
+            return value
+
+    def lookup(self, text: str) -> List[Optional[str]]:
+        """逐字取值（不考虑词条），结果与 text 的字符一一对应"""
+        memo = self._memo
+        for char in set(text).difference(memo):
+            self.get(char)
+        return list(map(memo.__getitem__, text))
+
+    def _head(self, char: str) -> Tuple[int, Dict[str, str]]:
+        """以 char 开头的全部词条：词按字符串排序，它们在表中连续排列"""
+        head = self._heads.get(char)
+        if head is None:
+            phrases = {}
+            index = bisect_left(self._phrases, char)
+            while index < len(self._phrases):
+                phrase = self._phrases[index]
+                if phrase[0] != char:
+                    break
+                phrases[phrase] = self._phrase_values[index]
+                index += 1
+            head = self._heads[char] = (self._longest[self._find(char)], phrases)
+        return head
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """从左到右最长匹配的词条，产出（起点, 终点, 值）；匹配互不重叠"""
+        if self._head_pattern is None:
+            return
+        covered = 0
+        for match in self._head_pattern.finditer(text):
+            position = match.start()
+            if position < covered:
+                continue
+            longest, phrases = self._head(match.group())
+            for length in range(min(longest, len(text) - position), 1, -1):
+                value = phrases.get(text[position:position + length])
+                if value is not None:
+                    yield position, position + length, value
+                    covered = position + length
+                    break
+
+
+class LazyIndex:
+    """第一次使用时才打开索引：索引不存在或比源文件旧时先用 build 重新编译；两者都不可用时返回 None"""
+
+    def __init__(self, source, index_path, build: TableBuilder):
+        self.source = Path(source)
+        self.index_path = Path(index_path)
+        self.build = build
+        self._index: Optional[PhraseIndex] = None
+        self._loaded = False
+
+    def get(self) -> Optional[PhraseIndex]:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                source_mtime = self.source.stat().st_mtime if self.source.exists() else 0
+                if not self.index_path.exists() or self.index_path.stat().st_mtime < source_mtime:
+                    compile_index(*self.build(self.source), self.index_path)
+                try:
+                    self._index = PhraseIndex.open(self.index_path)
+                except ValueError:
+                    # 旧格式或损坏的索引文件：按源文件重新编译
+                    compile_index(*self.build(self.source), self.index_path)
+                    self._index = PhraseIndex.open(self.index_path)
+                logger.info(f"🔤 词表索引已加载: {self.index_path}（{len(self._index)} 字）")
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ 词表索引不可用: {self.index_path}: {e}")
+        return self._index
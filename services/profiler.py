@@ -0,0 +1,252 @@
+"""
+运行中服务的按需诊断
+- SamplingProfiler：后台线程定时采样所有线程的调用栈，导出 collapsed stacks（flamegraph.pl / speedscope 可直接读取）
+- dump_tasks：列出事件循环中所有 asyncio 任务及其 await 链，定位卡住的协程
+- MemoryTracer：tracemalloc 分配热点，可导出按字节加权的 collapsed stacks
+- LoopLagMonitor：测量事件循环调度延迟
+
+各工具只在显式启动后才工作，未启动时不占用线程、不挂 tracemalloc 钩子，对服务没有开销。
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(code) -> str:
+    # 只保留路径最后两级，collapsed stacks 中的帧保持简短又能区分同名模块
+    path = code.co_filename.replace(os.sep, "/").rsplit("/", 2)[-2:]
+    return f"{code.co_qualname} ({'/'.join(path)}:{code.co_firstlineno})"
+
+
+def _collapse(frames, weight) -> str:
+    return ";".join(frames) + f" {weight}"
+
+
+class SamplingProfiler:
+    """统计采样 CPU 分析器：每 interval 秒记录一次各线程的调用栈，相同的栈累加计数"""
+
+    def __init__(self):
+        self.interval = 0.0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.samples = 0
+        self._stacks: collections.Counter = collections.Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, duration: float = 60.0):
+        """开始采样，duration 秒后自动停止；已在运行时抛出 RuntimeError"""
+        if self.running:
+            raise RuntimeError("CPU 采样已在进行中")
+        self.interval = interval
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop.clear()
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"🔬 开始 CPU 采样，间隔 {interval * 1000:.1f}ms，最长 {duration:.0f}s")
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            logger.info(f"🔬 CPU 采样结束，共 {self.samples} 次")
+
+    def _run(self, duration: float):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stack.reverse()
+                self._stacks[tuple(stack)] += 1
+            self.samples += 1
+        self.stopped_at = time.time()
+
+    def collapsed(self) -> str:
+        """collapsed stacks 文本：每行 "线程;外层帧;...;内层帧 次数" """
+        return "\n".join(_collapse(stack, count) for stack, count in self._stacks.most_common()) + "\n"
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": self.samples,
+            "distinct_stacks": len(self._stacks),
+        }
+
+
+def _await_chain(coro, waiter: Optional[asyncio.Future] = None) -> List[str]:
+    """沿 cr_await / gi_yieldfrom / ag_await 展开协程当前挂起的位置，外层在前；最后一项为任务正在等待的 Future。
+    C 实现的 Future 在 await 链中只露出迭代器，所以等待的 Future 由调用方从任务上取得后传入"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is not None:
+            frames.append(f"{_frame_label(frame.f_code)} 行 {frame.f_lineno}")
+        awaited = (getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+                   or getattr(coro, "ag_await", None))
+        if isinstance(awaited, asyncio.Future):
+            waiter = awaited
+            break
+        coro = awaited
+    if waiter is not None:
+        name = waiter.get_name() if isinstance(waiter, asyncio.Task) else type(waiter).__name__
+        frames.append(f"<等待 {name}>")
+    return frames
+
+
+def dump_tasks(loop: Optional[asyncio.AbstractEventLoop] = None) -> List[dict]:
+    """事件循环中所有未完成的任务，按名称排序；必须在事件循环线程中调用"""
+    tasks = []
+    for task in asyncio.all_tasks(loop):
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", type(coro).__name__),
+            "cancelling": task.cancelling(),
+            "stack": _await_chain(coro, getattr(task, "_fut_waiter", None)),
+        })
+    tasks.sort(key=lambda t: t["name"])
+    return tasks
+
+
+class MemoryTracer:
+    """tracemalloc 的开关和报告；启动时拍一张基线快照，报告可以只看启动后的增长"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 16):
+        if self.running:
+            raise RuntimeError("tracemalloc 已在运行")
+        tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+        self.started_at = time.time()
+        logger.info(f"🧠 开始跟踪内存分配，保留 {frames} 层调用栈")
+
+    def stop(self):
+        if self.running:
+            tracemalloc.stop()
+            logger.info("🧠 停止跟踪内存分配")
+        self._baseline = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        if not self.running:
+            raise RuntimeError("tracemalloc 未启动")
+        # 排除 tracemalloc 自身和导入机制的分配
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def top(self, limit: int = 20, growth: bool = False) -> dict:
+        """按代码行统计的分配热点；growth=True 时为相对启动时的增长"""
+        snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if growth and self._baseline is not None:
+            stats = snapshot.compare_to(self._baseline, "lineno")
+            entries = [{"location": str(stat.traceback[0]), "size": stat.size, "size_diff": stat.size_diff,
+                        "count": stat.count, "count_diff": stat.count_diff} for stat in stats[:limit]]
+        else:
+            stats = snapshot.statistics("lineno")
+            entries = [{"location": str(stat.traceback[0]), "size": stat.size, "count": stat.count}
+                       for stat in stats[:limit]]
+        return {"traced_bytes": current, "peak_bytes": peak, "started_at": self.started_at, "top": entries}
+
+    def collapsed(self) -> str:
+        """按分配字节数加权的 collapsed stacks，用于生成内存火焰图"""
+        lines = []
+        for stat in self._snapshot().statistics("traceback"):
+            # traceback 中的帧从外层到内层排列
+            frames = [f"{'/'.join(frame.filename.replace(os.sep, '/').rsplit('/', 2)[-2:])}:{frame.lineno}"
+                      for frame in stat.traceback]
+            lines.append(_collapse(frames, stat.size))
+        return "\n".join(lines) + "\n"
+
+
+class LoopLagMonitor:
+    """每 interval 秒让出一次事件循环，实际醒来时间比预期晚的部分即调度延迟"""
+
+    def __init__(self, window: int = 600):
+        self.interval = 0.0
+        self._lags: collections.deque = collections.deque(maxlen=window)
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, interval: float = 0.1):
+        if self.running:
+            raise RuntimeError("事件循环延迟监测已在运行")
+        self.interval = interval
+        self._lags.clear()
+        self._max = 0.0
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self._lags.append(lag)
+            self._max = max(self._max, lag)
+
+    def status(self) -> Dict[str, object]:
+        lags = sorted(self._lags)
+        if not lags:
+            return {"running": self.running, "samples": 0}
+
+        def ms(q: float) -> float:
+            return round(lags[min(len(lags) - 1, int(q * len(lags)))] * 1000, 2)
+
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": len(lags),
+            "mean_ms": round(sum(lags) / len(lags) * 1000, 2),
+            "p50_ms": ms(0.5),
+            "p99_ms": ms(0.99),
+            "max_ms": round(self._max * 1000, 2),
+        }
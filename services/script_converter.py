@@ -0,0 +1,117 @@
+"""
+简繁转换
+上传的经文有繁体也有简体，用户也可以要求译文用任一种字体显示。转换在本地完成，不经过翻译模型：
+简繁对照表 data/t2s.tsv（繁体<TAB>简体，字或词）分别编译成繁转简、简转繁两个词表索引
+（services.phrase_index），先按最长匹配使用词条（一简对多繁的字靠词条区分，如 头发 -> 頭髮），
+其余部分用 str.translate 逐字转换。
+
+翻译前把原文统一成一种字体，同一段经文的繁体本和简体本共用翻译记忆库里的译文；
+发给客户端时再把译文转换成客户端要求的字体，客户端没有要求时转换回原文的字体（detect）。
+"""
+
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from services.phrase_index import LazyIndex, PhraseIndex, read_tsv
+
+logger = logging.getLogger(__name__)
+
+SIMPLIFIED = "simplified"
+TRADITIONAL = "traditional"
+SCRIPTS = (SIMPLIFIED, TRADITIONAL)
+# 判断整篇文档字体时最多检查的段落数
+DETECT_PARAGRAPHS = 50
+
+
+def _load_pairs(path, reverse: bool) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """读取简繁对照表；reverse 为 False 时以繁体为键（繁转简），否则以简体为键。同一个键以第一行为准"""
+    chars: Dict[str, str] = {}
+    phrases: Dict[str, str] = {}
+    for line_no, traditional, simplified in read_tsv(path):
+        if not traditional or not simplified:
+            logger.warning(f"⚠️ 简繁对照表第 {line_no} 行格式错误，已跳过")
+            continue
+        key, value = (simplified, traditional) if reverse else (traditional, simplified)
+        target = chars if len(key) == 1 else phrases
+        target.setdefault(key, value)
+    return chars, phrases
+
+
+def load_t2s(path) -> Tuple[Dict[str, str], Dict[str, str]]:
+    return _load_pairs(path, reverse=False)
+
+
+def load_s2t(path) -> Tuple[Dict[str, str], Dict[str, str]]:
+    return _load_pairs(path, reverse=True)
+
+
+class _CharMap(dict):
+    """供 str.translate 使用的码位映射，第一次遇到某个字时从索引中查出并缓存；表中没有的字保持原样"""
+
+    def __init__(self, index: PhraseIndex):
+        super().__init__()
+        self.index = index
+
+    def __missing__(self, code: int):
+        value = self.index.get(chr(code))
+        result = self[code] = value if value is not None else code
+        return result
+
+
+class ScriptConverter:
+    """繁转简、简转繁；索引在第一次转换到对应字体时才加载，对照表和索引都不可用时原样返回"""
+
+    def __init__(self, source: str = "data/t2s.tsv", index_dir: str = "temp"):
+        index_dir = Path(index_dir)
+        self._indexes = {
+            SIMPLIFIED: LazyIndex(source, index_dir / "t2s.idx", load_t2s),
+            TRADITIONAL: LazyIndex(source, index_dir / "s2t.idx", load_s2t),
+        }
+        self._maps: Dict[str, _CharMap] = {}
+
+    def available(self, script: str) -> bool:
+        return self._indexes[script].get() is not None
+
+    def convert(self, text: str, script: Optional[str]) -> str:
+        """把 text 转换成 script 字体；script 为空时原样返回，不支持的字体抛出 ValueError"""
+        if not script or not text:
+            return text
+        lazy = self._indexes.get(script)
+        if lazy is None:
+            raise ValueError(f"不支持的字体: {script}")
+        index = lazy.get()
+        if index is None:
+            return text
+        charmap = self._maps.get(script)
+        if charmap is None:
+            charmap = self._maps[script] = _CharMap(index)
+
+        parts = []
+        last = 0
+        for start, end, value in index.matches(text):
+            parts.append(text[last:start].translate(charmap))
+            parts.append(value)
+            last = end
+        if not parts:
+            return text.translate(charmap)
+        parts.append(text[last:].translate(charmap))
+        return "".join(parts)
+
+    def detect(self, text: str) -> Optional[str]:
+        """判断 text 的字体：含有繁转简会改变的字为繁体，否则含有简转繁会改变的字为简体；
+        简繁同形（或对照表不可用）时返回 None"""
+        if self.convert(text, SIMPLIFIED) != text:
+            return TRADITIONAL
+        if self.convert(text, TRADITIONAL) != text:
+            return SIMPLIFIED
+        return None
+
+    def detect_document(self, paragraphs: Iterable[Optional[str]]) -> Optional[str]:
+        """按前 DETECT_PARAGRAPHS 段中第一个能判断字体的段落判断整篇文档的字体"""
+        for paragraph in islice(paragraphs, DETECT_PARAGRAPHS):
+            script = self.detect(paragraph) if paragraph else None
+            if script is not None:
+                return script
+        return None
@@ -0,0 +1,48 @@
+"""
+JSON 序列化
+WebSocket 帧、SSE / NDJSON 流和 HTTP 响应统一经过这里编码。安装了 orjson 时使用 orjson
+（大段中文编码为 UTF-8 字节约快 3 倍，编码为字符串约快 1.6 倍），否则回退到标准库；
+JSON_BACKEND=json 可强制使用标准库。两种后端输出的都是紧凑的 UTF-8 JSON，中文不转义。
+"""
+
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None and os.environ.get("JSON_BACKEND", "orjson") != "json":
+    BACKEND = "orjson"
+    # 与标准库保持一致：允许非字符串键（如 int）
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """编码为 UTF-8 字节"""
+        return orjson.dumps(obj, option=_OPTIONS)
+
+    def dumps_str(obj: Any) -> str:
+        """编码为字符串；WebSocket 文本帧需要 str（浏览器收到二进制帧时是 Blob，无法直接 JSON.parse）"""
+        return orjson.dumps(obj, option=_OPTIONS).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    BACKEND = "json"
+    dumps_str = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def dumps(obj: Any) -> bytes:
+        """编码为 UTF-8 字节"""
+        return dumps_str(obj).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """用当前后端渲染的 JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,135 @@
+"""
+静态资源缓存
+页面和 /static 资源只在文件变化时重新读取，内存中保存原文和预压缩的 gzip / brotli 版本，
+配合 ETag 和 Cache-Control，首页访问几乎不产生磁盘 IO 和压缩开销。
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 超过该大小的文件不缓存到内存
+MAX_CACHED_SIZE = 2 * 1024 * 1024
+# 小于该大小的文件不压缩
+MIN_COMPRESS_SIZE = 256
+
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+
+class CachedAsset:
+    """一个文件在内存中的各个编码版本"""
+
+    __slots__ = ("path", "media_type", "body", "encoded", "etag", "signature")
+
+    def __init__(self, path: str, body: bytes, media_type: str, signature: tuple):
+        self.path = path
+        self.media_type = media_type
+        self.body = body
+        self.signature = signature
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.encoded: Dict[str, bytes] = {}
+
+        if len(body) >= MIN_COMPRESS_SIZE and media_type.startswith(_COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.encoded["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.encoded["br"] = compressed
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.lower())
+    return accepted
+
+
+class StaticCache:
+    """按路径缓存文件；每个路径最多每 check_interval 秒检查一次文件是否变化"""
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._assets: Dict[str, CachedAsset] = {}
+        self._checked: Dict[str, float] = {}
+
+    def _load(self, path: str, signature: tuple) -> CachedAsset:
+        with open(path, "rb") as f:
+            body = f.read()
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        # text/* 由 Response 自动补充 charset
+        if media_type in ("application/javascript", "application/json"):
+            media_type += "; charset=utf-8"
+        logger.info(f"📦 缓存静态资源: {path}")
+        return CachedAsset(path, body, media_type, signature)
+
+    async def get(self, path: str) -> Optional[CachedAsset]:
+        """返回最新的缓存版本；文件不存在或太大时返回 None"""
+        now = time.monotonic()
+        asset = self._assets.get(path)
+        if asset is not None and now - self._checked.get(path, 0) < self.check_interval:
+            return asset
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._forget(path)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if asset is not None and asset.signature == signature:
+            self._checked[path] = now
+            return asset
+        if stat.st_size > MAX_CACHED_SIZE or not Path(path).is_file():
+            self._forget(path)
+            return None
+
+        asset = await asyncio.to_thread(self._load, path, signature)
+        self._assets[path] = asset
+        self._checked[path] = now
+        return asset
+
+    def _forget(self, path: str):
+        # 只为已缓存的路径记录检查时间，扫描器请求大量不存在的路径时不会让字典无限增长
+        self._assets.pop(path, None)
+        self._checked.pop(path, None)
+
+    @staticmethod
+    def response(asset: CachedAsset, request_headers: Mapping[str, str], cache_control: str,
+                 head: bool = False) -> Response:
+        """按 If-None-Match 和 Accept-Encoding 构造响应"""
+        headers = {"ETag": asset.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request_headers.get("if-none-match", "")
+        if asset.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+
+        body = asset.body
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in asset.encoded and encoding in accepted:
+                body = asset.encoded[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+
+        if head:
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=asset.media_type)
+        return Response(content=body, headers=headers, media_type=asset.media_type)
@@ -0,0 +1,71 @@
+"""
+紧凑字符串表
+大量段落和译文不再各自是一个 Python 字符串对象，而是编码后连续存放在一块缓冲区里，
+每个下标只占两个偏移量。缓冲区用 UTF-16-LE：汉字 2 字节（UTF-8 为 3 字节），
+个别扩展区生僻字也不会像 str 那样把整段文本升级成每字 4 字节。
+"""
+
+from array import array
+from typing import Iterable, Iterator, Optional
+
+ENCODING = "utf-16-le"
+
+
+class StringTable:
+    """定长的字符串表，按下标读写；未写入的下标为 None
+
+    写入总是追加到缓冲区末尾，所以可以按任意顺序填充（并发翻译的结果乱序到达）。
+    缓冲区也可以是只读的 mmap，见 from_buffer。
+    """
+
+    __slots__ = ("_buffer", "_starts", "_ends")
+
+    def __init__(self, size: int = 0):
+        self._buffer = bytearray()
+        self._starts = array("q", [-1]) * size
+        self._ends = array("q", [0]) * size
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringTable":
+        table = cls()
+        for value in strings:
+            start = len(table._buffer)
+            table._buffer += value.encode(ENCODING)
+            table._starts.append(start)
+            table._ends.append(len(table._buffer))
+        return table
+
+    @classmethod
+    def from_buffer(cls, buffer, starts: array, ends: array) -> "StringTable":
+        """用已有的缓冲区和偏移数组构造（例如磁盘文件的 mmap），不复制数据"""
+        table = cls.__new__(cls)
+        table._buffer = buffer
+        table._starts = starts
+        table._ends = ends
+        return table
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        start = self._starts[index]
+        if start < 0:
+            return None
+        return str(self._buffer[start:self._ends[index]], ENCODING)
+
+    def __setitem__(self, index: int, value: str):
+        if index < 0:
+            index += len(self._starts)
+        start = len(self._buffer)
+        self._buffer += value.encode(ENCODING)
+        self._starts[index] = start
+        self._ends[index] = len(self._buffer)
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        for index in range(len(self._starts)):
+            yield self[index]
+
+    @property
+    def nbytes(self) -> int:
+        """缓冲区和偏移数组占用的字节数"""
+        return len(self._buffer) + (len(self._starts) + len(self._ends)) * self._starts.itemsize
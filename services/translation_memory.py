@@ -0,0 +1,201 @@
+"""
+翻译记忆库
+持久化保存已翻译的段落，并用字符 n-gram + MinHash/LSH 索引查找近似重复段落。
+同一部佛经的不同版本往往每行只差一两个字，精确哈希缓存几乎命中不了。
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from collections import Counter
+from typing import Counter as CounterType, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# MinHash 参数：32 个哈希函数，分成 8 个 band，每个 band 4 行
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+NGRAM = 2
+
+_MAX_HASH = 0xFFFFFFFF
+_SIGNATURE_FORMAT = f"<{NUM_PERM}I"
+
+# 计算相似度时忽略空白和标点，版本间标点差异不影响匹配
+_IGNORED_CHARS = re.compile(r"[\s，。、；：？！「」『』“”‘’（）《》〈〉…—·,.;:?!'\"()\[\]-]+")
+
+# 每次查询最多精确比对的候选数量
+MAX_CANDIDATES = 16
+
+
+class TranslationMatch:
+    """记忆库命中结果"""
+
+    def __init__(self, source: str, translation: str, similarity: float, exact: bool = False):
+        self.source = source
+        self.translation = translation
+        self.similarity = similarity
+        # 忽略空白和标点后与查询的段落完全相同
+        self.exact = exact
+
+    def __repr__(self):
+        return f"TranslationMatch(similarity={self.similarity:.3f}, source={self.source[:20]!r})"
+
+
+def normalize(text: str) -> str:
+    return _IGNORED_CHARS.sub("", text)
+
+
+def shingles(text: str) -> CounterType[str]:
+    """字符 n-gram 多重集（记录出现次数）"""
+    text = normalize(text)
+    if len(text) <= NGRAM:
+        return Counter([text] if text else [])
+    return Counter(text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1))
+
+
+def jaccard(a: CounterType[str], b: CounterType[str]) -> float:
+    """多重集 Jaccard：重复次数不同的段落（如咒语念三遍和念五遍）相似度按次数计算，不会被当成相同"""
+    if not a and not b:
+        return 1.0
+    return sum((a & b).values()) / sum((a | b).values())
+
+
+def _gram_hashes(gram: str) -> Tuple[int, ...]:
+    # 一次 SHAKE-128 输出切成 NUM_PERM 个独立的 32 位哈希值，跨进程稳定
+    return struct.unpack(_SIGNATURE_FORMAT, hashlib.shake_128(gram.encode("utf-8")).digest(NUM_PERM * 4))
+
+
+def minhash(grams: Iterable[str]) -> List[int]:
+    """MinHash 签名：每个哈希函数在所有不同的 n-gram 上取最小值（只用于找候选，不计次数）"""
+    if not grams:
+        return [_MAX_HASH] * NUM_PERM
+    return list(map(min, zip(*map(_gram_hashes, grams))))
+
+
+def band_keys(signature: List[int]) -> List[int]:
+    """LSH 分桶键：band 序号放在高位，避免不同 band 的桶冲突"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        keys.append((band << 32) | zlib.crc32(struct.pack(f"<{ROWS}I", *rows)))
+    return keys
+
+
+class TranslationMemory:
+    """基于 SQLite 的翻译记忆库，支持精确命中和近似重复查找"""
+
+    def __init__(self, path: str = "temp/translation_memory.db",
+                 reuse_threshold: Optional[float] = None, hint_threshold: float = 0.6):
+        self.path = path
+        # 默认只直接复用规范化后完全相同的段落：差一个字就可能意思相反（皆是虚妄 / 皆非虚妄），
+        # 近似重复段落的相似度达到 hint_threshold 时作为参考译文交给模型；
+        # 设置 reuse_threshold 后相似度达到该值的近似段落也直接复用
+        self.reuse_threshold = reuse_threshold
+        self.hint_threshold = hint_threshold
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "id INTEGER PRIMARY KEY, source TEXT NOT NULL UNIQUE, "
+            "translation TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key INTEGER NOT NULL, segment_id INTEGER NOT NULL, "
+            "PRIMARY KEY (key, segment_id)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        logger.info(f"📚 翻译记忆库已加载: {path}，共 {len(self)} 条")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def _insert(self, source: str, translation: str, now: float):
+        row = self._conn.execute("SELECT id FROM segments WHERE source = ?", (source,)).fetchone()
+        if row:
+            self._conn.execute("UPDATE segments SET translation = ? WHERE id = ?", (translation, row[0]))
+            return
+        cursor = self._conn.execute(
+            "INSERT INTO segments (source, translation, created_at) VALUES (?, ?, ?)",
+            (source, translation, now)
+        )
+        keys = band_keys(minhash(shingles(source)))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO buckets (key, segment_id) VALUES (?, ?)",
+            [(key, cursor.lastrowid) for key in keys]
+        )
+
+    def add(self, source: str, translation: str):
+        """保存一条译文"""
+        with self._lock:
+            self._insert(source, translation, time.time())
+            self._conn.commit()
+
+    def add_many(self, pairs: Iterable[Tuple[str, str]]):
+        """在一个事务中批量保存译文"""
+        now = time.time()
+        with self._lock:
+            for source, translation in pairs:
+                self._insert(source, translation, now)
+            self._conn.commit()
+
+    def lookup(self, text: str) -> Optional[TranslationMatch]:
+        """查找最相似的已译段落，相似度低于 hint_threshold 时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, translation FROM segments WHERE source = ?", (text,)
+            ).fetchone()
+            if row:
+                return TranslationMatch(row[0], row[1], 1.0, exact=True)
+
+            grams = shingles(text)
+            keys = band_keys(minhash(grams))
+            placeholders = ",".join("?" * len(keys))
+            candidates = self._conn.execute(
+                f"SELECT s.source, s.translation FROM segments s JOIN ("
+                f"SELECT segment_id, COUNT(*) AS hits FROM buckets WHERE key IN ({placeholders}) "
+                f"GROUP BY segment_id ORDER BY hits DESC LIMIT {MAX_CANDIDATES}"
+                f") c ON s.id = c.segment_id",
+                keys
+            ).fetchall()
+
+        normalized = normalize(text)
+        best: Optional[TranslationMatch] = None
+        for source, translation in candidates:
+            if normalize(source) == normalized:
+                return TranslationMatch(source, translation, 1.0, exact=True)
+            similarity = jaccard(grams, shingles(source))
+            if similarity >= self.hint_threshold and (best is None or similarity > best.similarity):
+                best = TranslationMatch(source, translation, similarity)
+        return best
+
+    def reusable(self, match: Optional[TranslationMatch]) -> bool:
+        """命中结果能否不调用模型直接复用"""
+        if match is None:
+            return False
+        if match.exact:
+            return True
+        return self.reuse_threshold is not None and match.similarity >= self.reuse_threshold
+
+    async def alookup(self, text: str) -> Optional[TranslationMatch]:
+        return await asyncio.to_thread(self.lookup, text)
+
+    async def aadd(self, source: str, translation: str):
+        await asyncio.to_thread(self.add, source, translation)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,554 @@
+"""
+上游模型调用客户端
+令牌桶限速 + AIMD 自适应并发 + 抖动退避重试 + 熔断器，
+在上游返回 429 / 超时时自动收缩并发，避免错误风暴。
+可选对冲请求：调用超过近期 p90 延迟仍未返回时，再发一个相同（或发给备用模型）的请求，取先返回的结果；
+流式调用按首块延迟对冲，使用先产出第一块的一方。
+"""
+
+import asyncio
+import collections
+import functools
+import logging
+import math
+import random
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_ERROR_NAMES = ("Timeout", "ConnectError", "ReadError", "RemoteProtocolError")
+# 流式调用结束的标记
+_END = object()
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开期间快速失败"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"上游服务暂不可用，请 {retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for attr in ("status_code", "status", "http_status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429、5xx、超时和连接错误可以重试，其余错误直接抛出"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(name in type(exc).__name__ for name in _RETRYABLE_ERROR_NAMES)
+
+
+def is_throttled(exc: BaseException) -> bool:
+    """429 表示上游限流而不是故障，只收缩并发，不计入熔断"""
+    return _status_code(exc) == 429
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """读取上游返回的 Retry-After 秒数"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def hedge_method(service: Any, stream: bool = False) -> Optional[Callable[..., Any]]:
+    """环境变量 UPSTREAM_HEDGE_METHOD 指定的对冲备用方法（流式版本为同名加 _stream）；
+    未配置时返回 None，对冲请求与主请求相同。配置了但服务上没有这个方法时抛出 AttributeError"""
+    name = os.environ.get("UPSTREAM_HEDGE_METHOD")
+    if not name:
+        return None
+    if stream:
+        return getattr(service, f"{name}_stream", None)
+    return getattr(service, name)
+
+
+class TokenBucket:
+    """令牌桶：平均速率 rate 次/秒，允许 capacity 次突发"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """不等待：令牌足够时立即扣除并返回 True"""
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+
+class AdaptiveLimiter:
+    """AIMD 并发控制：成功时线性增加并发上限，过载时按比例减半"""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, decrease_factor: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """获取并发名额，返回请求开始时间，释放时传回"""
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def try_acquire(self, headroom: int = 0) -> Optional[float]:
+        """不等待：有空闲名额（可超出上限 headroom 个）时立即占用并返回开始时间，否则返回 None"""
+        if self.in_flight >= int(self.limit) + headroom:
+            return None
+        self.in_flight += 1
+        return time.monotonic()
+
+    def hold(self) -> float:
+        """不检查上限直接占用一个名额：用于已经在运行、无法取消的调用"""
+        self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started: float, overloaded: bool = False, success: bool = True):
+        async with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                # 上次收缩之前发出的请求反映的是旧窗口，同一波过载只收缩一次
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+                    logger.warning(f"⚠️ 上游过载，并发上限降至 {int(self.limit)}")
+            elif success:
+                # 每完成约一个窗口的请求，并发上限加一
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开，reset_timeout 秒后放行一次探测请求"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self):
+        if self.state == self.CLOSED:
+            return
+        elapsed = time.monotonic() - self._opened_at
+        if self.state == self.OPEN and elapsed >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(max(1.0, self.reset_timeout - elapsed))
+
+    def release_probe(self):
+        """探测请求被取消时释放探测名额"""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            logger.info("✅ 上游恢复，熔断器关闭")
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.error(f"🚫 上游连续失败 {self.failures} 次，熔断器打开")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """最近 window 次成功调用的延迟，按需计算分位数"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: collections.deque = collections.deque(maxlen=window)
+        self._sorted: Optional[list] = None
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """样本不足 min_samples 时返回 None"""
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class ResilientClient:
+    """包装翻译函数（同步或异步均可），调用方式与原函数相同
+
+    hedge=True 时启用对冲：调用超过近期 hedge_quantile 分位延迟仍未返回，就再发一个请求给 hedge_func
+    （默认与 func 相同，也可以是备用模型），取先成功的结果并取消另一个。对冲请求同样受限速和并发上限约束，
+    且总量不超过调用数的 hedge_budget 比例。对冲只对异步函数生效：同步函数在线程中运行，无法真正取消。
+    流式调用（stream）按首块延迟对冲：第一块超过近期首块延迟的 hedge_quantile 分位仍未到达时，
+    再向 hedge_stream_func（默认与 stream_func 相同）发起一次流式请求，之后只读取先产出第一块的一方。
+    """
+
+    def __init__(self, func: Callable[..., Any], max_concurrency: int = 16, initial_concurrency: int = 4,
+                 rate: Optional[float] = None, burst: Optional[float] = None,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 10.0,
+                 timeout: Optional[float] = 60.0, breaker: Optional[CircuitBreaker] = None,
+                 stream_func: Optional[Callable[..., AsyncIterator[str]]] = None,
+                 hedge: bool = False, hedge_func: Optional[Callable[..., Any]] = None,
+                 hedge_stream_func: Optional[Callable[..., AsyncIterator[str]]] = None,
+                 hedge_quantile: float = 0.9, hedge_budget: float = 0.1, hedge_min_delay: float = 0.1):
+        self.func = func
+        # 可选的流式翻译函数（异步生成器，逐块产出译文）
+        self.stream_func = stream_func
+        # 让 inspect.signature 看到原函数的参数
+        self.__wrapped__ = func
+        if stream_func is not None:
+            # 同样让 inspect.signature(client.stream) 看到流式函数的参数
+            self.stream = functools.partial(ResilientClient.stream, self)
+            self.stream.__wrapped__ = stream_func
+        self._is_async = asyncio.iscoroutinefunction(func)
+        self.limiter = AdaptiveLimiter(initial=min(initial_concurrency, max_concurrency), maximum=max_concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedge_func = hedge_func or func
+        self._hedge_is_async = asyncio.iscoroutinefunction(self.hedge_func)
+        # 同步函数在线程中运行，取消对冲中落后的一方只能放弃等待，线程里的上游调用仍会跑完，
+        # 对冲反而增加上游负载并占用线程池，所以只对异步函数启用
+        self.hedge = hedge and self._is_async and self._hedge_is_async
+        # 流式函数都是异步生成器，可以取消
+        self.hedge_stream_func = hedge_stream_func or stream_func
+        self.stream_hedge = hedge and stream_func is not None
+        if hedge and not self.hedge:
+            if self.stream_hedge:
+                logger.warning("⚠️ 上游函数不是异步函数，无法取消落后的请求，只对流式调用对冲")
+            else:
+                logger.warning("⚠️ 上游函数不是异步函数，无法取消落后的请求，已关闭对冲")
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+        # 流式调用的首块延迟
+        self.first_chunk_latency = LatencyTracker()
+        # 对冲额度：每次调用增加 hedge_budget，每次对冲消耗 1，最多攒 10 次
+        self._hedge_credit = 1.0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # 已超时或被取消、但线程中仍在运行的同步调用数
+        self.orphaned = 0
+
+    async def _invoke(self, *args, **kwargs):
+        return await self._timed(self.func, self._is_async, args, kwargs)
+
+    async def _timed(self, func: Callable[..., Any], is_async: bool, args: tuple, kwargs: dict):
+        """调用上游并记录成功调用的延迟。
+        同步函数在线程中运行，超时或被取消后线程里的调用仍在继续：它结束之前占用一个并发名额"""
+        started = time.monotonic()
+        if is_async:
+            call = func(*args, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            running = True
+            orphan: Optional[float] = None
+
+            def finished():
+                nonlocal running
+                running = False
+                if orphan is not None:
+                    self.orphaned -= 1
+                    asyncio.ensure_future(self.limiter.release(orphan, success=False))
+
+            def run():
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    loop.call_soon_threadsafe(finished)
+
+            call = asyncio.to_thread(run)
+        try:
+            if self.timeout:
+                result = await asyncio.wait_for(call, self.timeout)
+            else:
+                result = await call
+        except BaseException:
+            if not is_async and running:
+                orphan = self.limiter.hold()
+                self.orphaned += 1
+            raise
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def _hedge_delay(self, enabled: bool, latency: LatencyTracker) -> Optional[float]:
+        if not enabled:
+            return None
+        self._hedge_credit = min(10.0, self._hedge_credit + self.hedge_budget)
+        delay = latency.quantile(self.hedge_quantile)
+        return None if delay is None else max(delay, self.hedge_min_delay)
+
+    def _try_hedge(self) -> Optional[float]:
+        """有对冲额度、令牌和并发名额时占用一个名额并返回开始时间，否则返回 None（只等主请求）"""
+        if self._hedge_credit < 1.0:
+            return None
+        # 对冲请求不排队。主请求都占着名额，对冲可以超出并发上限 hedge_budget 比例（至少 1 个）
+        if self.bucket is not None and not self.bucket.try_acquire():
+            return None
+        headroom = max(1, math.ceil(self.limiter.limit * self.hedge_budget))
+        started = self.limiter.try_acquire(headroom=headroom)
+        if started is not None:
+            self._hedge_credit -= 1.0
+            self.hedges += 1
+        return started
+
+    async def _invoke_hedged(self, *args, **kwargs):
+        """主请求超过对冲延迟仍未返回时发出对冲请求，返回先成功的结果"""
+        delay = self._hedge_delay(self.hedge, self.latency)
+        if delay is None:
+            return await self._invoke(*args, **kwargs)
+
+        primary = asyncio.ensure_future(self._invoke(*args, **kwargs))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            hedge_started = None if done else self._try_hedge()
+            if hedge_started is None:
+                return await primary
+        except BaseException:
+            primary.cancel()
+            raise
+
+        secondary = asyncio.ensure_future(self._timed(self.hedge_func, self._hedge_is_async, args, kwargs))
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            self.hedge_wins += 1
+                        return task.result()
+            # 两个请求都失败时按主请求的异常处理
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            await self.limiter.release(hedge_started, success=secondary.done() and not secondary.cancelled()
+                                       and secondary.exception() is None)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        # full jitter 指数退避，上游给了 Retry-After 时不早于它
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        hinted = retry_after(exc)
+        if hinted is not None:
+            delay = max(delay, min(hinted, self.max_delay))
+        return delay
+
+    async def __call__(self, *args, **kwargs):
+        self.calls += 1
+        attempt = 0
+        while True:
+            await self._before_call()
+            started = await self.limiter.acquire()
+            try:
+                result = await self._invoke_hedged(*args, **kwargs)
+            except asyncio.CancelledError:
+                await self.limiter.release(started, success=False)
+                self.breaker.release_probe()
+                raise
+            except Exception as exc:
+                await self.limiter.release(started, overloaded=is_retryable(exc), success=False)
+                await self._handle_failure(exc, attempt)
+                attempt += 1
+                continue
+            await self.limiter.release(started)
+            self.breaker.record_success()
+            return result
+
+    async def _next_chunk(self, chunks: AsyncIterator[str]):
+        """读取下一块，流结束时返回 _END"""
+        try:
+            if self.timeout:
+                return await asyncio.wait_for(chunks.__anext__(), self.timeout)
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return _END
+
+    @staticmethod
+    async def _discard(task: asyncio.Future, chunks: AsyncIterator[str]):
+        """取消读取并关闭落后的一方"""
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception as e:
+                logger.debug(f"关闭流式调用失败: {e}")
+
+    async def _open_stream(self, args: tuple, kwargs: dict):
+        """发起流式调用并读取第一块，第一块迟迟不到时对冲；返回 (流, 第一块)"""
+        started = time.monotonic()
+        chunks = self.stream_func(*args, **kwargs).__aiter__()
+        first = asyncio.ensure_future(self._next_chunk(chunks))
+        racing = {first: chunks}
+        winner = None
+        hedge_started = None
+        try:
+            delay = self._hedge_delay(self.stream_hedge, self.first_chunk_latency)
+            if delay is not None:
+                done, _ = await asyncio.wait({first}, timeout=delay)
+                hedge_started = None if done else self._try_hedge()
+            if hedge_started is not None:
+                backup = self.hedge_stream_func(*args, **kwargs).__aiter__()
+                racing[asyncio.ensure_future(self._next_chunk(backup))] = backup
+            pending = set(racing)
+            while winner is None and pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+            if winner is None:
+                # 都失败时按主请求的异常处理
+                raise first.exception()
+            if winner is not first:
+                self.hedge_wins += 1
+            self.first_chunk_latency.record(time.monotonic() - started)
+            return racing[winner], winner.result()
+        finally:
+            for task, stream in racing.items():
+                if task is not winner:
+                    await self._discard(task, stream)
+            if hedge_started is not None:
+                await self.limiter.release(hedge_started, success=winner is not None and winner is not first)
+
+    async def stream(self, *args, **kwargs) -> AsyncIterator[str]:
+        """流式调用：同样经过限速、并发控制和熔断；只在收到第一块之前重试（以及按首块延迟对冲）"""
+        self.calls += 1
+        attempt = 0
+        while True:
+            await self._before_call()
+            started = await self.limiter.acquire()
+            released = False
+            received = False
+            try:
+                chunks, chunk = await self._open_stream(args, kwargs)
+                while chunk is not _END:
+                    received = True
+                    yield chunk
+                    chunk = await self._next_chunk(chunks)
+            except Exception as exc:
+                released = True
+                await self.limiter.release(started, overloaded=is_retryable(exc), success=False)
+                if received:
+                    # 已经向调用方输出了部分译文，不能再重试
+                    if is_retryable(exc) and not is_throttled(exc):
+                        self.breaker.record_failure()
+                    self.failures += 1
+                    raise
+                await self._handle_failure(exc, attempt)
+                attempt += 1
+                continue
+            finally:
+                if not released:
+                    await self.limiter.release(started, success=received)
+                    self.breaker.release_probe()
+            self.breaker.record_success()
+            return
+
+    async def _before_call(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+        if self.bucket is not None:
+            await self.bucket.acquire()
+
+    async def _handle_failure(self, exc: Exception, attempt: int):
+        """记录失败；不可重试或重试次数用完时抛出异常，否则退避等待"""
+        retryable = is_retryable(exc)
+        if not retryable or is_throttled(exc):
+            # 上游能正常响应（400 或限流），不计入熔断
+            self.breaker.record_success()
+            if not retryable:
+                raise exc
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self.failures += 1
+            raise exc
+        delay = self._backoff(attempt, exc)
+        self.retries += 1
+        logger.warning(f"🔁 上游调用失败（{type(exc).__name__}），{delay:.2f} 秒后第 {attempt + 1} 次重试")
+        await asyncio.sleep(delay)
+
+    def metrics(self) -> dict:
+        hedge_delay = self.latency.quantile(self.hedge_quantile) if self.hedge else None
+        stream_hedge_delay = self.first_chunk_latency.quantile(self.hedge_quantile) if self.stream_hedge else None
+        return {
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "circuit": self.breaker.state,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+            "first_chunk_hedge_delay_ms": (round(stream_hedge_delay * 1000, 1)
+                                           if stream_hedge_delay is not None else None),
+            "orphaned": self.orphaned,
+        }
@@ -0,0 +1,222 @@
+"""
+多 worker 任务路由
+uvicorn 的多个 worker 共享同一个监听端口，请求随机落到其中一个 worker 上；翻译任务、事件日志和整篇语音
+保存在创建它们的 worker 进程内。每个 worker 另外在 WORKER_SOCKET_DIR 下监听一个以 worker 标识命名的 Unix socket，
+任务 ID 以 worker 标识开头：/jobs/{job_id}/* 请求落到其他 worker 时，由 JobRoutingMiddleware 原样转发给
+任务所在的 worker（SSE、NDJSON 流式响应边收边发），客户端不需要粘性会话。
+上传的文档保存在磁盘文档存储中，所有 worker 都能直接读取，不需要转发。
+
+转发经由 services.http_clients 的连接池，只适用于同一台机器上的多个 worker。
+"""
+
+import asyncio
+import logging
+import re
+import secrets
+import socket
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+import uvicorn
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from services.http_clients import HTTPClientRegistry
+
+logger = logging.getLogger(__name__)
+
+# 转发出去的请求带上这个头，收到的 worker 不再转发
+FORWARDED_HEADER = b"x-forwarded-worker"
+_WORKER_ID = re.compile(r"[0-9a-f]{8}")
+_JOB_PATH = re.compile(r"/jobs/([^/]+)")
+# 逐跳头部不转发；请求体长度由 httpx 重新计算
+_HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"te", b"trailer", b"upgrade",
+                b"proxy-authorization", b"proxy-connection", b"host", b"content-length"}
+_RESPONSE_HOP_HEADERS = _HOP_HEADERS - {b"content-length"}
+
+
+def _target(scope: Scope) -> str:
+    """请求的原始路径和查询字符串"""
+    target = scope.get("raw_path", scope["path"].encode()).decode("latin-1")
+    if scope["query_string"]:
+        target += "?" + scope["query_string"].decode("latin-1")
+    return target
+
+
+def _forwarded(scope: Scope) -> bool:
+    return any(key == FORWARDED_HEADER for key, _ in scope["headers"])
+
+
+def remove_stale_sockets(socket_dir: Path):
+    """删除已退出的 worker 留下的 socket 文件（被强制结束时来不及删除）；仍有进程监听的不动"""
+    for path in socket_dir.glob("*.sock"):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(path))
+        except ConnectionRefusedError:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        finally:
+            probe.close()
+
+
+class _SocketServer(uvicorn.Server):
+    """在 worker 内部运行的第二个 uvicorn 服务：信号仍由 worker 的主服务处理"""
+
+    def install_signal_handlers(self):
+        pass
+
+
+class WorkerRouter:
+    """本 worker 的 Unix socket 服务，以及把请求转发给其他 worker"""
+
+    def __init__(self, app: ASGIApp, socket_dir: str, clients: HTTPClientRegistry):
+        self.app = app
+        self.socket_dir = Path(socket_dir).resolve()
+        self.clients = clients
+        self.worker_id = secrets.token_hex(4)
+        self.socket_path = self.socket_dir / f"{self.worker_id}.sock"
+        self.forwarded = 0
+        self._server: Optional[_SocketServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def job_prefix(self) -> str:
+        """本 worker 创建的任务 ID 前缀"""
+        return f"{self.worker_id}."
+
+    def owner(self, job_id: str) -> Optional[str]:
+        """任务所在 worker 的标识；不是带前缀的任务 ID 时返回 None"""
+        worker, dot, _ = job_id.partition(".")
+        return worker if dot and _WORKER_ID.fullmatch(worker) else None
+
+    def others(self) -> List[str]:
+        """同一目录下其他 worker 的标识（socket 文件可能属于已退出的 worker）"""
+        return [path.stem for path in self.socket_dir.glob("*.sock")
+                if path.stem != self.worker_id and _WORKER_ID.fullmatch(path.stem)]
+
+    async def start(self):
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(remove_stale_sockets, self.socket_dir)
+        config = uvicorn.Config(
+            self.app,
+            uds=str(self.socket_path),
+            lifespan="off",
+            # 只有本机进程能连接 socket；原始客户端地址由转发方写在 X-Forwarded-For 中
+            proxy_headers=True,
+            forwarded_allow_ips="*",
+            access_log=False,
+            log_level="warning",
+        )
+        self._server = _SocketServer(config)
+        self._task = asyncio.create_task(self._server.serve(), name="worker-socket")
+        logger.info(f"🔀 worker {self.worker_id} 的任务转发 socket: {self.socket_path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._server = self._task = None
+        self.socket_path.unlink(missing_ok=True)
+
+    def _client(self, worker: str):
+        name = f"worker:{worker}"
+        if not self.clients.registered(name):
+            # 流式响应（SSE）可能持续整个任务，不限制读取超时
+            self.clients.register(name, base_url="http://worker", uds=str(self.socket_dir / f"{worker}.sock"),
+                                  max_connections=32, connect_timeout=5.0, read_timeout=None, http2=False)
+        return self.clients.get(name)
+
+    async def forward(self, worker: str, scope: Scope, receive: Receive, send: Send):
+        """把请求原样转发给 worker 并把响应流式发回；worker 已退出时返回 404"""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+
+        headers = [(key, value) for key, value in scope["headers"]
+                   if key not in _HOP_HEADERS and key != b"x-forwarded-for"]
+        headers.append((FORWARDED_HEADER, self.worker_id.encode()))
+        if scope.get("client"):
+            # 本 worker 已按信任的代理解析出客户端地址，转发时直接传递
+            headers.append((b"x-forwarded-for", scope["client"][0].encode()))
+        client = self._client(worker)
+        request = client.build_request(scope["method"], _target(scope), headers=headers, content=bytes(body))
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            # socket 文件不存在或 worker 已退出：任务随进程一起消失了
+            logger.warning(f"⚠️ 转发到 worker {worker} 失败: {e}")
+            await JSONResponse({"detail": "任务未找到或已过期"}, status_code=404)(scope, receive, send)
+            return
+
+        self.forwarded += 1
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(key, value) for key, value in response.headers.raw
+                            if key.lower() not in _RESPONSE_HOP_HEADERS],
+            })
+
+            async def relay():
+                async for chunk in response.aiter_raw():
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b""})
+
+            async def disconnected():
+                while (await receive())["type"] != "http.disconnect":
+                    pass
+
+            # 客户端断开时停止转发，关闭到任务所在 worker 的流
+            relaying = asyncio.ensure_future(relay())
+            watching = asyncio.ensure_future(disconnected())
+            done, pending = await asyncio.wait({relaying, watching}, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if relaying in done:
+                relaying.result()
+        finally:
+            await response.aclose()
+
+    async def fetch_any(self, scope: Scope) -> Optional[Response]:
+        """依次向其他 worker 请求同一路径，返回第一个不是 404 的响应（用于不知道属于哪个 worker 的小响应）"""
+        if _forwarded(scope):
+            return None
+        for worker in self.others():
+            try:
+                response = await self._client(worker).request(
+                    scope["method"], _target(scope), headers={FORWARDED_HEADER.decode(): self.worker_id})
+            except httpx.HTTPError as e:
+                logger.debug(f"向 worker {worker} 查询失败: {e}")
+                continue
+            if response.status_code != 404:
+                self.forwarded += 1
+                return Response(response.content, status_code=response.status_code,
+                                media_type=response.headers.get("content-type"))
+        return None
+
+
+class JobRoutingMiddleware:
+    """/jobs/{job_id} 开头的请求属于其他 worker 时转发过去，其余请求交给应用"""
+
+    def __init__(self, app: ASGIApp, router: WorkerRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            match = _JOB_PATH.match(scope["path"])
+            if match is not None:
+                owner = self.router.owner(match.group(1))
+                if owner is not None and owner != self.router.worker_id and not _forwarded(scope):
+                    await self.router.forward(owner, scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
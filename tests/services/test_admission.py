@@ -0,0 +1,81 @@
+import pytest
+
+from services.admission import AdmissionLimit, AdmissionRejected, busy_frame
+
+
+def test_per_client_limit_rejects_with_429():
+    limit = AdmissionLimit("upload", limit=10, per_client=2)
+    limit.acquire("a")
+    limit.acquire("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limit.acquire("a")
+    assert excinfo.value.status_code == 429
+    # 其他客户端不受影响
+    limit.acquire("b")
+    assert limit.in_use == 3 and limit.rejected == 1
+
+
+def test_global_limit_rejects_with_503():
+    limit = AdmissionLimit("jobs", limit=2)
+    limit.acquire("a")
+    limit.acquire("b")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limit.acquire("c")
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.resource == "jobs"
+
+
+def test_oversized_request_admitted_when_idle():
+    limit = AdmissionLimit("parse_bytes", limit=100, per_client=50)
+    ticket = limit.acquire("a", 500)
+    assert limit.in_use == 500
+    with pytest.raises(AdmissionRejected):
+        limit.acquire("b", 1)
+    ticket.release()
+    assert limit.in_use == 0
+
+
+def test_retry_after_scales_with_excess_and_is_clamped():
+    limit = AdmissionLimit("parse_bytes", limit=100, max_retry_after=30)
+    limit.acquire("a", 100)
+    limit._hold = 40.0
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limit.acquire("b", 10)
+    # 腾出 10 个单位约需 40 * 10 / 100 秒
+    assert excinfo.value.retry_after == 4
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limit.acquire("b", 100)
+    assert excinfo.value.retry_after == 30
+
+    limit._hold = 0.01
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limit.acquire("b", 10)
+    assert excinfo.value.retry_after == 1
+
+
+def test_ticket_grow_and_repeated_release():
+    limit = AdmissionLimit("parse_bytes", limit=100, per_client=100)
+    with limit.acquire("a", 10) as ticket:
+        ticket.grow(30)
+        assert limit.in_use == 40
+        ticket.release()
+        ticket.release()
+        assert limit.in_use == 0
+        # 释放后补记不再生效
+        ticket.grow(5)
+    assert limit.in_use == 0
+    assert limit.status()["clients"] == 0
+
+
+def test_zero_disables_limits():
+    limit = AdmissionLimit("websocket")
+    for _ in range(100):
+        limit.acquire("a")
+    assert limit.in_use == 100 and limit.rejected == 0
+
+
+def test_busy_frame():
+    frame = busy_frame(AdmissionRejected("websocket", 503, 7))
+    assert frame["type"] == "busy"
+    assert frame["resource"] == "websocket"
+    assert frame["retry_after"] == 7
@@ -0,0 +1,65 @@
+import asyncio
+
+from services.audio_jobs import AUDIO_COMPLETED, AudioCache, AudioJobManager
+from services.expiry import ExpiryScheduler
+
+PAIRS = [(0, "我係咁聽返嚟嘅。"), (1, ""), (2, "南無阿彌陀佛"), (3, "南無阿彌陀佛"), (4, "出錯")]
+
+
+def test_audio_cache_evicts_least_recently_used():
+    cache = AudioCache(capacity=2)
+    cache.put("甲", 1)
+    cache.put("乙", 2)
+    assert cache.get("甲") == 1
+    cache.put("丙", 3)
+    assert cache.get("乙") is None
+    assert cache.get("甲") == 1 and cache.get("丙") == 3
+    assert len(cache) == 2 and cache.hits == 3
+
+
+def test_document_audio_streams_in_order_and_synthesizes_once():
+    calls = []
+
+    async def synthesize(text):
+        calls.append(text)
+        if text == "出錯":
+            raise RuntimeError("TTS 出错")
+        await asyncio.sleep(0.01 if text == PAIRS[0][1] else 0)
+        return f"audio-{len(calls)}"
+
+    async def scenario():
+        manager = AudioJobManager(synthesize, lambda audio_id: {"id": audio_id}, concurrency=3)
+        audio_job = manager.create("job", PAIRS)
+        assert manager.create("job", PAIRS) is audio_job
+        entries = [entry async for entry in audio_job.stream()]
+        return audio_job, entries
+
+    audio_job, entries = asyncio.run(scenario())
+    assert audio_job.status == AUDIO_COMPLETED
+    assert [entry["paragraph_id"] for entry in entries] == [0, 2, 3, 4]
+    assert entries[1]["audio_config"] == entries[2]["audio_config"]
+    assert "error" in entries[3]
+    assert sorted(calls) == sorted([PAIRS[0][1], "南無阿彌陀佛", "出錯"])
+    assert audio_job.to_dict() == {"job_id": "job", "status": AUDIO_COMPLETED, "total": 4, "ready": 4, "failed": 1}
+
+
+def test_stream_resumes_after_position():
+    async def scenario():
+        manager = AudioJobManager(lambda text: text, lambda audio_id: {"id": audio_id})
+        audio_job = manager.create("job", PAIRS[:3])
+        return [entry["position"] async for entry in audio_job.stream(after=1)]
+
+    assert asyncio.run(scenario()) == [1]
+
+
+def test_finished_job_expires():
+    async def scenario():
+        expiry = ExpiryScheduler()
+        expiry.start()
+        manager = AudioJobManager(lambda text: text, lambda audio_id: {"id": audio_id}, expiry=expiry, ttl=0.01)
+        await manager.create("job", PAIRS[:1]).task
+        await asyncio.sleep(0.05)
+        await expiry.stop()
+        return manager.get("job")
+
+    assert asyncio.run(scenario()) is None
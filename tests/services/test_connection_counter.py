@@ -0,0 +1,61 @@
+import asyncio
+
+import fakeredis
+from services import connection_counter
+from services.connection_counter import (CONNECTIONS_PREFIX, LocalConnectionCounter, RedisConnectionCounter,
+                                         create_connection_counter)
+
+
+def test_local_counter():
+    counter = create_connection_counter(None)
+    assert isinstance(counter, LocalConnectionCounter)
+    counter.local_connections = 3
+    assert counter.total_connections() == 3
+
+
+def test_redis_counters_sum_other_workers(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(connection_counter.aioredis, "from_url",
+                        lambda url, **kwargs: fakeredis.aioredis.FakeRedis(server=server, **kwargs))
+
+    async def scenario():
+        first = create_connection_counter("redis://test")
+        second = RedisConnectionCounter("redis://test")
+        assert isinstance(first, RedisConnectionCounter)
+        second.worker_id += "-2"
+        await first.start()
+        await second.start()
+        first.local_connections, second.local_connections = 2, 5
+        await first._refresh()
+        await second._refresh()
+        totals = first.total_connections(), second.total_connections()
+        await second.stop()
+        await first._refresh()
+        after_stop = first.total_connections()
+        await first.stop()
+        keys = await fakeredis.aioredis.FakeRedis(server=server).keys(CONNECTIONS_PREFIX + "*")
+        return totals, after_stop, keys
+
+    totals, after_stop, keys = asyncio.run(scenario())
+    assert totals == (7, 7)
+    assert after_stop == 2
+    assert keys == []
+
+
+def test_redis_failure_falls_back_to_local():
+    class BrokenRedis:
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis down")
+
+    async def scenario():
+        counter = RedisConnectionCounter("redis://test")
+        counter._redis = BrokenRedis()
+        counter._other_connections = 4
+        counter.local_connections = 1
+        task = asyncio.create_task(counter._heartbeat())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return counter.total_connections()
+
+    assert asyncio.run(scenario()) == 1
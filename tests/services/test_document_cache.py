@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from services.document_cache import DocumentCache
+from services.document_store import DocumentStore
+from services.expiry import ExpiryScheduler
+
+FILE_ID = "0f8fad5b-d9cb-469f-a165-70867728950e"
+PARAGRAPHS = ["如是我闻", "一时佛在舍卫国", "祇树给孤独园"]
+
+
+def run(tmp_path, scenario, ttl=0.2):
+    """在事件循环中运行 scenario(cache)，返回其结果"""
+    async def main():
+        expiry = ExpiryScheduler()
+        expiry.start()
+        cache = DocumentCache(expiry, DocumentStore(str(tmp_path / "docs")), ttl=ttl)
+        try:
+            return await scenario(cache)
+        finally:
+            await expiry.stop()
+    return asyncio.run(main())
+
+
+async def add(cache):
+    document = await cache.add(FILE_ID, ".txt:abc", "a.txt", PARAGRAPHS, 30, 18)
+    return document
+
+
+def test_find_and_get_load_from_disk(tmp_path):
+    async def scenario(cache):
+        await add(cache)
+        cache.lease(FILE_ID)
+        # 另一个 worker 只能从磁盘读取
+        other = DocumentCache(cache.expiry, cache.store, ttl=cache.ttl)
+        found = await other.find(".txt:abc")
+        return found, list(other.paragraphs(FILE_ID))
+
+    found, paragraphs = run(tmp_path, scenario, ttl=60)
+    assert found["file_id"] == FILE_ID and found["filename"] == "a.txt"
+    assert paragraphs == PARAGRAPHS
+
+
+def test_job_reference_renews_expiry_on_disk(tmp_path):
+    async def scenario(cache):
+        await add(cache)
+        cache.acquire(FILE_ID)
+        await asyncio.sleep(cache.ttl * 3)
+        # 任务运行超过 ttl：磁盘上的过期时间已续期，其他 worker 的清理不会删除
+        swept = cache.store.sweep()
+        meta = cache.store.load_meta(FILE_ID)
+        cache.release(FILE_ID)
+        return swept, meta
+
+    swept, meta = run(tmp_path, scenario)
+    assert swept == 0
+    assert meta["expires_at"] > time.time()
+
+
+def test_sweep_skips_live_documents(tmp_path):
+    async def scenario(cache):
+        await add(cache)
+        cache.acquire(FILE_ID)
+        swept = cache.store.sweep(now=time.time() + 3600, live=cache.live())
+        exists = cache.store.load_meta(FILE_ID) is not None
+        cache.release(FILE_ID)
+        return swept, exists
+
+    assert run(tmp_path, scenario) == (0, True)
+
+
+def test_released_document_is_deleted_after_expiry(tmp_path):
+    async def scenario(cache):
+        await add(cache)
+        cache.lease(FILE_ID)
+        await asyncio.sleep(cache.ttl * 3)
+        await asyncio.gather(*cache._deletions)
+        return FILE_ID in cache, cache.store.load_meta(FILE_ID), await cache.get(FILE_ID)
+
+    assert run(tmp_path, scenario) == (False, None, None)
@@ -0,0 +1,45 @@
+import io
+import zipfile
+
+import docx
+
+from services.document_exporter import FLUSH_EVERY, iter_docx, iter_txt
+
+PAIRS = [("如是我聞。", "我係咁聽返嚟嘅。"), ("一時佛在舍衛國。", "有一次佛喺舍衛國。")]
+
+
+def test_txt_bilingual_and_monolingual():
+    assert b"".join(iter_txt(PAIRS)).decode("utf-8") == (
+        "如是我聞。\n我係咁聽返嚟嘅。\n\n一時佛在舍衛國。\n有一次佛喺舍衛國。\n\n")
+    assert b"".join(iter_txt(PAIRS, bilingual=False)).decode("utf-8") == "我係咁聽返嚟嘅。\n\n有一次佛喺舍衛國。\n\n"
+
+
+def test_txt_is_streamed_in_chunks():
+    chunks = list(iter_txt(PAIRS * FLUSH_EVERY))
+    assert len(chunks) == 2
+
+
+def test_docx_opens_with_python_docx():
+    data = b"".join(iter_docx(PAIRS))
+    document = docx.Document(io.BytesIO(data))
+    assert [p.text for p in document.paragraphs] == [text for pair in PAIRS for text in pair]
+
+    data = b"".join(iter_docx(PAIRS, bilingual=False))
+    document = docx.Document(io.BytesIO(data))
+    assert [p.text for p in document.paragraphs] == [translated for _, translated in PAIRS]
+
+
+def test_docx_escapes_markup_and_control_characters():
+    pairs = [("<w:p>&", "譯文\x07<b>")]
+    data = b"".join(iter_docx(pairs))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+    document = docx.Document(io.BytesIO(data))
+    assert [p.text for p in document.paragraphs] == ["<w:p>&", "譯文<b>"]
+
+
+def test_docx_is_streamed_in_chunks():
+    chunks = list(iter_docx(PAIRS * FLUSH_EVERY * 2))
+    assert len(chunks) > 1
+    document = docx.Document(io.BytesIO(b"".join(chunks)))
+    assert len(document.paragraphs) == len(PAIRS) * FLUSH_EVERY * 4
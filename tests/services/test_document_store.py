@@ -0,0 +1,61 @@
+import uuid
+
+import pytest
+
+from services import document_store
+from services.document_store import DocumentStore
+
+PARAGRAPHS = ["如是我聞。", "", "一時佛在舍衛國祇樹給孤獨園。", "𠀀𪚥"]
+
+
+def make_meta(expires_at=float("inf"), digest=".txt:abc"):
+    return {"filename": "金剛經.txt", "hash": digest, "expires_at": expires_at}
+
+
+def test_write_and_open(tmp_path):
+    store = DocumentStore(str(tmp_path))
+    file_id = str(uuid.uuid4())
+    store.write(file_id, PARAGRAPHS, make_meta())
+    table = store.open(file_id)
+    assert len(table) == len(PARAGRAPHS)
+    assert list(table) == PARAGRAPHS
+    assert store.load_meta(file_id)["filename"] == "金剛經.txt"
+    assert store.find(".txt:abc") == file_id
+    with pytest.raises(TypeError):
+        table[0] = "改寫"
+
+
+def test_released_table_reopens_on_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_store, "MAX_REOPENED", 1)
+    store = DocumentStore(str(tmp_path))
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    store.write(first, PARAGRAPHS, make_meta(digest="a"))
+    store.write(second, PARAGRAPHS[::-1], make_meta(digest="b"))
+    tables = [store.open(first), store.open(second)]
+    for table in tables:
+        table.release()
+        assert table.nbytes == 0
+    assert tables[0][2] == PARAGRAPHS[2]
+    assert tables[1][0] == PARAGRAPHS[-1]
+    # 超出上限时最早重新打开的映射被释放
+    assert tables[0].nbytes == 0 and tables[1].nbytes > 0
+    assert tables[0][0] == PARAGRAPHS[0]
+
+
+def test_invalid_file_id_is_rejected(tmp_path):
+    store = DocumentStore(str(tmp_path))
+    assert store.open("../secret") is None
+    assert store.load_meta("../secret") is None
+    with pytest.raises(ValueError):
+        store.write("../secret", PARAGRAPHS, make_meta())
+
+
+def test_sweep_removes_expired_and_skips_live(tmp_path):
+    store = DocumentStore(str(tmp_path))
+    expired, live, fresh = (str(uuid.uuid4()) for _ in range(3))
+    store.write(expired, PARAGRAPHS, make_meta(expires_at=100, digest="expired"))
+    store.write(live, PARAGRAPHS, make_meta(expires_at=100, digest="live"))
+    store.write(fresh, PARAGRAPHS, make_meta(expires_at=300, digest="fresh"))
+    assert store.sweep(now=200, live={live}) == 1
+    assert store.open(expired) is None and store.find("expired") is None
+    assert store.open(live) is not None and store.open(fresh) is not None
@@ -0,0 +1,57 @@
+import codecs
+
+import pytest
+
+from services.encoding import StreamDecoder, decode_buffer, detect_encoding, read_text
+
+TEXT = "觀自在菩薩，行深般若波羅蜜多時，照見五蘊皆空，度一切苦厄。舍利子，色不異空，空不異色。"
+SIMPLIFIED = "观自在菩萨，行深般若波罗蜜多时，照见五蕴皆空，度一切苦厄。舍利子，色不异空，空不异色。"
+
+
+@pytest.mark.parametrize("data, expected", [
+    (codecs.BOM_UTF8 + TEXT.encode("utf-8"), "utf-8-sig"),
+    (codecs.BOM_UTF16_LE + TEXT.encode("utf-16-le"), "utf-16"),
+    (TEXT.encode("utf-8"), "utf-8"),
+    (SIMPLIFIED.encode("gb18030"), "gb18030"),
+    (TEXT.encode("big5hkscs"), "big5hkscs"),
+    (("Heart Sutra " + TEXT).encode("utf-16-le"), "utf-16-le"),
+    (("Heart Sutra " + TEXT).encode("utf-16-be"), "utf-16-be"),
+])
+def test_detect_encoding(data, expected):
+    assert detect_encoding(data, complete=True) == expected
+
+
+def test_truncated_utf8_sample_is_still_utf8():
+    data = TEXT.encode("utf-8")
+    assert detect_encoding(data[:10], complete=False) == "utf-8"
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "gb18030", "big5hkscs"])
+def test_decode_buffer_after_ascii_prefix(encoding):
+    # 非 ASCII 内容出现在样本之后，按之后的样本识别编码
+    text = "Title: Heart Sutra\n" * 20 + (SIMPLIFIED if encoding == "gb18030" else TEXT)
+    decoded, detected = decode_buffer(text.encode(encoding), sample_size=64)
+    assert detected == encoding
+    assert decoded == text
+
+
+def test_decode_buffer_pure_ascii():
+    assert decode_buffer(b"om mani padme hum") == ("om mani padme hum", "utf-8")
+
+
+def test_stream_decoder_joins_split_chunks():
+    data = TEXT.encode("big5hkscs")
+    decoder = StreamDecoder()
+    for i in range(0, len(data), 7):
+        decoder.feed(data[i:i + 7])
+    assert decoder.finish() == TEXT
+    assert decoder.encoding == "big5hkscs"
+
+
+def test_read_text(tmp_path):
+    path = tmp_path / "sutra.txt"
+    path.write_bytes(SIMPLIFIED.encode("gb18030"))
+    assert read_text(path) == SIMPLIFIED
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    assert read_text(empty) == ""
@@ -0,0 +1,81 @@
+import asyncio
+
+from services.expiry import ExpiryScheduler, FileReaper
+
+
+def test_callbacks_fire_in_deadline_order():
+    expired = []
+
+    async def on_expire_async(key):
+        expired.append(key)
+
+    async def scenario():
+        scheduler = ExpiryScheduler()
+        scheduler.start()
+        scheduler.schedule("late", 0.05, expired.append)
+        scheduler.schedule("early", 0.01, on_expire_async)
+        scheduler.schedule("cancelled", 0.02, expired.append)
+        assert scheduler.cancel("cancelled") and not scheduler.cancel("cancelled")
+        await asyncio.sleep(0.1)
+        remaining = len(scheduler)
+        await scheduler.stop()
+        return remaining
+
+    assert asyncio.run(scenario()) == 0
+    assert expired == ["early", "late"]
+
+
+def test_reschedule_replaces_deadline():
+    expired = []
+
+    async def scenario():
+        scheduler = ExpiryScheduler()
+        scheduler.start()
+        scheduler.schedule("doc", 0.01, expired.append)
+        scheduler.schedule("doc", 10, expired.append)
+        await asyncio.sleep(0.05)
+        assert "doc" in scheduler
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert expired == []
+
+
+def test_failing_callback_does_not_stop_loop():
+    expired = []
+
+    def broken(key):
+        raise RuntimeError("回调出错")
+
+    async def scenario():
+        scheduler = ExpiryScheduler()
+        scheduler.start()
+        scheduler.schedule("broken", 0, broken)
+        scheduler.schedule("next", 0.01, expired.append)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert expired == ["next"]
+
+
+def test_file_reaper_removes_in_batches(tmp_path):
+    paths = [tmp_path / f"{i}.mp3" for i in range(3)]
+    for path in paths:
+        path.write_bytes(b"")
+
+    async def scenario():
+        reaper = FileReaper(batch_size=2, flush_interval=10)
+        reaper.start()
+        reaper.discard(paths[0])
+        reaper.discard(paths[1])
+        await asyncio.sleep(0.05)
+        batched = [path.exists() for path in paths]
+        reaper.discard(paths[2])
+        reaper.discard(tmp_path / "missing.mp3")
+        await reaper.stop()
+        return batched, reaper.removed
+
+    batched, removed = asyncio.run(scenario())
+    assert batched == [False, False, True]
+    assert not paths[2].exists() and removed == 3
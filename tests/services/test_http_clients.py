@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from services.http_clients import HTTPClientRegistry
+from services.worker_routing import _SocketServer
+
+
+async def echo(request):
+    status = int(request.query_params.get("status", 200))
+    return PlainTextResponse("如是", status_code=status)
+
+
+async def serve(socket_path):
+    config = uvicorn.Config(Starlette(routes=[Route("/", echo)]), uds=str(socket_path), lifespan="off",
+                            log_level="warning")
+    server = _SocketServer(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+def test_connections_are_reused_and_counted(tmp_path):
+    async def scenario():
+        server, task = await serve(tmp_path / "upstream.sock")
+        registry = HTTPClientRegistry()
+        registry.register("upstream", base_url="http://upstream", uds=str(tmp_path / "upstream.sock"), http2=False)
+        await registry.start()
+        try:
+            client = registry.get("upstream")
+            assert (await client.get("/")).text == "如是"
+            assert (await client.get("/")).status_code == 200
+            assert (await client.get("/", params={"status": 503})).status_code == 503
+        finally:
+            await registry.close()
+            server.should_exit = True
+            await task
+        return registry.metrics()["upstream"]
+
+    metrics = asyncio.run(scenario())
+    assert metrics["requests"] == 3
+    assert metrics["new_connections"] == 1 and metrics["reused_connections"] == 2
+    assert metrics["server_errors"] == 1
+    assert metrics["tls_handshakes"] == 0 and metrics["avg_tls_ms"] is None
+
+
+def test_get_requires_registration_and_start():
+    async def scenario():
+        registry = HTTPClientRegistry()
+        registry.register("translation", base_url="http://translation")
+        with pytest.raises(KeyError):
+            registry.get("translation")
+        await registry.start()
+        # 启动后才登记的上游在第一次使用时创建
+        registry.register("tts", base_url="http://tts")
+        client = registry.get("tts")
+        assert registry.get("tts") is client
+        with pytest.raises(KeyError):
+            registry.get("unknown")
+        await registry.close()
+        assert client.is_closed
+        return registry.metrics()
+
+    assert asyncio.run(scenario())["tts"]["reuse_ratio"] is None
@@ -0,0 +1,128 @@
+import asyncio
+
+from services.job_manager import JOB_CANCELLED, JOB_COMPLETED, MAX_FOCUS_SPAN, JobManager, ParagraphQueue
+from services.translation_memory import TranslationMemory
+
+PARAGRAPHS = ["如是我聞", "", "南無阿彌陀佛", "  如是我聞  ", "一時佛在舍衛國", "南無阿彌陀佛", "   "]
+
+
+def test_identical_paragraphs_are_grouped():
+    queue = ParagraphQueue(PARAGRAPHS)
+    assert queue.blank == 2
+    assert len(queue) == 3
+    assert list(queue) == [[0, 3], [2, 5], [4]]
+    assert len(queue) == 0
+
+
+def test_focus_moves_range_ahead_latest_first():
+    queue = ParagraphQueue([f"第{i}段" for i in range(10)])
+    assert next(queue) == [0]
+    assert queue.focus(5, 6) == 2
+    assert queue.focus(8, 20) == 2
+    # 已开始的段落不再提前
+    assert queue.focus(0, 0) == 0
+    assert list(queue) == [[8], [9], [5], [6], [1], [2], [3], [4], [7]]
+
+
+def test_focus_on_duplicate_moves_whole_group():
+    queue = ParagraphQueue(PARAGRAPHS)
+    assert queue.focus(5, 5) == 1
+    assert next(queue) == [2, 5]
+
+
+def test_focus_span_is_capped():
+    queue = ParagraphQueue([f"第{i}段" for i in range(MAX_FOCUS_SPAN * 2)])
+    assert queue.focus(0, MAX_FOCUS_SPAN * 2) == MAX_FOCUS_SPAN
+
+
+def run_job(manager: JobManager, paragraphs):
+    async def scenario():
+        job = manager.create_job(paragraphs, filename="心經.txt")
+        await job.task
+        return job
+
+    return asyncio.run(scenario())
+
+
+def test_job_translates_each_group_once():
+    calls = []
+
+    async def translate(text):
+        calls.append(text)
+        return f"粤:{text}"
+
+    job = run_job(JobManager(translate, max_concurrency=2), PARAGRAPHS)
+    assert job.status == JOB_COMPLETED
+    assert sorted(calls) == sorted(["如是我聞", "南無阿彌陀佛", "一時佛在舍衛國"])
+    assert job.completed == job.total and job.unique == 3
+    assert list(job.iter_pairs()) == [
+        ("如是我聞", "粤:如是我聞"), ("南無阿彌陀佛", "粤:南無阿彌陀佛"), ("如是我聞", "粤:如是我聞"),
+        ("一時佛在舍衛國", "粤:一時佛在舍衛國"), ("南無阿彌陀佛", "粤:南無阿彌陀佛"),
+    ]
+    events = [job.event(i) for i in range(job.event_count)]
+    assert events[0]["type"] == "translation_start" and events[0]["unique_paragraphs"] == 3
+    assert events[-1]["type"] == "translation_complete"
+    assert events[-2]["progress"] == 100.0
+
+
+def test_failed_paragraph_does_not_stop_job():
+    async def translate(text):
+        if text == "南無阿彌陀佛":
+            raise RuntimeError("上游出错")
+        return text
+
+    job = run_job(JobManager(translate), PARAGRAPHS)
+    assert job.status == JOB_COMPLETED
+    assert job.failed == 2
+    assert job.results[5] == "翻译出错: 南無阿彌陀佛"
+
+
+def test_reference_passed_only_to_functions_that_accept_it(tmp_path):
+    references = []
+
+    async def translate(text, reference=None):
+        references.append(reference)
+        return f"粤:{text}"
+
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    source = "须菩提，于意云何？可以身相见如来不？不也，世尊！不可以身相得见如来。"
+    memory.add(source, "译文")
+    manager = JobManager(translate, memory=memory)
+    asyncio.run(manager.translate_text(source.replace("不可以身相得见如来", "不可以身相得見如来")))
+    assert references == [(source, "译文")]
+    assert manager.memory_hinted == 1
+
+
+def test_cancel_job():
+    async def translate(text):
+        await asyncio.sleep(10)
+        return text
+
+    async def scenario():
+        manager = JobManager(translate)
+        job = manager.create_job(PARAGRAPHS)
+        await asyncio.sleep(0)
+        assert manager.cancel(job.job_id)
+        await job.task
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == JOB_CANCELLED
+    assert job.event(job.event_count - 1)["type"] == "error"
+
+
+def test_stream_events_replays_and_follows():
+    async def translate(text):
+        await asyncio.sleep(0.01)
+        return text
+
+    async def scenario():
+        manager = JobManager(translate)
+        job = manager.create_job(["如是我聞", "一時佛在舍衛國"])
+        seen = [event["type"] async for _, event in job.stream_events()]
+        replay = [seq async for seq, _ in job.stream_events(after=2)]
+        return seen, replay, job.event_count
+
+    seen, replay, count = asyncio.run(scenario())
+    assert seen == ["translation_start", "translation_result", "translation_result", "translation_complete"]
+    assert replay == list(range(3, count + 1))
@@ -0,0 +1,67 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from services.jyutping import JyutpingAnnotator, load_table
+
+TABLE = Path(__file__).resolve().parents[2] / "data" / "jyutping.tsv"
+
+# 《般若波罗蜜多心经》（玄奘译）全文，以及《金刚经》持经功德分中的一句
+HEART_SUTRA = (
+    "觀自在菩薩，行深般若波羅蜜多時，照見五蘊皆空，度一切苦厄。舍利子，色不異空，空不異色，色即是空，空即是色，"
+    "受想行識，亦復如是。舍利子，是諸法空相，不生不滅，不垢不淨，不增不減。是故空中無色，無受想行識，無眼耳鼻舌身意，"
+    "無色聲香味觸法，無眼界，乃至無意識界，無無明，亦無無明盡，乃至無老死，亦無老死盡。無苦集滅道，無智亦無得。"
+    "以無所得故，菩提薩埵，依般若波羅蜜多故，心無罣礙，無罣礙故，無有恐怖，遠離顛倒夢想，究竟涅槃。三世諸佛，"
+    "依般若波羅蜜多故，得阿耨多羅三藐三菩提。故知般若波羅蜜多，是大神咒，是大明咒，是無上咒，是無等等咒，"
+    "能除一切苦，真實不虛。故說般若波羅蜜多咒，即說咒曰：揭諦揭諦，波羅揭諦，波羅僧揭諦，菩提薩婆訶。"
+    "須菩提，當知是經義不可思議，果報亦不可思議。"
+)
+HEART_SUTRA_SIMPLIFIED = (
+    "观自在菩萨，行深般若波罗蜜多时，照见五蕴皆空，度一切苦厄。舍利子，色不异空，空不异色，色即是空，空即是色，"
+    "受想行识，亦复如是。舍利子，是诸法空相，不生不灭，不垢不净，不增不减。是故空中无色，无受想行识，无眼耳鼻舌身意，"
+    "无色声香味触法，无眼界，乃至无意识界，无无明，亦无无明尽，乃至无老死，亦无老死尽。无苦集灭道，无智亦无得。"
+    "以无所得故，菩提萨埵，依般若波罗蜜多故，心无挂碍，无挂碍故，无有恐怖，远离颠倒梦想，究竟涅槃。三世诸佛，"
+    "依般若波罗蜜多故，得阿耨多罗三藐三菩提。故知般若波罗蜜多，是大神咒，是大明咒，是无上咒，是无等等咒，"
+    "能除一切苦，真实不虚。故说般若波罗蜜多咒，即说咒曰：揭谛揭谛，波罗揭谛，波罗僧揭谛，菩提萨婆诃。"
+    "须菩提，当知是经义不可思议，果报亦不可思议。"
+)
+_HAN = re.compile(r"[一-鿿]")
+
+
+@pytest.fixture(scope="module")
+def annotator(tmp_path_factory):
+    return JyutpingAnnotator(str(TABLE), str(tmp_path_factory.mktemp("index") / "jyutping.idx"))
+
+
+@pytest.mark.parametrize("text", [HEART_SUTRA, HEART_SUTRA_SIMPLIFIED], ids=["traditional", "simplified"])
+def test_sutra_passage_is_fully_annotated(annotator, text):
+    readings = annotator.annotate(text)
+    assert len(readings) == len(text)
+    missing = {char for char, reading in zip(text, readings) if _HAN.match(char) and reading is None}
+    assert not missing
+    # 标点不注音
+    assert readings[text.index("，")] is None
+
+
+def test_curated_readings_take_precedence(annotator):
+    # 经文中"行"默认读 hang4，词条中的其他读音按最长匹配覆盖
+    assert annotator.annotate("行深")[0] == "hang4"
+    assert annotator.annotate("銀行")[1] == "hong4"
+    assert annotator.annotate("思")[0] == "si1"
+    # 简体字取其默认繁体写法的读音
+    assert annotator.annotate("听")[0] == annotator.annotate("聽")[0]
+
+
+def test_table_rows_match_syllable_count(tmp_path):
+    table = tmp_path / "table.tsv"
+    table.write_text("# 注释\n如是\tjyu4 si6\n我\tngo5\n聞\tman4 man6\n", encoding="utf-8")
+    chars, phrases = load_table(str(table))
+    assert chars == {"我": "ngo5"}
+    assert phrases == {"如是": "jyu4 si6"}
+
+
+def test_missing_table_disables_annotation(tmp_path):
+    annotator = JyutpingAnnotator(str(tmp_path / "missing.tsv"), str(tmp_path / "missing.idx"))
+    assert not annotator.available
+    assert annotator.annotate("如是") is None
@@ -0,0 +1,48 @@
+import json
+import logging
+import queue
+import sys
+
+from services.log_config import JsonFormatter, SamplingFilter, _InProcessQueueHandler
+
+
+def make_record(level=logging.INFO, category=None, fields=None, exc_info=None) -> logging.LogRecord:
+    record = logging.LogRecord("services.job_manager", level, __file__, 1, "✅ 段落翻译完成 %s", (3,), exc_info)
+    if category:
+        record.category = category
+    if fields:
+        record.fields = fields
+    return record
+
+
+def test_json_formatter_merges_fields():
+    line = JsonFormatter().format(make_record(category="paragraph", fields={"job_id": "甲", "chars": 12}))
+    payload = json.loads(line)
+    assert payload["message"] == "✅ 段落翻译完成 3"
+    assert payload["level"] == "INFO" and payload["logger"] == "services.job_manager"
+    assert payload["category"] == "paragraph"
+    assert payload["job_id"] == "甲" and payload["chars"] == 12
+    assert "甲" in line
+
+
+def test_rate_limit_per_category():
+    sampling = SamplingFilter({"probe": (1.0, 1 / 60), "frame": (0.0, 0)})
+    assert sampling.filter(make_record(category="probe"))
+    assert not sampling.filter(make_record(category="probe"))
+    assert not sampling.filter(make_record(category="frame"))
+    # 未配置的类别和 WARNING 以上级别不受影响
+    assert sampling.filter(make_record(category="other"))
+    assert sampling.filter(make_record(level=logging.WARNING, category="frame"))
+    assert sampling.dropped == {"probe": 1, "frame": 1}
+
+
+def test_queue_handler_pins_traceback_in_calling_thread():
+    try:
+        raise RuntimeError("上游出错")
+    except RuntimeError:
+        record = make_record(level=logging.ERROR, exc_info=sys.exc_info())
+    log_queue = queue.SimpleQueue()
+    _InProcessQueueHandler(log_queue).handle(record)
+    queued = log_queue.get_nowait()
+    assert queued.exc_info is None and "RuntimeError: 上游出错" in queued.exc_text
+    assert "RuntimeError" in json.loads(JsonFormatter().format(queued))["exc_info"]
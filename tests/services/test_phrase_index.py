@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from services.phrase_index import LazyIndex, PhraseIndex, compile_index, read_tsv
+
+CHARS = {"般": "bun1", "若": "joek6", "波": "bo1", "羅": "lo4", "蜜": "mat6", "𠀀": "x1"}
+PHRASES = {"般若": "bo1 je5", "般若波羅蜜": "bo1 je5 bo1 lo4 mat6", "若波": "y1 y2", "多時": "do1 si4"}
+
+
+@pytest.fixture
+def index(tmp_path):
+    compile_index(CHARS, PHRASES, tmp_path / "table.idx")
+    return PhraseIndex.open(tmp_path / "table.idx")
+
+
+def test_char_lookup(index):
+    assert index.get("般") == "bun1"
+    assert index.get("𠀀") == "x1"
+    assert index.get("，") is None
+    # 只作为词首出现的字没有值
+    assert index.get("多") is None
+    assert index.lookup("般，𠀀") == ["bun1", None, "x1"]
+
+
+def test_longest_match_left_to_right(index):
+    assert list(index.matches("般若波羅蜜多時")) == [(0, 5, "bo1 je5 bo1 lo4 mat6"), (5, 7, "do1 si4")]
+    # 词条互不重叠：般若 先匹配，若波 不再使用
+    assert list(index.matches("般若波")) == [(0, 2, "bo1 je5")]
+    assert list(index.matches("若波")) == [(0, 2, "y1 y2")]
+
+
+def test_bad_magic(tmp_path):
+    path = tmp_path / "bad.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        PhraseIndex.open(path)
+
+
+def test_read_tsv_skips_comments(tmp_path):
+    path = tmp_path / "table.tsv"
+    path.write_text("# 注释\n\n如\tjyu4 \n是\n", encoding="utf-8")
+    assert list(read_tsv(path)) == [(3, "如", "jyu4"), (4, "是", "")]
+
+
+def test_lazy_index_recompiles_when_source_changes(tmp_path):
+    source = tmp_path / "table.tsv"
+    target = tmp_path / "index" / "table.idx"
+    builds = []
+
+    def build(path):
+        builds.append(path)
+        return {key: value for _, key, value in read_tsv(path)}, {}
+
+    source.write_text("如\tjyu4\n", encoding="utf-8")
+    assert LazyIndex(source, target, build).get().get("如") == "jyu4"
+    # 索引已是最新的，不再编译
+    assert LazyIndex(source, target, build).get().get("如") == "jyu4"
+    assert len(builds) == 1
+
+    source.write_text("如\tjyu5\n", encoding="utf-8")
+    mtime = target.stat().st_mtime + 10
+    os.utime(source, (mtime, mtime))
+    assert LazyIndex(source, target, build).get().get("如") == "jyu5"
+    assert len(builds) == 2
+
+
+def test_lazy_index_unavailable(tmp_path):
+    def build(path):
+        raise FileNotFoundError(path)
+
+    assert LazyIndex(tmp_path / "missing.tsv", tmp_path / "missing.idx", build).get() is None
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.profiler import LoopLagMonitor, MemoryTracer, SamplingProfiler, dump_tasks
+
+
+def busy_wait(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collects_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait, args=(stop,), name="busy-worker")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        profiler.start(interval=0.001, duration=5)
+        with pytest.raises(RuntimeError):
+            profiler.start()
+        time.sleep(0.1)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+    assert profiler.samples > 0 and not profiler.running
+    lines = profiler.collapsed().splitlines()
+    assert any(line.startswith("busy-worker;") and "busy_wait (services/test_profiler.py" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_dump_tasks_shows_await_chain():
+    async def wait_forever(event):
+        await event.wait()
+
+    async def wait_for_task(task):
+        await task
+
+    async def scenario():
+        event = asyncio.Event()
+        task = asyncio.create_task(wait_forever(event), name="job:甲")
+        follower = asyncio.create_task(wait_for_task(task), name="follower")
+        await asyncio.sleep(0)
+        tasks = dump_tasks()
+        event.set()
+        await follower
+        return tasks
+
+    tasks = {task["name"]: task for task in asyncio.run(scenario())}
+    waiting = tasks["job:甲"]
+    assert waiting["coroutine"].endswith("wait_forever")
+    assert "wait_forever" in waiting["stack"][0]
+    assert waiting["stack"][-1] == "<等待 Future>"
+    assert tasks["follower"]["stack"][-1] == "<等待 job:甲>"
+
+
+def test_memory_tracer_reports_growth():
+    tracer = MemoryTracer()
+    with pytest.raises(RuntimeError):
+        tracer.top()
+    tracer.start(frames=4)
+    try:
+        retained = [bytearray(1024) for _ in range(1000)]
+        report = tracer.top(limit=5, growth=True)
+        collapsed = tracer.collapsed()
+    finally:
+        tracer.stop()
+    assert len(retained) == 1000
+    assert report["traced_bytes"] >= 1024 * 1000
+    assert any("test_profiler.py" in entry["location"] and entry["size_diff"] >= 1024 * 1000
+               for entry in report["top"])
+    assert "services/test_profiler.py" in collapsed
+    assert not tracer.running
+
+
+def test_loop_lag_monitor_measures_blocking():
+    async def scenario():
+        monitor = LoopLagMonitor()
+        assert monitor.status() == {"running": False, "samples": 0}
+        monitor.start(interval=0.01)
+        await asyncio.sleep(0.02)
+        time.sleep(0.05)
+        await asyncio.sleep(0.03)
+        status = monitor.status()
+        await monitor.stop()
+        return status
+
+    status = asyncio.run(scenario())
+    assert status["running"] and status["samples"] >= 2
+    assert status["max_ms"] >= 30
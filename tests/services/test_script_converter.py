@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from services.script_converter import SIMPLIFIED, TRADITIONAL, ScriptConverter, load_s2t, load_t2s
+
+TABLE = Path(__file__).resolve().parents[2] / "data" / "t2s.tsv"
+
+# 《地藏菩萨本愿经》忉利天宫神通品开头
+KSITIGARBHA = "如是我聞。一時佛在忉利天，為母說法。爾時十方無量世界，不可說不可說一切諸佛，及大菩薩摩訶薩，皆來集會。"
+KSITIGARBHA_SIMPLIFIED = "如是我闻。一时佛在忉利天，为母说法。尔时十方无量世界，不可说不可说一切诸佛，及大菩萨摩诃萨，皆来集会。"
+# 《金刚经》法会因由分，"鉢"不在早先手工整理的对照表中
+DIAMOND_SUTRA = "入舍衛大城乞食。於其城中次第乞已，還至本處。飯食訖，收衣鉢，洗足已，敷座而坐。"
+DIAMOND_SUTRA_SIMPLIFIED = "入舍卫大城乞食。于其城中次第乞已，还至本处。饭食讫，收衣钵，洗足已，敷座而坐。"
+
+
+@pytest.fixture(scope="module")
+def converter(tmp_path_factory):
+    return ScriptConverter(str(TABLE), str(tmp_path_factory.mktemp("index")))
+
+
+@pytest.mark.parametrize("traditional, simplified", [(KSITIGARBHA, KSITIGARBHA_SIMPLIFIED),
+                                                     (DIAMOND_SUTRA, DIAMOND_SUTRA_SIMPLIFIED)])
+def test_sutra_passage_round_trip(converter, traditional, simplified):
+    assert converter.convert(traditional, SIMPLIFIED) == simplified
+    assert converter.convert(simplified, TRADITIONAL) == traditional
+
+
+def test_phrases_disambiguate_one_to_many(converter):
+    assert converter.convert("头发", TRADITIONAL) == "頭髮"
+    assert converter.convert("发展", TRADITIONAL) == "發展"
+    assert converter.convert("北斗星和战斗", TRADITIONAL) == "北斗星和戰鬥"
+    # 简体中仍然使用的字不转换
+    assert converter.convert("著作", SIMPLIFIED) == "著作"
+
+
+def test_curated_rows_take_precedence(converter):
+    assert converter.convert("乾闥婆", SIMPLIFIED) == "乾闼婆"
+    assert converter.convert("尸罗", TRADITIONAL) == "尸羅"
+    assert converter.convert("我系香港人", TRADITIONAL) == "我係香港人"
+
+
+def test_detect(converter):
+    assert converter.detect(KSITIGARBHA) == TRADITIONAL
+    assert converter.detect(KSITIGARBHA_SIMPLIFIED) == SIMPLIFIED
+    assert converter.detect("如是") is None
+    assert converter.detect("持鉢乞食") == TRADITIONAL
+    # 前面的段落简繁同形时看后面的段落
+    assert converter.detect_document(["如是", None, "", "忉利天宮"]) == TRADITIONAL
+
+
+def test_unsupported_script_raises(converter):
+    with pytest.raises(ValueError):
+        converter.convert("如是", "latin")
+    assert converter.convert("如是", None) == "如是"
+
+
+def test_first_row_wins_in_each_direction(tmp_path):
+    table = tmp_path / "t2s.tsv"
+    table.write_text("發\t发\n髮\t发\n頭髮\t头发\n", encoding="utf-8")
+    assert load_t2s(str(table)) == ({"發": "发", "髮": "发"}, {"頭髮": "头发"})
+    assert load_s2t(str(table)) == ({"发": "發"}, {"头发": "頭髮"})
+
+
+def test_missing_table_returns_text_unchanged(tmp_path):
+    converter = ScriptConverter(str(tmp_path / "missing.tsv"), str(tmp_path))
+    assert not converter.available(SIMPLIFIED)
+    assert converter.convert("觀自在", SIMPLIFIED) == "觀自在"
@@ -0,0 +1,18 @@
+import json
+
+from services.serialization import FastJSONResponse, dumps, dumps_str, loads
+
+EVENT = {"type": "translation_result", "original": "如是我聞", "progress": 50.0, 3: None}
+
+
+def test_compact_utf8_without_escaping():
+    assert dumps_str({"a": "如是"}) == '{"a":"如是"}'
+    assert dumps({"a": "如是"}) == '{"a":"如是"}'.encode("utf-8")
+
+
+def test_round_trip_with_int_keys():
+    assert loads(dumps(EVENT)) == json.loads(json.dumps(EVENT))
+
+
+def test_response_body():
+    assert loads(FastJSONResponse(EVENT).body) == loads(dumps(EVENT))
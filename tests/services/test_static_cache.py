@@ -0,0 +1,54 @@
+import asyncio
+import gzip
+import os
+
+from services.static_cache import StaticCache
+
+PAGE = "<html><body>" + "南無阿彌陀佛。" * 100 + "</body></html>"
+
+
+def get(cache, path):
+    return asyncio.run(cache.get(str(path)))
+
+
+def test_compressed_variants_and_negotiation(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text(PAGE, encoding="utf-8")
+    asset = get(StaticCache(), path)
+    assert gzip.decompress(asset.encoded["gzip"]) == PAGE.encode("utf-8")
+
+    response = StaticCache.response(asset, {"accept-encoding": "gzip, br;q=0"}, "no-cache")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == asset.etag
+    response = StaticCache.response(asset, {"accept-encoding": "gzip;q=0"}, "no-cache")
+    assert "content-encoding" not in response.headers
+    assert response.body == asset.body
+
+    head = StaticCache.response(asset, {"accept-encoding": "gzip"}, "no-cache", head=True)
+    assert head.body == b"" and head.headers["content-length"] == str(len(asset.encoded["gzip"]))
+
+
+def test_if_none_match_returns_304(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text('{"name": "如是"}', encoding="utf-8")
+    asset = get(StaticCache(), path)
+    assert asset.media_type == "application/json; charset=utf-8"
+    assert StaticCache.response(asset, {"if-none-match": f'"x", {asset.etag}'}, "no-cache").status_code == 304
+
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text("舊", encoding="utf-8")
+    cache = StaticCache(check_interval=0)
+    first = get(cache, path)
+    assert get(cache, path) is first
+    path.write_text("新版本", encoding="utf-8")
+    os.utime(path, ns=(first.signature[0] + 10**9, first.signature[0] + 10**9))
+    assert get(cache, path).body == "新版本".encode("utf-8")
+
+
+def test_missing_file_is_not_remembered(tmp_path):
+    cache = StaticCache()
+    assert get(cache, tmp_path / "missing.html") is None
+    assert get(cache, tmp_path) is None
+    assert not cache._checked and not cache._assets
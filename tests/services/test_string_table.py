@@ -0,0 +1,28 @@
+from array import array
+
+from services.string_table import ENCODING, StringTable
+
+
+def test_fill_in_any_order():
+    table = StringTable(3)
+    assert list(table) == [None, None, None]
+    table[2] = "南無阿彌陀佛"
+    table[-3] = "如是我聞"
+    table[2] = "南無觀世音菩薩"
+    assert list(table) == ["如是我聞", None, "南無觀世音菩薩"]
+
+
+def test_from_strings_keeps_supplementary_characters():
+    strings = ["", "𠀀𪚥", "觀自在"]
+    table = StringTable.from_strings(strings)
+    assert list(table) == strings
+    # 汉字每字 2 字节，扩展区每字 4 字节
+    assert len(table._buffer) == 4 * 2 + 3 * 2
+
+
+def test_from_buffer_does_not_copy():
+    buffer = bytearray("色即是空".encode(ENCODING))
+    table = StringTable.from_buffer(memoryview(buffer), array("q", [0, 4]), array("q", [4, 8]))
+    assert list(table) == ["色即", "是空"]
+    buffer[:2] = "空".encode(ENCODING)
+    assert table[0] == "空即"
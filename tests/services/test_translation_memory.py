@@ -0,0 +1,56 @@
+from services.translation_memory import TranslationMemory, jaccard, shingles
+
+# 《金刚经》如理实见分第五至正信希有分第六
+DIAMOND_SUTRA = (
+    "须菩提，于意云何？可以身相见如来不？不也，世尊！不可以身相得见如来。何以故？如来所说身相，即非身相。"
+    "佛告须菩提：凡所有相，皆是虚妄。若见诸相非相，则见如来。"
+    "须菩提白佛言：世尊，颇有众生，得闻如是言说章句，生实信不？"
+)
+
+
+def make_memory(tmp_path, **kwargs) -> TranslationMemory:
+    return TranslationMemory(str(tmp_path / "memory.db"), **kwargs)
+
+
+def test_exact_match_is_reused(tmp_path):
+    memory = make_memory(tmp_path)
+    memory.add(DIAMOND_SUTRA, "译文")
+    match = memory.lookup(DIAMOND_SUTRA)
+    assert match.exact and memory.reusable(match)
+
+
+def test_match_ignores_whitespace_and_punctuation(tmp_path):
+    memory = make_memory(tmp_path)
+    memory.add(DIAMOND_SUTRA, "译文")
+    match = memory.lookup(DIAMOND_SUTRA.replace("，", "、").replace("：", " "))
+    assert match.exact and match.translation == "译文"
+    assert memory.reusable(match)
+
+
+def test_negation_flip_is_only_a_hint(tmp_path):
+    flipped = DIAMOND_SUTRA.replace("皆是虚妄", "皆非虚妄")
+    assert jaccard(shingles(DIAMOND_SUTRA), shingles(flipped)) > 0.95
+
+    memory = make_memory(tmp_path)
+    memory.add(DIAMOND_SUTRA, "译文")
+    match = memory.lookup(flipped)
+    assert match is not None and not match.exact
+    assert not memory.reusable(match)
+
+
+def test_reuse_threshold_reuses_near_duplicates(tmp_path):
+    memory = make_memory(tmp_path, reuse_threshold=0.95)
+    memory.add(DIAMOND_SUTRA, "译文")
+    assert memory.reusable(memory.lookup(DIAMOND_SUTRA.replace("皆是虚妄", "皆非虚妄")))
+
+
+def test_unrelated_text_below_hint_threshold(tmp_path):
+    memory = make_memory(tmp_path)
+    memory.add(DIAMOND_SUTRA, "译文")
+    assert memory.lookup("观自在菩萨，行深般若波罗蜜多时，照见五蕴皆空，度一切苦厄。") is None
+    assert not memory.reusable(None)
+
+
+def test_repetition_count_lowers_similarity():
+    chant = "揭谛揭谛，波罗揭谛，波罗僧揭谛，菩提萨婆诃。"
+    assert jaccard(shingles(chant * 3), shingles(chant * 5)) < 0.95
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+
+import pytest
+
+from services.upstream_client import AdaptiveLimiter, ResilientClient, TokenBucket, is_retryable
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def warm_up(tracker, seconds=0.01):
+    """填满延迟样本，使对冲延迟可用"""
+    for _ in range(tracker.min_samples):
+        tracker.record(seconds)
+
+
+def test_retryable_errors():
+    assert is_retryable(UpstreamError(503))
+    assert is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(UpstreamError(400))
+
+
+def test_retries_until_success():
+    attempts = []
+
+    async def translate(text):
+        attempts.append(text)
+        if len(attempts) < 3:
+            raise UpstreamError(503)
+        return "粤:" + text
+
+    client = ResilientClient(translate, base_delay=0.001)
+    assert asyncio.run(client("如是")) == "粤:如是"
+    assert client.retries == 2 and client.breaker.state == "closed"
+
+
+def test_client_error_is_not_retried():
+    async def translate(text):
+        raise UpstreamError(400)
+
+    client = ResilientClient(translate, base_delay=0.001)
+    with pytest.raises(UpstreamError):
+        asyncio.run(client("如是"))
+    assert client.retries == 0
+
+
+def test_limiter_halves_on_overload_once_per_window():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial=8)
+        first = await limiter.acquire()
+        second = await limiter.acquire()
+        await limiter.release(first, overloaded=True)
+        await limiter.release(second, overloaded=True)
+        return limiter.limit
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_token_bucket_try_acquire():
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_slow_call_is_hedged():
+    calls = []
+
+    async def translate(text):
+        calls.append(text)
+        await asyncio.sleep(1 if len(calls) == 1 else 0)
+        return f"第{len(calls)}次"
+
+    client = ResilientClient(translate, hedge=True, hedge_budget=1.0, hedge_min_delay=0.01)
+    warm_up(client.latency)
+    assert asyncio.run(client("如是")) == "第2次"
+    assert client.hedges == 1 and client.hedge_wins == 1
+    assert client.limiter.in_flight == 0
+
+
+def test_stream_is_hedged_on_first_chunk():
+    closed = []
+
+    async def slow_stream(text):
+        try:
+            await asyncio.sleep(1)
+            yield "慢"
+        finally:
+            closed.append("slow")
+
+    async def fast_stream(text):
+        yield "快"
+        yield "一点"
+
+    async def translate(text):
+        return text
+
+    client = ResilientClient(translate, stream_func=slow_stream, hedge=True, hedge_stream_func=fast_stream,
+                             hedge_budget=1.0, hedge_min_delay=0.01)
+    warm_up(client.first_chunk_latency)
+
+    async def collect():
+        return [chunk async for chunk in client.stream("如是")]
+
+    assert asyncio.run(collect()) == ["快", "一点"]
+    assert client.hedges == 1 and client.hedge_wins == 1
+    assert closed == ["slow"]
+    assert client.limiter.in_flight == 0
+
+
+def test_stream_without_samples_is_not_hedged():
+    async def stream(text):
+        yield "粤:"
+        yield text
+
+    async def translate(text):
+        return text
+
+    client = ResilientClient(translate, stream_func=stream, hedge=True)
+
+    async def collect():
+        return [chunk async for chunk in client.stream("如是")]
+
+    assert asyncio.run(collect()) == ["粤:", "如是"]
+    assert client.hedges == 0
+    assert client.metrics()["first_chunk_hedge_delay_ms"] is None
+
+
+def test_sync_function_disables_hedging_with_warning(caplog):
+    def translate(text):
+        return text
+
+    with caplog.at_level(logging.WARNING, logger="services.upstream_client"):
+        client = ResilientClient(translate, hedge=True)
+    assert not client.hedge
+    assert "已关闭对冲" in caplog.text
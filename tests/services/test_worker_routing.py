@@ -0,0 +1,86 @@
+import asyncio
+import socket
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from services.http_clients import HTTPClientRegistry
+from services.worker_routing import FORWARDED_HEADER, JobRoutingMiddleware, WorkerRouter, remove_stale_sockets
+
+
+def make_app(name: str):
+    async def job(request: Request):
+        return JSONResponse({
+            "worker": name,
+            "job_id": request.path_params["job_id"],
+            "query": request.url.query,
+            "body": (await request.body()).decode("utf-8"),
+            "forwarded": request.headers.get(FORWARDED_HEADER.decode()) is not None,
+            "client": request.client.host if request.client else None,
+        })
+
+    async def events(request: Request):
+        async def lines():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(lines(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/jobs/{job_id}", job, methods=["GET", "POST"]),
+                             Route("/jobs/{job_id}/events", events)])
+
+
+def test_owner_and_prefix(tmp_path):
+    router = WorkerRouter(make_app("a"), str(tmp_path), HTTPClientRegistry())
+    assert router.owner(f"{router.job_prefix}1234") == router.worker_id
+    assert router.owner("1234-5678") is None
+    assert router.owner("not-a-worker.1234") is None
+
+
+def test_requests_are_forwarded_to_owner(tmp_path):
+    async def scenario():
+        clients = HTTPClientRegistry()
+        await clients.start()
+        local = WorkerRouter(make_app("local"), str(tmp_path), clients)
+        remote = WorkerRouter(make_app("remote"), str(tmp_path), clients)
+        await remote.start()
+        while not remote._server.started:
+            await asyncio.sleep(0.01)
+        app = JobRoutingMiddleware(local.app, local)
+        transport = httpx.ASGITransport(app=app, client=("203.0.113.7", 1234))
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                assert local.others() == [remote.worker_id]
+                own = (await client.get(f"/jobs/{local.job_prefix}1")).json()
+                forwarded = (await client.post(f"/jobs/{remote.job_prefix}2?after=3", content="如是".encode())).json()
+                events = (await client.get(f"/jobs/{remote.job_prefix}2/events")).text
+                await remote.stop()
+                gone = await client.get(f"/jobs/{remote.job_prefix}3")
+        finally:
+            await clients.close()
+        return own, forwarded, events, gone, local.forwarded
+
+    own, forwarded, events, gone, count = asyncio.run(scenario())
+    assert own["worker"] == "local" and not own["forwarded"]
+    assert forwarded["worker"] == "remote" and forwarded["forwarded"]
+    assert forwarded["query"] == "after=3" and forwarded["body"] == "如是"
+    assert forwarded["client"] == "203.0.113.7"
+    assert events == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    assert gone.status_code == 404
+    assert count == 2
+
+
+def test_remove_stale_sockets(tmp_path):
+    listening = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listening.bind(str(tmp_path / "live.sock"))
+    listening.listen()
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(tmp_path / "stale.sock"))
+    stale.close()
+    try:
+        remove_stale_sockets(tmp_path)
+    finally:
+        listening.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["live.sock"]
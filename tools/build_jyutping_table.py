@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+从 rime-cantonese 生成粤拼注音表 data/jyutping.tsv
+
+    pip install pycantonese
+    python tools/build_jyutping_table.py
+
+数据来自 rime-cantonese（CC BY 4.0，https://github.com/rime/rime-cantonese），使用 PyCantonese
+打包的 chars_to_jyutping.json（繁体字和词 -> 粤拼，单字只收默认读音），也可以用 --source 指定这个文件。
+
+注音表中人工整理的部分（经文用词、多音字在经文和粤语口语中的默认读音）写在 GENERATED_MARKER 之前，
+重新生成时原样保留并排在最前面（同一个字或词以第一行为准）。生成部分：
+    - 所有单字的默认读音；简体写法不同的字按 data/t2s.tsv 转成简体另列一行，
+      读音取其默认繁体写法（"听"读作"聽"的 teng1，而不是"听"本字的 jan5）
+    - 只收读音与逐字默认读音不同的词（多音字的非默认读音），逐字注音已经正确的词不收
+简繁转换表更新后应重新运行本脚本。
+"""
+
+import argparse
+import importlib.metadata
+import importlib.util
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.phrase_index import MAX_PHRASE
+from services.script_converter import ScriptConverter
+
+GENERATED_MARKER = "# ==== 以下由 tools/build_jyutping_table.py 从 rime-cantonese 生成，请勿手工修改 ===="
+_HEADER = f"""{GENERATED_MARKER}
+# 来源：rime-cantonese（https://github.com/rime/rime-cantonese），{{source}}
+# 许可：CC BY 4.0（https://creativecommons.org/licenses/by/4.0/），见 data/LICENSE.rime-cantonese.txt。
+# 简体写法由 data/t2s.tsv 转换得到，词条只收读音与逐字默认读音不同的词。
+"""
+_HAN = re.compile(r"[〇㐀-䶿一-鿿豈-﫿\U00020000-\U0003134f]+")
+_SYLLABLE = re.compile(r"[a-z]+[1-6]")
+
+
+def default_source() -> Optional[Path]:
+    """已安装的 PyCantonese 中的 chars_to_jyutping.json（不导入 pycantonese）"""
+    spec = importlib.util.find_spec("pycantonese")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return Path(list(spec.submodule_search_locations)[0]) / "data" / "rime_cantonese" / "chars_to_jyutping.json"
+
+
+def source_note(source: Path) -> str:
+    try:
+        version = importlib.metadata.version("pycantonese")
+    except importlib.metadata.PackageNotFoundError:
+        return source.name
+    return f"PyCantonese {version} 打包的 {source.name}"
+
+
+def read_curated(path: Path) -> List[str]:
+    """注音表中生成标记之前的人工整理部分"""
+    if not path.exists():
+        return []
+    lines = path.read_text(encoding="utf-8").splitlines()
+    if GENERATED_MARKER in lines:
+        lines = lines[:lines.index(GENERATED_MARKER)]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return lines
+
+
+def curated_entries(lines: List[str]) -> Dict[str, str]:
+    entries: Dict[str, str] = {}
+    for line in lines:
+        if line and not line.startswith("#") and "\t" in line:
+            key, reading = line.split("\t", 1)
+            entries.setdefault(key.strip(), reading.strip())
+    return entries
+
+
+def valid(key: str, reading: str) -> bool:
+    """只收纯汉字、音节数等于字数的条目"""
+    syllables = reading.split()
+    return (_HAN.fullmatch(key) is not None and len(syllables) == len(key) <= MAX_PHRASE
+            and all(_SYLLABLE.fullmatch(syllable) for syllable in syllables))
+
+
+def build(source: Dict[str, str], curated: Dict[str, str], converter: ScriptConverter) -> List[str]:
+    """返回生成部分的数据行"""
+    entries = {key: " ".join(reading.split()) for key, reading in source.items() if valid(key, reading)}
+    traditional = {key: reading for key, reading in entries.items() if len(key) == 1}
+
+    # 单字：先繁体（表中本来的字），再补简体写法
+    chars = dict(traditional)
+    simplified_chars = set()
+    for char in traditional:
+        simplified = converter.convert(char, "simplified")
+        if simplified == char or len(simplified) != 1 or simplified in simplified_chars:
+            continue
+        simplified_chars.add(simplified)
+        # 简体字的读音取其默认繁体写法，不取同形的另一个字（听 -> 聽）
+        default = converter.convert(simplified, "traditional")
+        chars[simplified] = traditional.get(default, traditional[char])
+
+    def char_default(char: str) -> Optional[str]:
+        # 人工整理的读音优先
+        return curated.get(char) or chars.get(char)
+
+    # 词：只收逐字默认读音注不对的词，简体写法不同时另列一行
+    phrases: Dict[str, str] = {}
+    for word, reading in entries.items():
+        if len(word) == 1:
+            continue
+        for key in (word, converter.convert(word, "simplified")):
+            if len(key) != len(word) or key in curated or key in phrases:
+                continue
+            if reading.split() != [char_default(char) for char in key]:
+                phrases[key] = reading
+
+    rows = [f"{char}\t{reading}" for char, reading in chars.items() if char not in curated]
+    rows += [f"{word}\t{reading}" for word, reading in phrases.items()]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="rime-cantonese 的 chars_to_jyutping.json（默认取已安装的 PyCantonese 中的文件）")
+    parser.add_argument("--output", default="data/jyutping.tsv")
+    parser.add_argument("--script-table", default="data/t2s.tsv")
+    parser.add_argument("--source-note", help="写在表头的数据版本说明（默认为 PyCantonese 的版本号）")
+    args = parser.parse_args()
+
+    source = Path(args.source) if args.source else default_source()
+    if source is None or not source.exists():
+        parser.error("找不到 chars_to_jyutping.json：请先 pip install pycantonese，或用 --source 指定")
+    with open(source, encoding="utf-8") as f:
+        data = json.load(f)
+
+    output = Path(args.output)
+    curated_lines = read_curated(output)
+    # 转换表按源文件编译索引，放在临时目录
+    converter = ScriptConverter(args.script_table, os.environ.get("SCRIPT_INDEX_DIR", "temp"))
+    rows = build(data, curated_entries(curated_lines), converter)
+
+    tmp = output.with_name(output.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        for line in curated_lines:
+            f.write(line + "\n")
+        f.write(_HEADER.format(source=args.source_note or source_note(source)))
+        for row in rows:
+            f.write(row + "\n")
+    os.replace(tmp, output)
+    print(f"✅ 写入 {output}：人工整理 {len(curated_entries(curated_lines))} 条，生成 {len(rows)} 条")
+
+
+if __name__ == "__main__":
+    main()
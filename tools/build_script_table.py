@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+从 OpenCC 生成简繁对照表 data/t2s.tsv
+
+    pip install opencc-python-reimplemented
+    python tools/build_script_table.py
+
+数据来自 OpenCC（Apache-2.0，https://github.com/BYVoid/OpenCC）的文本词典：繁转简用 TSCharacters / TSPhrases，
+简转繁用 STCharacters / STPhrases，一对多的字取第一个候选。默认读取 opencc-python-reimplemented 自带的
+opencc/dictionary 目录，也可以用 --dictionary 指定 OpenCC 仓库的 data/dictionary 目录。
+
+对照表每行同时用于两个方向（繁转简以繁体为键，简转繁以简体为键，同一个键以第一行为准），
+生成时按顺序写出各行，使两个方向的转换结果都与 OpenCC 相同：一行只有在它对两个方向都不会
+改变 OpenCC 的结果（或者对应的键已经由前面的行确定）时才写出，必要时先写出简繁同形的行占住键。
+
+注音表中人工整理的部分（经文用词等）写在 GENERATED_MARKER 之前，重新生成时原样保留并排在最前面。
+更新后应重新运行 tools/build_jyutping_table.py，补全粤拼注音表中的简体写法。
+"""
+
+import argparse
+import importlib.util
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+GENERATED_MARKER = "# ==== 以下由 tools/build_script_table.py 从 OpenCC 生成，请勿手工修改 ===="
+_HEADER = f"""{GENERATED_MARKER}
+# 来源：OpenCC（https://github.com/BYVoid/OpenCC），{{source}}
+# 许可：Apache License 2.0，见 data/LICENSE.opencc.txt。
+"""
+
+Row = Tuple[str, str]
+
+
+def default_dictionary() -> Optional[Path]:
+    """opencc-python-reimplemented 自带的文本词典目录（不导入 opencc）"""
+    spec = importlib.util.find_spec("opencc")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return Path(list(spec.submodule_search_locations)[0]) / "dictionary"
+
+
+def read_dictionary(*paths: Path) -> Dict[str, str]:
+    """读取 OpenCC 文本词典（键<TAB>候选1 候选2 ...），取第一个候选"""
+    mapping: Dict[str, str] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                key, tab, values = line.rstrip("\n").partition("\t")
+                if key and tab and values:
+                    mapping.setdefault(key, values.split(" ")[0])
+    return mapping
+
+
+def max_match(mapping: Dict[str, str]) -> Callable[[str], str]:
+    """与 OpenCC 相同的正向最长匹配转换"""
+    longest = max(map(len, mapping))
+
+    def convert(text: str) -> str:
+        parts = []
+        i = 0
+        while i < len(text):
+            for size in range(min(longest, len(text) - i), 0, -1):
+                value = mapping.get(text[i:i + size])
+                if value is not None:
+                    parts.append(value)
+                    i += size
+                    break
+            else:
+                parts.append(text[i])
+                i += 1
+        return "".join(parts)
+
+    return convert
+
+
+def read_curated(path: Path) -> List[str]:
+    """对照表中生成标记之前的人工整理部分"""
+    if not path.exists():
+        return []
+    lines = path.read_text(encoding="utf-8").splitlines()
+    if GENERATED_MARKER in lines:
+        lines = lines[:lines.index(GENERATED_MARKER)]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return lines
+
+
+def curated_rows(lines: Iterable[str]) -> List[Row]:
+    rows = []
+    for line in lines:
+        if line and not line.startswith("#") and "\t" in line:
+            traditional, simplified = line.split("\t", 1)
+            rows.append((traditional.strip(), simplified.strip()))
+    return rows
+
+
+def build(t2s: Dict[str, str], s2t: Dict[str, str], curated: List[Row]) -> List[Row]:
+    """返回生成部分的行（繁体, 简体）"""
+    to_simplified = max_match(t2s)
+    to_traditional = max_match(s2t)
+    # 已经由前面的行确定的繁体键、简体键
+    keyed_t: Set[str] = {traditional for traditional, _ in curated}
+    keyed_s: Set[str] = {simplified for _, simplified in curated}
+    rows: List[Row] = []
+
+    def safe(traditional: str, simplified: str) -> bool:
+        return ((traditional in keyed_t or to_simplified(traditional) == simplified)
+                and (simplified in keyed_s or to_traditional(simplified) == traditional))
+
+    def emit(traditional: str, simplified: str):
+        rows.append((traditional, simplified))
+        keyed_t.add(traditional)
+        keyed_s.add(simplified)
+
+    pending = list(dict.fromkeys([(t, s) for t, s in t2s.items()] + [(t, s) for s, t in s2t.items()]))
+    while pending:
+        # 先写出所有不影响另一个方向的行，直到没有进展
+        progress = True
+        while progress:
+            progress = False
+            blocked = []
+            for traditional, simplified in pending:
+                if traditional in keyed_t and simplified in keyed_s:
+                    continue
+                if safe(traditional, simplified):
+                    emit(traditional, simplified)
+                    progress = True
+                else:
+                    blocked.append((traditional, simplified))
+            pending = blocked
+
+        # 剩下的行会改变另一个方向的结果：先写出那个键按 OpenCC 转换的行（同形时就是占位行）
+        added = False
+        for traditional, simplified in list(pending):
+            for row in ((traditional, to_simplified(traditional)), (to_traditional(simplified), simplified)):
+                if not (row[0] in keyed_t and row[1] in keyed_s) and safe(*row):
+                    emit(*row)
+                    added = True
+                elif row not in pending and not (row[0] in keyed_t and row[1] in keyed_s):
+                    pending.append(row)
+        if not added:
+            break
+
+    if pending:
+        print(f"⚠️ {len(pending)} 行无法与 OpenCC 完全一致，按繁转简写出: {pending[:5]}")
+        for row in pending:
+            if row[0] not in keyed_t:
+                emit(*row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dictionary", help="OpenCC 文本词典目录（默认取已安装的 opencc-python-reimplemented 中的目录）")
+    parser.add_argument("--output", default="data/t2s.tsv")
+    parser.add_argument("--source-note", help="写在表头的数据版本说明")
+    args = parser.parse_args()
+
+    dictionary = Path(args.dictionary) if args.dictionary else default_dictionary()
+    if dictionary is None or not (dictionary / "TSCharacters.txt").exists():
+        parser.error("找不到 OpenCC 文本词典：请先 pip install opencc-python-reimplemented，或用 --dictionary 指定")
+    t2s = read_dictionary(dictionary / "TSPhrases.txt", dictionary / "TSCharacters.txt")
+    s2t = read_dictionary(dictionary / "STPhrases.txt", dictionary / "STCharacters.txt")
+
+    output = Path(args.output)
+    curated_lines = read_curated(output)
+    curated = curated_rows(curated_lines)
+    rows = build(t2s, s2t, curated)
+
+    tmp = output.with_name(output.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        for line in curated_lines:
+            f.write(line + "\n")
+        f.write(_HEADER.format(source=args.source_note or f"{dictionary} 中的 TS/ST 词典"))
+        for traditional, simplified in rows:
+            f.write(f"{traditional}\t{simplified}\n")
+    os.replace(tmp, output)
+    print(f"✅ 写入 {output}：人工整理 {len(curated)} 行，生成 {len(rows)} 行")
+
+
+if __name__ == "__main__":
+    main()
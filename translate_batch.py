@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+离线批量翻译：把一个目录下的经文（.txt / .docx）全部译成粤语，不经过 Web 服务
+
+    python translate_batch.py 经藏/ 输出/ --concurrency 8
+
+- 文件解析（编码识别、docx 提取、分段）在进程池中进行
+- 翻译复用 Web 服务的任务引擎：段落去重、翻译记忆库、限速重试，上游并发有上限
+- 每完成一个文件立即写出译文，并在清单文件（默认 输出/.manifest.jsonl）追加一条记录；
+  中断后重新运行会跳过清单中已完成且未修改的文件
+
+环境变量与 Web 服务一致：TRANSLATION_MEMORY_PATH、TM_REUSE_THRESHOLD、UPSTREAM_RATE_LIMIT、SOURCE_SCRIPT 等。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.document_exporter import iter_docx, iter_txt
+from services.encoding import read_text
+from services.expiry import ExpiryScheduler
+from services.job_manager import JOB_COMPLETED, JobManager
+from services.log_config import setup_logging
+from services.script_converter import SCRIPTS, ScriptConverter
+from services.translation_memory import TranslationMemory
+from services.upstream_client import ResilientClient, hedge_method
+
+logger = logging.getLogger("translate_batch")
+
+INPUT_EXTENSIONS = (".txt", ".docx")
+
+_text_processor = None
+
+
+def _load_text_processor():
+    from services.text_processor import TextProcessor
+    return TextProcessor()
+
+
+def _load_translation_service():
+    try:
+        from services.translation_service_enhanced import TranslationService
+    except ImportError:
+        try:
+            from services.translation_service_fixed import TranslationService
+        except ImportError:
+            from services.translation_service import TranslationService
+    return TranslationService()
+
+
+def _init_parser():
+    """进程池初始化：每个子进程创建一个 TextProcessor"""
+    global _text_processor
+    _text_processor = _load_text_processor()
+
+
+def parse_file(path: str) -> List[str]:
+    """在子进程中读取并分段；txt 自动识别编码"""
+    if path.lower().endswith(".txt"):
+        content = read_text(path)
+    else:
+        content = _text_processor.extract_text_from_docx(path)
+    return _text_processor.split_text_into_paragraphs(content)
+
+
+class Manifest:
+    """追加写入的检查点清单：每行一个 JSON 记录，同一文件以最后一条为准"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 中断时写了一半的行
+                    self.entries[entry["file"]] = entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, name: str, signature: list) -> bool:
+        entry = self.entries.get(name)
+        return entry is not None and entry["status"] == "done" and entry["source"] == signature
+
+    def record(self, entry: dict):
+        self.entries[entry["file"]] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def source_signature(path: Path) -> list:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_output(job, path: Path, output_format: str, bilingual: bool,
+                 converter: Optional[ScriptConverter] = None, script: Optional[str] = None):
+    """先写临时文件再改名，中断时不会留下不完整的译文；指定 script 时译文转换成该字体"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = iter_docx if output_format == "docx" else iter_txt
+    pairs = job.iter_pairs()
+    if converter is not None and script:
+        pairs = ((original, converter.convert(translated, script)) for original, translated in pairs)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        for chunk in chunks(pairs, bilingual=bilingual):
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+async def translate_directory(args) -> int:
+    input_dir = Path(args.input_dir)
+    output_dir = Path(args.output_dir)
+    manifest = Manifest(Path(args.manifest) if args.manifest else output_dir / ".manifest.jsonl")
+
+    files = sorted(p for p in input_dir.rglob("*") if p.is_file() and p.suffix.lower() in INPUT_EXTENSIONS)
+    pending = [p for p in files if not manifest.is_done(str(p.relative_to(input_dir)), source_signature(p))]
+    logger.info(f"📚 共 {len(files)} 个文件，已完成 {len(files) - len(pending)} 个，待翻译 {len(pending)} 个")
+    if not pending:
+        manifest.close()
+        return 0
+
+    memory = None
+    memory_path = os.environ.get("TRANSLATION_MEMORY_PATH", "temp/translation_memory.db")
+    if memory_path:
+        memory = TranslationMemory(
+            memory_path,
+            # 默认只直接复用规范化后完全相同的段落，近似段落只作为参考译文
+            reuse_threshold=float(os.environ["TM_REUSE_THRESHOLD"]) if os.environ.get("TM_REUSE_THRESHOLD") else None,
+            hint_threshold=float(os.environ.get("TM_HINT_THRESHOLD", 0.6))
+        )
+    translation_service = _load_translation_service()
+    client = ResilientClient(
+        translation_service.translate_to_cantonese,
+        max_concurrency=args.concurrency,
+        initial_concurrency=min(2, args.concurrency),
+        rate=float(os.environ.get("UPSTREAM_RATE_LIMIT", 0)) or None,
+        max_retries=int(os.environ.get("UPSTREAM_MAX_RETRIES", 3)),
+        # 批量翻译不用流式调用：同步翻译函数无法对冲（ResilientClient 会记录警告）
+        hedge=os.environ.get("UPSTREAM_HEDGE", "0") == "1",
+        hedge_func=hedge_method(translation_service),
+        hedge_budget=float(os.environ.get("UPSTREAM_HEDGE_BUDGET", 0.1))
+    )
+    # 任务结束即从管理器中移除，译文由本进程写出
+    expiry = ExpiryScheduler()
+    expiry.start()
+    # 翻译前统一原文字体，与 Web 服务共用翻译记忆库时命中同样的条目
+    converter = ScriptConverter(os.environ.get("SCRIPT_TABLE", "data/t2s.tsv"),
+                                os.environ.get("SCRIPT_INDEX_DIR", "temp"))
+    source_script = os.environ.get("SOURCE_SCRIPT", "simplified")
+    job_manager = JobManager(
+        client, max_concurrency=args.concurrency, memory=memory, expiry=expiry, job_ttl=0,
+        normalize=(lambda text: converter.convert(text, source_script)) if source_script in SCRIPTS else None
+    )
+
+    loop = asyncio.get_running_loop()
+    # 同时在处理中的文件数，限制已解析但未翻译完的段落占用的内存
+    documents = asyncio.Semaphore(args.max_documents)
+    failures = 0
+    finished = 0
+    started = time.monotonic()
+
+    async def process(pool: ProcessPoolExecutor, path: Path):
+        nonlocal failures, finished
+        name = str(path.relative_to(input_dir))
+        target = output_dir / Path(name).with_suffix("." + args.format)
+        entry = {"file": name, "source": source_signature(path), "output": str(target.relative_to(output_dir))}
+        async with documents:
+            try:
+                paragraphs = await loop.run_in_executor(pool, parse_file, str(path))
+                job = job_manager.create_job(paragraphs, filename=name)
+                del paragraphs
+                await job.task
+                if job.status != JOB_COMPLETED:
+                    raise RuntimeError(job.error or job.status)
+                # 未指定 --script 时译文转换回原文的字体（翻译前原文被统一成了 SOURCE_SCRIPT）
+                script = args.script
+                if not script and source_script in SCRIPTS:
+                    detected = converter.detect_document(job.paragraphs)
+                    script = detected if detected != source_script else None
+                await asyncio.to_thread(write_output, job, target, args.format, args.bilingual, converter, script)
+                # 有段落翻译失败的文件记为 partial，下次运行会重新翻译
+                entry.update(status="done" if job.failed == 0 else "partial",
+                             paragraphs=job.total, failed=job.failed)
+            except Exception as e:
+                logger.error(f"❌ {name} 翻译失败: {e}")
+                entry.update(status="error", error=str(e))
+            entry["finished_at"] = time.time()
+            manifest.record(entry)
+
+        finished += 1
+        if entry["status"] != "done":
+            failures += 1
+        logger.info(f"📄 [{finished}/{len(pending)}] {name}: {entry['status']}")
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.parse_workers, initializer=_init_parser) as pool:
+            await asyncio.gather(*(process(pool, path) for path in pending))
+    finally:
+        await expiry.stop()
+        manifest.close()
+        if memory is not None:
+            memory.close()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"🎉 完成 {finished} 个文件，{failures} 个未完全成功，用时 {elapsed:.1f}s；"
+                f"翻译记忆复用 {job_manager.memory_reused} 段，上游 {client.metrics()}")
+    return 1 if failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="离线批量翻译目录下的经文")
+    parser.add_argument("input_dir", help="输入目录，递归查找 .txt 和 .docx")
+    parser.add_argument("output_dir", help="输出目录，保持输入的相对路径")
+    parser.add_argument("--format", choices=("txt", "docx"), default="txt", help="输出格式")
+    parser.add_argument("--no-bilingual", dest="bilingual", action="store_false", help="只输出粤语译文")
+    parser.add_argument("--script", choices=SCRIPTS, help="译文字体，默认与原文字体一致")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("TRANSLATION_CONCURRENCY", 4)),
+                        help="上游翻译并发上限")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1, help="解析文件的进程数")
+    parser.add_argument("--max-documents", type=int, default=8, help="同时处理的文件数")
+    parser.add_argument("--manifest", help="检查点清单路径，默认 输出目录/.manifest.jsonl")
+    args = parser.parse_args(argv)
+
+    setup_logging(level=logging.INFO, json_output=False)
+    return asyncio.run(translate_directory(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())